@@ -8,366 +8,365 @@
 #
 # Requires Python 3.1.2 or newer
 
-# Check if string is a valid hex value
-def IsHex(s):
-    try:
-        n = int(s,16)
-        if n<0:
-            return False
-        return True
-    except ValueError:
-        return False
-
-# A generator to divide a sequence into chunks of n units.
-def SplitBy(seq, n):
-    while seq:
-        yield seq[:n]
-        seq = seq[n:]
-
-
-# Function to update chip 8 display opcode DxyN with x offset
-def UpdateDisplay(Data,Adjust):
-    Adjust=(int(Adjust,16))
-    if Adjust==0:
-        return
-    Dxyn=[0] * 3072
-    for idx, v in enumerate(Data):
-        if v[0]=='6':
-            r = v[1]
-            ri=int(r,16)
-            Dxyn[ri]=list([idx,v[0:2],v[2:]]) 
-        if v[0]=='D':
-            if v[2:3]=='':
-                continue
-            r=v[2:3]
-            ri=int(v[2:3],16)
-            d=Dxyn[ri]
-            if d==0:
-                continue          
-            i=d[0]
-            v1=d[1:2][0]
-            v2=d[2:3][0]
-            v3=hex(int(v2,16)+Adjust).replace('0x','')
-            if int(v3,16)>255:
-                v3=hex(255).replace('0x','')
-            v4=v1 + v3.rjust(2,'0').upper()
-            Data[i]=v4
-      
-# Function to create hex array with update to address calls
-def UpdateHex(Data,Origin,NewOrigin):
-    NewOrigin = int(NewOrigin, 16)
-    Origin= int(Origin, 16)
-    offset=NewOrigin-Origin
-    if offset==0:
-        return
-    for idx, v in enumerate(Data):
-        hexData=Data[idx]
-        op1=v[0]
-        op2=v[1:]
-        if op1=="1" or op1=="2" or op1=="A" or op1=="B":
-            op2 = hex(offset+int(op2, 16))[2:].upper()
-            v="".join([op1,op2])
-            hexData=v.upper()
-            Data[idx]=hexData
-    
-# Function to create mnemonic hex array
-def CreateMnemonic(Data,NewOrigin):
-    HexArray=[]
-    NewOrigin = int(NewOrigin, 16)
-    taa=NewOrigin
-    for idx, v in enumerate(Data):
-        hexAdd=hex(taa).replace('0x','')
-        hexAdd=hexAdd.rjust(4,'0')
-        hexAdd=hexAdd.upper()
-        hexData=Data[idx]
-        HexArray.append(list([hexAdd,hexData,GetOpcode(hexData)]))
-        taa=taa+2
+import os,sys,time
+if __package__:
+    from . import Timing,Output,BuildCache,chip8core,chip8ihex,chip8decode,chip8flow,chip8reloc
+    from .Prompts import PromptHex
+else:
+    import Timing
+    import Output
+    import BuildCache
+    import chip8core
+    import chip8ihex
+    import chip8decode
+    import chip8flow
+    import chip8reloc
+    from Prompts import PromptHex
+
+# File extensions of binary files to convert
+BinaryExtensions=(".bin",".BIN",".c8",".C8",".ch8",".CH8",".cos",".COS",".dat",".DAT",".st2","ST2")
+
+# Function to update the y coordinate loads of chip 8 display opcode DxyN with an offset.
+# Returns the relocation report.
+def UpdateDisplay(Image,Adjust):
+    return chip8reloc.adjust_display(Image,int(Adjust,16))
+
+# Function to move a program to a new origin updating the address of reachable instructions,
+# with the workspace of that size past its end.
+# Returns the relocated program and the relocation report.
+def UpdateHex(Image,NewOrigin,Workspace=''):
+    return chip8reloc.relocate(Image,int(NewOrigin,16),int(Workspace,16) if Workspace else 0)
+
+# Function to create mnemonic array of a program, a trailing odd byte is listed as data
+def CreateMnemonic(Image):
+    table=chip8decode.mnemonic_table()
+    taa=Image.origin
+    HexArray=[['%04X' % (taa+idx*2),'%04X' % v,table[v]] for idx,v in enumerate(Image.words())]
+    if len(Image.data) & 1:
+        HexArray.append(['%04X' % Image.end,'%02X' % Image.data[-1],'Data '+chip8flow.pattern(Image.data[-1])])
     return HexArray
-            
-# Function to get the CHIP-8 mnemonic code 
-def GetOpcode(opcode): 
+
+# Function to get the CHIP-8 mnemonic code
+def GetOpcode(opcode):
     if opcode=='':
         return opcode
-    if len(opcode) <4:
-        opcode=opcode.rjust(4, "0")
-    v0=opcode[0]
-    v1=opcode[1] 
-    v2=opcode[2]
-    v3=opcode[3]
-    v4=opcode[1:]
-    v5=opcode[2:]
-    v6=opcode[3:]
-    
-    mmnemonic = 'Data'
-    if v0 == '0':
-        if v1 != '0':
-             mmnemonic = 'Call ' + v4
-        else:
-            if opcode == '00E0':
-                 mmnemonic = 'Clear'
-            elif opcode == '00EE':
-                 mmnemonic = 'Return'
-            elif opcode=='0000':
-                mmnemonic = 'NoOp'
-    elif v0 == '1':
-         mmnemonic = "Goto " + v4    
-    elif v0 == '2':
-         mmnemonic = "Do " + v4     
-    elif v0 == '3':
-         mmnemonic = 'Skip if V'+ v1 +' = '+ v5
-    elif v0 == '4':
-         mmnemonic = 'Skip if not V' + v1 +' = '+ v5
-    elif v0 == '5':
-         mmnemonic = 'Skip if V' + v1 + ' = V' + v2
-    elif v0 == '6':
-         mmnemonic = 'V' + v1 +' = ' + v5
-    elif v0 == '7':
-         mmnemonic = 'V' + v1 +' = V'+ v1 +' + ' + v5
-    elif v0 == '8':
-         if v3 == '0':
-             mmnemonic = 'V' + v1 + ' = V' + v2
-         elif v3 == '1':
-             mmnemonic = 'V' + v1 + ' or V' + v2
-         elif v3 == '2':
-             mmnemonic = 'V' + v1 + ' and V' + v2
-         elif v3 == '3':
-             mmnemonic = 'V' + v1 + ' or V' + v2
-         elif v3 == '4':
-             mmnemonic = 'V' + v1 + '  = V' + v1+ ' + V' + v2              
-         elif v3 == '5':
-             mmnemonic = 'V' + v1 + '  = V' + v1 + ' - V' + v2       
-    elif v0 == '9':
-         mmnemonic = 'Skip if not V' + v1 + ' = V' + v2 
-    elif v0 == 'A':
-         mmnemonic = 'I = ' + v4 
-    elif v0 == 'B':
-         mmnemonic = 'Goto ' + v4 + ' + V0'      
-    elif v0 == 'C':
-         mmnemonic = 'V' + v1 + ' = random and ' + v5        
-    elif v0 == 'D':
-         mmnemonic = 'Show ' + v3 + ' at V' + v1 + ', V' + v2      
-    elif v0== 'E':
-            if v5 == '9E':
-             mmnemonic = 'Skip if V' + v1 + ' is key'
-            elif v5 == 'A1':
-             mmnemonic = 'Skip if not V' + v1 + ' is key'       
-    elif v0 == 'F':
-            if v5 == '00':
-                mmnemonic = 'Pitch = V' + v1
-            elif v5 == '07':
-                mmnemonic = 'V' + v1 + ' = Time'
-            elif v5 == '0A':
-                mmnemonic = 'V'+ v1 + ' = Key'
-            elif v5 == '15':
-                mmnemonic = 'Time = V' + v1
-            elif v5 == '18':
-                mmnemonic = 'Tone = V' + v1
-            elif v5 == '1E':
-                mmnemonic = 'I = I + V' + v1
-            elif v5 == '29':
-                mmnemonic = 'I = Display V' + v1
-            elif v5 == '33':
-                mmnemonic =  'M(I)=DECML V' + v1
-            elif v5 == '55':
-                mmnemonic = 'M(I)=V0:V' + v1
-            elif v5 == '65':
-                mmnemonic = 'V0:V' + v1 + ' = M(I)'
-    else:
-        mmnemonic = 'Data'
-    return mmnemonic
-
-# Function to convert hex to intel Hex
-def ConvertToIntelHex(DataRow,NewOrigin):    
-     iHex=[]
-     address = int(NewOrigin, 16)
-     recordtype='00'
-     trailer=':00000001FF'
-     for v in DataRow:
-         for v1 in v:
-             v2=list(SplitBy(v1, 2))
-             chksum=0
-             bytecount=0
-             for h in v2:
-                 bytecount=bytecount+1
-                 chksum=chksum+int(h, 16)
-             
-             bytecount=hex(bytecount).replace('0x','')
-             bytecount=bytecount.rjust(2,'0')
- 
-             hexAdd=hex(address).replace('0x','')
-             hexAdd=hexAdd.rjust(4,'0')
-             hexAdd1=hexAdd[:2]
-             hexAdd2=hexAdd[2:]
-
-             chksum=chksum + int(bytecount,16) + int(hexAdd1,16) + int(hexAdd2,16) + int(recordtype,16)
-             chksum=hex(chksum).replace('x','')
-             chksum=int("0100",16)-int(chksum[-2:],16)
-             chksum=hex(chksum).replace('x','')[-2:].rjust(2,'0')
-             data=':' + bytecount + hexAdd + recordtype + ''.join(v2)+chksum
-             iHex.append(data.upper())
-             address=address + int(bytecount,16)
-     iHex.append(trailer)
-     return iHex
+    return chip8decode.mnemonic(int(opcode,16))
 
 def WriteFile(TargetFile,FileData,NewLine):
-    f = open(TargetFile, "w")
-    for data in FileData:
-        if NewLine==1:
-            data=data+"\n"
-        f.write(data)
-    f.close()  
+    if NewLine==1:
+        FileData=[data+"\n" for data in FileData]
+    Output.WriteText(TargetFile,''.join(FileData))
 
 # Write expanded mnemonics into file
 def WriteMnemonic(TargetFile,HexArray,Address,Name):
   address=int(Address,16)
   p='{text0:<10}{text1:<10}{text2:30}'
-  f = open(TargetFile, "w")
-  f.write(Name+'\n\n')
-  f.write(p.format(text0='Address',text1='Opcode',text2='Mnemonic')+'\n')
+  lines=[Name+'\n\n']
+  lines.append(p.format(text0='Address',text1='Opcode',text2='Mnemonic')+'\n')
   for v in HexArray: 
       address=v[0][0:]
       opcode=v[1][0:]
       mnemonic=v[2][0:]  
-      if len(opcode) <4:
-           opcode=opcode.rjust(4, "0")   
-      f.write(p.format(text0=address,text1=opcode,text2=mnemonic)+'\n')
-  f.close()
-  
-
-# Prompt message
-def PromptHex(prompt, default=None):
-    if default!='':
-        prompt=prompt+' <'+str(default)+'> :'   
-    while True:     
-        resp=input(prompt).upper()
-        if len(resp)==0 and default!='':
-            resp=default
-        resp=str(resp)   
-        if not IsHex(resp):
-                print('Invalid entry. Please enter valid hexidecimal values')
+      lines.append(p.format(text0=address,text1=opcode,text2=mnemonic)+'\n')
+  Output.WriteText(TargetFile,''.join(lines))
+
+# Write a control flow listing with labels, data blocks and cross reference into file
+def WriteListing(TargetFile,Rows,Flow,Name):
+  p='{text0:<10}{text1:<10}{text2:30}'
+  lines=[Name+'\n\n']
+  lines.append(p.format(text0='Address',text1='Opcode',text2='Mnemonic')+'\n')
+  for v in Rows:
+      if isinstance(v,str):
+          lines.append(v+'\n')
+      else:
+          lines.append(p.format(text0=v[0],text1=v[1],text2=v[2])+'\n')
+  lines.append('\nCross Reference\n\n')
+  for target in sorted(Flow.xrefs):
+      name=Flow.label(target) or '%04X' % target
+      refs=', '.join('%04X' % source for source,kind in sorted(Flow.xrefs[target]))
+      lines.append(p.format(text0=name,text1='',text2=refs).rstrip()+'\n')
+  Output.WriteText(TargetFile,''.join(lines))
+
+# Write relocation report into file
+def WriteReport(TargetFile,Report,Image,Name):
+  p='{text0:<10}{text1:<10}{text2:<10}{text3:30}'
+  lines=[Name+'\n\n']
+  lines.append('Relocated to '+Image.address_range()+'\n\n')
+  lines.append(p.format(text0='Address',text1='Old',text2='New',text3='Note')+'\n')
+  for v in Report:
+      lines.append(p.format(text0=v[0],text1=v[1],text2=v[2],text3=v[3])+'\n')
+  Output.WriteText(TargetFile,''.join(lines))
+
+# Prepare a worker process for the conversion of files with the cached flow analyses
+def InitWorker(Flows=None):
+    from colorama import init
+    init(autoreset=True)
+    if Flows is None:
+        Flows={}
+    chip8flow.preload(Flows)
+
+# Convert a single binary file to hex, intel hex and mnemonic files.
+# Returns the list of files written and the control flow records by key of the
+# programs analysed (see chip8flow).
+def ConvertFile(SourceFile,Settings):
+    from colorama import Fore
+    file=os.path.basename(SourceFile)
+    SourceName=os.path.splitext(file)[0]
+    AlphaName=SourceName[0]
+    HexDir=Settings['HexDir']
+    Origin=Settings['Origin']
+    Outputs=[]
+
+    with Timing.stage('read'):
+        Image=chip8core.read_binary(SourceFile,int(Origin,16) if Origin else 0)
+    Timing.count(len(Image))
+
+    if Settings.get('NewOrigin') or Settings.get('DisplayAdjust'):
+        Report=[]
+        with Timing.stage('relocate'):
+            if Settings.get('NewOrigin'):
+                Image,Report=UpdateHex(Image,Settings['NewOrigin'],Settings.get('Workspace'))
+                Origin='%04X' % Image.origin
+            if Settings.get('DisplayAdjust'):
+                Report=Report+UpdateDisplay(Image,Settings['DisplayAdjust'])
+        AlphaDir=os.path.join(Settings['RelocationDir'],AlphaName)
+        Output.MakeDirs(AlphaDir)
+        ReportFile=os.path.join(AlphaDir,SourceName+'.txt')
+        print(f'{Fore.MAGENTA}Writing Relocation Report '+ ReportFile)
+        with Timing.stage('relocate'):
+            WriteReport(ReportFile,Report,Image,SourceName)
+        Outputs.append(ReportFile)
+
+    if Settings['HexFlag']:
+        AlphaDir=os.path.join(HexDir,AlphaName)
+        Output.MakeDirs(AlphaDir)
+        HexFile=os.path.join(AlphaDir,SourceName+'.hex')
+        print(f'{Fore.YELLOW}Writing Hex Format File '+ HexFile)
+        with Timing.stage('hex'):
+            FileData=[Image.hex(Settings['HexSpace'])]
+            WriteFile(HexFile,FileData,0)
+        Outputs.append(HexFile)
+        if Settings['HexDirFlag']==1:
+            HexFileCopy=os.path.join(HexDir,SourceName+'.hex')
+            print(f'{Fore.YELLOW}Copying file '+ SourceName+' to '+HexFileCopy)
+            with Timing.stage('hex'):
+                Output.LinkCopy(HexFile,HexFileCopy)
+            Outputs.append(HexFileCopy)
+
+    if Settings['iHexFlag']:
+        IntelHexDir=Settings['IntelHexDir']
+        AlphaDir=os.path.join(IntelHexDir,AlphaName)
+        Output.MakeDirs(AlphaDir)
+        IntelHexFile=os.path.join(AlphaDir,SourceName+'.hex')
+        print(f'{Fore.GREEN}Writing Intel Hex Format File '+ IntelHexFile)
+        with Timing.stage('ihex'):
+            Output.WriteText(IntelHexFile,chip8ihex.hex_text(Image,Settings['ByteRow']))
+        Outputs.append(IntelHexFile)
+        if Settings['iHexDirFlag']==1:
+            IntelHexFileCopy=os.path.join(IntelHexDir,SourceName+'.hex')
+            print(f'{Fore.BLUE}Copying file '+ SourceName+' to '+IntelHexFileCopy)
+            with Timing.stage('ihex'):
+                Output.LinkCopy(IntelHexFile,IntelHexFileCopy)
+            Outputs.append(IntelHexFileCopy)
+
+    if Settings['MnemonicFlag']:
+        AlphaDir=os.path.join(Settings['MnemonicDir'],AlphaName)
+        Output.MakeDirs(AlphaDir)
+        MnemonicFile=os.path.join(AlphaDir,SourceName+'.txt')
+        print(f'{Fore.GREEN}Writing Mnemonic File '+ MnemonicFile)
+        with Timing.stage('mnemonic'):
+            if Settings.get('FlowFlag'):
+                Rows,Flow=chip8flow.listing(Image)
+                WriteListing(MnemonicFile,Rows,Flow,SourceName)
+            else:
+                FileData=CreateMnemonic(Image)
+                WriteMnemonic(MnemonicFile,FileData,Origin,SourceName)
+        Outputs.append(MnemonicFile)
+    return Outputs,chip8flow.take_records()
+
+# Make the outputs of a binary file for a duplicate of an already converted one,
+# CanonicalFile. The hex and Intel Hex files are symbolic links to those of
+# CanonicalFile and the files starting with the program name are copies of its files
+# with the name changed. Returns the list of files written.
+def DuplicateFile(SourceFile,CanonicalFile,Settings):
+    from colorama import Fore
+    SourceName=os.path.splitext(os.path.basename(SourceFile))[0]
+    CanonicalName=os.path.splitext(os.path.basename(CanonicalFile))[0]
+    print(f'{Fore.CYAN}Linking duplicate file '+ SourceFile+' to '+CanonicalFile)
+    # Directory, extension, program name in the file and copy in the single directory
+    Files=[]
+    if Settings.get('NewOrigin') or Settings.get('DisplayAdjust'):
+        Files.append((Settings['RelocationDir'],'.txt',True,False))
+    if Settings['HexFlag']:
+        Files.append((Settings['HexDir'],'.hex',False,Settings['HexDirFlag']==1))
+    if Settings['iHexFlag']:
+        Files.append((Settings['IntelHexDir'],'.hex',False,Settings['iHexDirFlag']==1))
+    if Settings['MnemonicFlag']:
+        Files.append((Settings['MnemonicDir'],'.txt',True,False))
+    Outputs=[]
+    for Dir,Ext,Named,Copy in Files:
+        Canonical=os.path.join(Dir,CanonicalName[0],CanonicalName+Ext)
+        AlphaDir=os.path.join(Dir,SourceName[0])
+        Output.MakeDirs(AlphaDir)
+        TargetFile=os.path.join(AlphaDir,SourceName+Ext)
+        if Named:
+            with open(Canonical,'r') as f:
+                Text=f.read()
+            Output.WriteText(TargetFile,SourceName+'\n'+Text.split('\n',1)[1])
         else:
-            break
-    return resp
-     
+            Output.SymLink(Canonical,TargetFile)
+        Outputs.append(TargetFile)
+        if Copy:
+            TargetFile=os.path.join(Dir,SourceName+Ext)
+            Output.SymLink(Canonical,TargetFile)
+            Outputs.append(TargetFile)
+    return Outputs
+
+# Return the settings that change the output of a conversion for the build cache
+def CacheParams(Settings):
+    Params={'Version':'1.1'}
+    for Name in ('HexFlag','HexDirFlag','HexSpace','iHexFlag','iHexDirFlag','MnemonicFlag','Origin'):
+        Params[Name]=Settings[Name]
+    if Settings['MnemonicFlag']:
+        Params['FlowFlag']=Settings.get('FlowFlag',0)
+    Params['NewOrigin']=Settings.get('NewOrigin','')
+    Params['DisplayAdjust']=Settings.get('DisplayAdjust','')
+    Params['Workspace']=Settings.get('Workspace','')
+    if Settings['iHexFlag']:
+        Params['ByteRow']=Settings['ByteRow']
+    return Params
+
+# Convert all binary files of the source directory. With more than one job
+# the files are converted in parallel worker processes. Files unchanged since
+# the last conversion with the same settings are skipped unless Force is set.
+# The cache key is the SHA-256 of the settings and the binary, files with the key of
+# an earlier file are duplicates converted once (see DuplicateFile).
+def ConvertAll(Settings):
+    from concurrent.futures import ProcessPoolExecutor
+    from colorama import Fore
+    TargetDir=Settings['TargetDir']
+    # Create directories for hex and mnemonic files
+    Settings['HexDir']=TargetDir + 'hex'
+    Output.MakeDirs(Settings['HexDir'])
+    if Settings['iHexFlag']:
+        Settings['IntelHexDir']=TargetDir + 'ihex'
+        Output.MakeDirs(Settings['IntelHexDir'])
+    if Settings['MnemonicFlag']:
+        Settings['MnemonicDir']=TargetDir + 'mnemonic'
+        Output.MakeDirs(Settings['MnemonicDir'])
+    if Settings.get('NewOrigin') or Settings.get('DisplayAdjust'):
+        Settings['RelocationDir']=TargetDir + 'relocation'
+        Output.MakeDirs(Settings['RelocationDir'])
+
+    SourceDir=Settings['SourceDir']
+    Files=[]
+    for file in sorted(os.listdir(SourceDir)):
+        if file.endswith(BinaryExtensions):
+            Files.append(os.path.join(SourceDir, file))
+
+    Cache={} if Settings.get('Force') else BuildCache.LoadCache(TargetDir,'bin2hex')
+    # Control flow records by image hash, kept even when forced as they only depend
+    # on the image
+    Flows=BuildCache.LoadCache(TargetDir,'flow')
+    Params=CacheParams(Settings)
+    Entries={}
+    Convert=[]
+    Duplicates=[]
+    Canonical={}
+    for SourceFile in Files:
+        Name=os.path.basename(SourceFile)
+        Key=BuildCache.CacheKey(SourceFile,Params)
+        Entry=Cache.get(Name)
+        First=Canonical.setdefault(Key,Name)
+        # A duplicate stays current only while it is linked to the first file with its key
+        if BuildCache.IsCurrent(Entry,Key) and Entry.get('Canonical',Name)==First:
+            print(f'{Fore.CYAN}Skipping unchanged file '+ SourceFile)
+            Entries[Name]=Entry
+        elif First!=Name:
+            Entries[Name]={'Key':Key,'Canonical':First}
+            Duplicates.append(SourceFile)
+        else:
+            Entries[Name]={'Key':Key}
+            Convert.append(SourceFile)
+
+    Start=time.perf_counter()
+    ConvertFunc=Timing.wrap(ConvertFile,Settings)
+    if Settings['Jobs']>1 and len(Convert)>1:
+        with ProcessPoolExecutor(max_workers=Settings['Jobs'],initializer=InitWorker,initargs=(Flows,)) as executor:
+            Results=list(executor.map(ConvertFunc,Convert,[Settings]*len(Convert)))
+    else:
+        chip8flow.preload(Flows)
+        Results=[ConvertFunc(SourceFile,Settings) for SourceFile in Convert]
+    Results,Records=Timing.split(Results,Settings)
+
+    for SourceFile,(Outputs,FileFlows) in zip(Convert,Results):
+        Entries[os.path.basename(SourceFile)].update({'Outputs':Outputs,'Flows':sorted(FileFlows)})
+        Flows.update(FileFlows)
+    for SourceFile in Duplicates:
+        Entry=Entries[os.path.basename(SourceFile)]
+        Entry['Outputs']=DuplicateFile(SourceFile,os.path.join(SourceDir,Entry['Canonical']),Settings)
+    BuildCache.SaveCache(TargetDir,'bin2hex',Entries)
+    # Only the records of the files converted are kept
+    BuildCache.SaveCache(TargetDir,'flow',{Key:Flows[Key] for Entry in Entries.values() for Key in Entry.get('Flows',[]) if Key in Flows})
+    Timing.report(Settings,'bin2hex',Records,time.perf_counter()-Start)
+
 if __name__ == '__main__':
-    import os,sys,click
+    import click
     from colorama import Fore, Back, Style, init
-    
-    if len(sys.argv) != 1:
-        print("Usage : %s SourceDir TargetDir" % sys.argv[0],file=sys.stderr)
-        raise SystemExit(1)
-    
-    HexFlag=1
-    HexDirFlag = 0
-    HexSpace=''
-    iHexFlag=0
-    iHexDirFlag = 0
-    MnemonicFlag = 0
+
+    # Options on the command line run the conversion without prompts
+    if len(sys.argv) > 1:
+        if __package__:
+            from .Chip8Convert import bin2hex
+        else:
+            from Chip8Convert import bin2hex
+        bin2hex()
+
+    Settings={'HexFlag':1,'HexDirFlag':0,'HexSpace':'','iHexFlag':0,'iHexDirFlag':0,'MnemonicFlag':0,'ByteRow':16}
     Origin=''
 
     # Prompts
 
-    os.system('cls')
+    click.clear()
     init(autoreset=True)
     print(f'{Fore.RED}{Style.BRIGHT}Binary To Hex File Conversion\n')
     print(f'{Fore.GREEN}{Style.BRIGHT}File Settings')
-    
+
     SourceDir = click.prompt(f'{Fore.BLUE}Binary Source Directory', type=click.Path(exists=True), default=os.getcwd(),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+os.getcwd()+'> : ')
     if not SourceDir.endswith(os.sep):
         SourceDir = SourceDir + os.sep
+    Settings['SourceDir']=SourceDir
 
     TargetDir = click.prompt(f'{Fore.BLUE}Target Directory', type=click.Path(exists=False), default=os.getcwd(),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+os.getcwd()+'> : ')
     if not TargetDir.endswith(os.sep):
         TargetDir = TargetDir + os.sep
+    Settings['TargetDir']=TargetDir
     if click.confirm(f'{Fore.YELLOW}Do you want to include spaces between hex values ?',default='Y',show_default=False,prompt_suffix=' <Y>'):
-        HexSpace=' '
+        Settings['HexSpace']=' '
     if click.confirm(f'{Fore.YELLOW}Do you want to save Hex files in a single directory as well?',default='Y',show_default=False,prompt_suffix=' <Y>'):
-        HexDirFlag=1
+        Settings['HexDirFlag']=1
     if click.confirm(f'{Fore.YELLOW}{Style.BRIGHT}Do you want to export to Intel Hex files ?',default='Y',show_default=False,prompt_suffix=' <Y>'):
-        ByteRow=int(click.prompt(f'{Fore.YELLOW}{Style.BRIGHT}Number of Bytes per row:',default='16',type=click.Choice(['2','4','8','16','32']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <16> : '))
+        Settings['ByteRow']=int(click.prompt(f'{Fore.YELLOW}{Style.BRIGHT}Number of Bytes per row:',default='16',type=click.Choice(['2','4','8','16','32']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <16> : '))
         Origin=str(PromptHex(f'{Fore.YELLOW}{Style.BRIGHT}Origin start at','0000'))
-        iHexFlag=1
+        Settings['iHexFlag']=1
         if click.confirm(f'{Fore.YELLOW}{Style.BRIGHT}Do you want to save Intel Hex files in a single directory as well?',default='Y',show_default=False,prompt_suffix=' <Y>'):
-            iHexDirFlag=1
+            Settings['iHexDirFlag']=1
     if click.confirm(f'{Fore.YELLOW}{Style.BRIGHT}Do you want to export to Chip8 Mnemonic files ?',default='Y',show_default=False,prompt_suffix=' <Y>'):
-        MnemonicFlag = 1
+        Settings['MnemonicFlag'] = 1
+        if click.confirm(f'{Fore.YELLOW}{Style.BRIGHT}Do you want to separate code from data by following the control flow ?',default='Y',show_default=False,prompt_suffix=' <Y>'):
+            Settings['FlowFlag'] = 1
         if Origin=='':
             Origin=str(PromptHex(f'{Fore.YELLOW}{Style.BRIGHT}Origin start at','0000'))
-    
-    # Create directories for hex and mnemonic files
-    HexDir=TargetDir + 'hex'
-     
-    if not os.path.exists(HexDir):
-        os.makedirs(HexDir)    
-    
-    if iHexFlag:
-        IntelHexDir=TargetDir + 'ihex'
-        if not os.path.exists(IntelHexDir):
-            os.makedirs(IntelHexDir)
-    
-    if MnemonicFlag:
-        MnemonicDir=TargetDir + 'mnemonic'
-        if not os.path.exists(MnemonicDir):
-            os.makedirs(MnemonicDir)
-             
-    for file in os.listdir(SourceDir):
-        if file.endswith((".bin",".BIN",".c8",".C8",".ch8",".CH8",".cos",".COS",".dat",".DAT",".st2","ST2")):
-            SourceFile=os.path.join(SourceDir, file)
-            SourceName=os.path.splitext(file)[0]
-            AlphaName=SourceName[0]
-                       
-            AlphaDir=os.path.join(HexDir,AlphaName)
-            if not os.path.exists(AlphaDir):
-                os.makedirs(AlphaDir)    
-            HexFile=os.path.join(AlphaDir,SourceName+'.hex')
-            HexFileCopy=os.path.join(HexDir,SourceName+'.hex')
-            
-            if iHexFlag:
-                AlphaDir=os.path.join(IntelHexDir,AlphaName)
-                if not os.path.exists(AlphaDir):
-                    os.makedirs(AlphaDir)    
-                IntelHexFile=os.path.join(AlphaDir,SourceName+'.hex')
-                if iHexDirFlag:
-                    IntelHexFileCopy=os.path.join(IntelHexDir,SourceName+'.hex')
-            
-            if MnemonicFlag:
-                AlphaDir=os.path.join(MnemonicDir,AlphaName)
-                if not os.path.exists(AlphaDir):
-                    os.makedirs(AlphaDir)    
-                MnemonicFile=os.path.join(AlphaDir,SourceName+'.txt')
-
-            Data=[]             
-            with open(SourceFile,'rb') as f:
-                b = f.read(2)
-                while b:
-                   h=b.hex()    
-                   Data.append(h.upper())
-                   b=f.read(2)
-            DataStr=[]
-            DataStr = ''.join(Data)             
-            print('\n')
-            if HexFlag:
-                FileData=[]
-                FileData.append(HexSpace.join(list(SplitBy(DataStr,2))))
-                print(f'{Fore.YELLOW}Writing Hex Format File '+ HexFile)  
-                WriteFile(HexFile,FileData,0)
-                if HexDirFlag==1:
-                    print(f'{Fore.YELLOW}Copying file '+ SourceName+' to '+HexFileCopy)
-                    WriteFile(HexFileCopy,FileData,0)                     
-                       
-            if iHexFlag:
-                print(f'{Fore.GREEN}Writing Intel Hex Format File '+ IntelHexFile)
-                DataRow=[]
-                DataRow.append(list(SplitBy(DataStr,ByteRow*2)))
-                FileData=[]
-                FileData=ConvertToIntelHex(DataRow,Origin)
-                WriteFile(IntelHexFile,FileData,1)
-                if iHexDirFlag==1:
-                    print(f'{Fore.BLUE}Copying file '+ SourceName+' to '+IntelHexFileCopy)
-                    WriteFile(IntelHexFileCopy,FileData,1)                     
- 
-            if MnemonicFlag:
-                print(f'{Fore.GREEN}Writing Mnemonic File '+ MnemonicFile)
-                FileData=[]
-                FileData=CreateMnemonic(Data,Origin)
-                WriteMnemonic(MnemonicFile,FileData,Origin,SourceName)
\ No newline at end of file
+    if click.confirm(f'{Fore.MAGENTA}{Style.BRIGHT}Do you want to relocate the programs ?',default='n',show_default=False,prompt_suffix=' <N>'):
+        if Origin=='':
+            Origin=str(PromptHex(f'{Fore.MAGENTA}{Style.BRIGHT}Origin start at','0000'))
+        Settings['NewOrigin']=str(PromptHex(f'{Fore.MAGENTA}{Style.BRIGHT}Relocate to','0200'))
+        Settings['Workspace']=str(PromptHex(f'{Fore.MAGENTA}{Style.BRIGHT}Workspace size past the end moved as well','00'))
+        Settings['DisplayAdjust']=str(PromptHex(f'{Fore.MAGENTA}{Style.BRIGHT}Display y offset','00'))
+    Settings['Origin']=Origin
+
+    Jobs=os.cpu_count() or 1
+    Settings['Jobs'] = int(click.prompt(f'{Fore.YELLOW}Number of files to convert in parallel' ,default=Jobs,type=click.IntRange(1, 256),hide_input=False,show_default=False,prompt_suffix=' <'+str(Jobs)+'> : '))
+
+    print('\n')
+    ConvertAll(Settings)
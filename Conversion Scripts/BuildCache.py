@@ -0,0 +1,61 @@
+# BuildCache.py
+# Author : Costas Skordis
+#
+# Incremental rebuild cache for the conversion scripts.
+# A manifest (.chip8cache.json) in the target directory records for every converted
+# file a key made of the content hash of the source file and all settings that change
+# the output (frequencies, framerate, amplitude, leader, trailer, origin, byte row, rom).
+# Files whose key is unchanged and whose outputs still exist are skipped.
+#
+# Requires Python 3.1.2 or newer
+
+import os,json,hashlib
+if __package__:
+    from . import Output
+else:
+    import Output
+
+CacheName='.chip8cache.json'
+CacheVersion=1
+
+# Return the cache key of a source file converted with the given parameters
+def CacheKey(SourceFile,Params):
+    h=hashlib.sha256()
+    h.update(json.dumps(Params,sort_keys=True).encode())
+    with open(SourceFile,'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+# Load the cache section of a conversion from the target directory
+def LoadCache(TargetDir,Section):
+    try:
+        with open(os.path.join(TargetDir,CacheName),'r') as f:
+            Cache=json.load(f)
+    except (OSError,ValueError):
+        return {}
+    if Cache.get('Version')!=CacheVersion:
+        return {}
+    return Cache.get(Section,{})
+
+# Save the cache section of a conversion into the target directory
+def SaveCache(TargetDir,Section,Entries):
+    CacheFile=os.path.join(TargetDir,CacheName)
+    try:
+        with open(CacheFile,'r') as f:
+            Cache=json.load(f)
+        if Cache.get('Version')!=CacheVersion:
+            Cache={}
+    except (OSError,ValueError):
+        Cache={}
+    Cache['Version']=CacheVersion
+    Cache[Section]=Entries
+    Output.WriteText(CacheFile,json.dumps(Cache,indent=1,sort_keys=True))
+
+# Check if a cache entry is up to date with the key and all its outputs exist
+def IsCurrent(Entry,Key):
+    if Entry is None or Entry.get('Key')!=Key:
+        return False
+    for OutputFile in Entry.get('Outputs',[]):
+        if not os.path.isfile(OutputFile):
+            return False
+    return True
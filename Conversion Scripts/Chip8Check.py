@@ -0,0 +1,203 @@
+# Chip8Check.py
+# Author : Costas Skordis
+#
+# Regression check of the archive before it is published.
+# Every program in Software/binary is run headless with chip8vm for a number of frames
+# with scripted keypad input, the display is hashed at checkpoints and the fingerprints
+# are compared with the golden file Software/fingerprints.json. The Intel Hex file and
+# the decoded wav file of every program are checked to be byte identical to the binary.
+# Programs are checked in parallel, the exit code is 1 when anything does not match.
+#
+#   python Chip8Check.py --software ../Software
+#   python Chip8Check.py --software ../Software --update
+#
+# The key script is a JSON file with a list of [frame, keys] events per program name,
+# keys is a string of the hex digits held down from that frame, for example
+#   {"PONG": [[0, ""], [60, "1"], [90, "4"], [120, ""]]}
+# Programs without a script press each key in turn for 5 of every 30 frames.
+#
+# Requires Python 3.1.2 or newer, NumPy for the wav check
+
+import os,json,hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import click
+from colorama import Fore, init
+
+if __package__:
+    from . import chip8core,chip8ihex,chip8vm
+else:
+    import chip8core
+    import chip8ihex
+    import chip8vm
+
+GoldenName='fingerprints.json'
+SoftwareDir=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'Software')
+
+# Keys held down at a frame when a program has no script
+def default_keys(frame):
+    return [frame//30 % 16] if frame % 30<5 else []
+
+# Keys held down at every frame of a script
+def script_keys(events,frames):
+    keys=[]
+    held=[]
+    events=sorted(events)
+    pos=0
+    for frame in range(frames):
+        while pos<len(events) and events[pos][0]<=frame:
+            held=[int(key,16) for key in events[pos][1]]
+            pos+=1
+        keys.append(held)
+    return keys
+
+# Run a program and hash the display every Every frames. Returns the status and the
+# checkpoint hashes.
+def fingerprint(Image,Settings,events=None):
+    frames=Settings['Frames']
+    keys=script_keys(events,frames) if events is not None else [default_keys(frame) for frame in range(frames)]
+    vm=chip8vm.Chip8Blocks(origin=Image.origin)
+    checkpoints=[]
+    status='Ok'
+    try:
+        vm.load(Image)
+        for frame in range(frames):
+            vm.keys[:]=bytes(16)
+            for key in keys[frame]:
+                vm.keys[key]=1
+            vm.frame(Settings['Cycles'])
+            if (frame+1) % Settings['Every']==0:
+                checkpoints.append(hashlib.sha256(vm.framebuffer()).hexdigest()[:16])
+    except chip8vm.Chip8Error as e:
+        status=str(e)
+    return {'Status':status,'Checkpoints':checkpoints}
+
+# Find the file of a program, the archive keeps them in a directory per letter
+def find_file(Dir,Name,Ext):
+    for path in Path(Dir).rglob('*'+Ext):
+        if path.stem==Name:
+            return str(path)
+    return None
+
+# Compare the Intel Hex and wav images of a program with the binary
+def cross_check(Image,Name,Settings):
+    problems=[]
+    IntelHexFile=find_file(os.path.join(Settings['Software'],'ihex'),Name,'.hex')
+    if IntelHexFile is None:
+        problems.append('Intel Hex file missing')
+    else:
+        try:
+            h=chip8ihex.read(IntelHexFile)
+            if h.gaps or h.overlaps:
+                problems.append('Intel Hex file has gaps or overlapping records')
+            Hex=h.image()
+            if Hex.origin!=Image.origin or Hex.data!=Image.data:
+                problems.append('Intel Hex image %s differs from the binary' % Hex.address_range())
+        except chip8ihex.IntelHexError as e:
+            problems.append('Intel Hex file: '+str(e))
+    if Settings['Wav']:
+        if __package__:
+            from . import WavToHex
+        else:
+            import WavToHex
+        WavFile=find_file(os.path.join(Settings['Software'],'wav'),Name,'.wav')
+        if WavFile is None:
+            problems.append('Wav file missing')
+        else:
+            data,errors=WavToHex.decode_wav(WavFile,Settings['OnesFreq'],Settings['ZeroFreq'])
+            if errors:
+                problems.append('Wav file has parity errors at byte %s' % ', '.join(str(e) for e in errors))
+            address=WavToHex.parse_address(WavToHex.read_title(WavFile))
+            if address and address[0]!=Image.origin:
+                problems.append('Wav file starts at %04X' % address[0])
+            if data!=bytes(Image.data):
+                problems.append('Wav image of %d bytes differs from the binary' % len(data))
+    return problems
+
+def check_file(SourceFile,Settings,Scripts):
+    Name=Path(SourceFile).stem
+    Image=chip8core.read_binary(SourceFile,int(Settings['Origin'],16))
+    return Name,fingerprint(Image,Settings,Scripts.get(Name)),cross_check(Image,Name,Settings)
+
+# Settings the fingerprints depend on
+def fingerprint_params(Settings):
+    return {key:Settings[key] for key in ('Frames','Every','Cycles','Origin')}
+
+def check_all(Settings,Scripts):
+    Files=sorted(str(path) for path in Path(Settings['Software'],'binary').glob('*.ch8'))
+    if Settings['Jobs']>1 and len(Files)>1:
+        with ProcessPoolExecutor(max_workers=Settings['Jobs']) as executor:
+            Results=list(executor.map(check_file,Files,[Settings]*len(Files),[Scripts]*len(Files)))
+    else:
+        Results=[check_file(SourceFile,Settings,Scripts) for SourceFile in Files]
+
+    GoldenFile=Settings['Golden']
+    Params=fingerprint_params(Settings)
+    if Settings['Update']:
+        Golden={'Params':Params,'Programs':{Name:Print for Name,Print,Problems in Results}}
+        with open(GoldenFile,'w') as f:
+            json.dump(Golden,f,indent=1,sort_keys=True)
+        print(f'{Fore.CYAN}Updated '+GoldenFile)
+        Programs={}
+    else:
+        try:
+            with open(GoldenFile,'r') as f:
+                Golden=json.load(f)
+        except (OSError,ValueError):
+            raise click.ClickException('Golden file '+GoldenFile+' cannot be read, run with --update to create it')
+        if Golden.get('Params')!=Params:
+            raise click.ClickException('Golden file was made with %s, run with --update to change it' % Golden.get('Params'))
+        Programs=Golden['Programs']
+
+    p='{text0:<60}{text1}'
+    Failed=0
+    for Name,Print,Problems in Results:
+        if not Settings['Update']:
+            Expected=Programs.get(Name)
+            if Expected is None:
+                Problems.append('No golden fingerprint')
+            elif Expected['Status']!=Print['Status']:
+                Problems.append('Status %s, expected %s' % (Print['Status'],Expected['Status']))
+            elif Expected['Checkpoints']!=Print['Checkpoints']:
+                frame=next(n for n,(a,b) in enumerate(zip(Expected['Checkpoints']+[None],Print['Checkpoints']+[None])) if a!=b)
+                Problems.append('Display differs at frame %d' % ((frame+1)*Settings['Every']))
+        if Problems:
+            Failed+=1
+            for Problem in Problems:
+                print(f'{Fore.RED}'+p.format(text0=Name[:59],text1=Problem))
+        else:
+            print(f'{Fore.GREEN}'+p.format(text0=Name[:59],text1='Ok'))
+    for Name in sorted(set(Programs)-set(Name for Name,Print,Problems in Results)):
+        Failed+=1
+        print(f'{Fore.RED}'+p.format(text0=Name[:59],text1='Binary missing'))
+    print('%d programs checked, %d failed' % (len(Results),Failed))
+    return Failed
+
+@click.command()
+@click.option('--software',default=SoftwareDir,type=click.Path(exists=True,file_okay=False),show_default=True,help='Archive directory with the binary, ihex and wav directories.')
+@click.option('--golden',default=None,type=click.Path(dir_okay=False),help='Golden fingerprint file, by default fingerprints.json in the archive directory.')
+@click.option('--update',is_flag=True,default=False,help='Write the fingerprints to the golden file instead of comparing them.')
+@click.option('--frames',default=600,type=click.IntRange(1),show_default=True,help='Number of 60Hz frames to run each program.')
+@click.option('--every',default=60,type=click.IntRange(1),show_default=True,help='Number of frames between display checkpoints.')
+@click.option('--cycles',default=30,type=click.IntRange(1),show_default=True,help='Number of instructions per frame.')
+@click.option('--origin',default='0600',show_default=True,help='Origin start address in hex.')
+@click.option('--keys',default=None,type=click.Path(exists=True,dir_okay=False),help='JSON key script per program.')
+@click.option('--wav/--no-wav',default=True,show_default=True,help='Check the decoded wav files against the binaries.')
+@click.option('--ones-freq',default=1000,type=int,show_default=True,help='Bit 1 frequency of the wav files in Hz.')
+@click.option('--zero-freq',default=500,type=int,show_default=True,help='Bit 0 frequency of the wav files in Hz.')
+@click.option('--jobs',default=os.cpu_count() or 1,type=click.IntRange(1,256),show_default=True,help='Number of programs to check in parallel.')
+def main(software,golden,update,frames,every,cycles,origin,keys,wav,ones_freq,zero_freq,jobs):
+    """Run every archived program headless and check the archive files agree."""
+    init(autoreset=True)
+    Scripts={}
+    if keys:
+        with open(keys,'r') as f:
+            Scripts=json.load(f)
+    Settings={'Software':software,'Golden':golden or os.path.join(software,GoldenName),'Update':update,
+              'Frames':frames,'Every':every,'Cycles':cycles,'Origin':origin.upper(),'Wav':wav,
+              'OnesFreq':ones_freq,'ZeroFreq':zero_freq,'Jobs':jobs}
+    if check_all(Settings,Scripts):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# Chip8Convert.py
+# Author : Costas Skordis
+#
+# Non interactive command line for the conversion scripts so that the archive can
+# be regenerated unattended. Every prompt of BinToHexFileCLI.py and HexToWavFileCLI.py
+# is available as an option and presets can be loaded from a JSON or TOML profile
+# (see the profiles directory), options given on the command line override the profile.
+#
+#   python Chip8Convert.py bin2hex --source ../Software/binary --target ../Software --origin 0600
+#   python Chip8Convert.py --profile eti660 hex2wav --source ../Software/hex --target ../Software
+#   python Chip8Convert.py --profile eti660 all --source ../Software/binary --target ../Software
+#   python Chip8Convert.py --profile eti660 tape --source ../Software/hex --tape session.wav
+#
+# Running either script without arguments still starts the interactive prompts.
+#
+# Requires Python 3.1.2 or newer
+
+import os,json
+import click
+from colorama import init
+
+if __package__:
+    from . import chip8core,BinToHexFileCLI,HexToWavFileCLI,Synth
+    from .Prompts import IsHex
+else:
+    import chip8core
+    import BinToHexFileCLI
+    import HexToWavFileCLI
+    import Synth
+    from Prompts import IsHex
+
+ProfileDir=os.path.join(os.path.dirname(os.path.abspath(__file__)),'profiles')
+
+# Load a profile by file name or by name from the profiles directory
+def LoadProfile(Profile):
+    if not os.path.isfile(Profile):
+        for ext in ('.json','.toml'):
+            if os.path.isfile(os.path.join(ProfileDir,Profile+ext)):
+                Profile=os.path.join(ProfileDir,Profile+ext)
+                break
+        else:
+            raise click.BadParameter('Profile '+Profile+' does not exist',param_hint='--profile')
+    if Profile.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            # Python before 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise click.UsageError('TOML profiles need Python 3.11 or the tomli package (pip install tomli), use the JSON profile instead')
+        with open(Profile,'rb') as f:
+            return tomllib.load(f)
+    with open(Profile,'r') as f:
+        return json.load(f)
+
+# Make sure a directory ends with a separator as the conversions expect
+def DirName(Dir):
+    if not Dir.endswith(os.sep):
+        Dir = Dir + os.sep
+    return Dir
+
+# Check the value of an option is a valid hex value
+def HexOption(ctx,param,value):
+    if value is None:
+        return value
+    if not IsHex(value):
+        raise click.BadParameter('Please enter valid hexidecimal values')
+    return value.upper()
+
+# Settings of the timing of the conversion stages
+def TimingSettings(timing,timing_json,cprofile):
+    return {'Timing':timing,'TimingJson':timing_json,'ProfileDir':cprofile}
+
+def Bin2HexSettings(source,target,space,hex_copy,ihex,byte_row,origin,ihex_copy,mnemonic,flow,relocate,display_adjust,workspace,jobs,force,
+                    timing=False,timing_json=None,cprofile=None):
+    Settings={'SourceDir':DirName(source),'TargetDir':DirName(target),'HexFlag':1,
+            'HexSpace':' ' if space else '','HexDirFlag':int(hex_copy),
+            'iHexFlag':int(ihex),'iHexDirFlag':int(ihex and ihex_copy),'ByteRow':byte_row,
+            'MnemonicFlag':int(mnemonic),'FlowFlag':int(flow),'Origin':origin,
+            'NewOrigin':relocate,'DisplayAdjust':display_adjust,'Workspace':workspace,'Jobs':jobs,'Force':force}
+    Settings.update(TimingSettings(timing,timing_json,cprofile))
+    return Settings
+
+def Hex2WavSettings(source,target,wav,ones_freq,zero_freq,framerate,amplitude,leader,trailer,id3,
+                    rom,studio_rom,ihex,byte_row,origin,ihex_copy,jobs,force,timing=False,timing_json=None,cprofile=None,
+                    shape='legacy',sample_width=1):
+    Settings={'SourceDir':DirName(source),'TargetDir':DirName(target),'WavFileFlag':int(wav),
+              'OnesFreq':ones_freq,'ZeroFreq':zero_freq,'Framerate':framerate,'Amplitude':amplitude,
+              'Shape':shape,'SampleWidth':sample_width,
+              'Leader':leader,'Trailer':trailer,'Id3Flag':int(id3),'StudioRom':0,'RomData':b'',
+              'iHexFlag':int(ihex),'iHexDirFlag':int(ihex and ihex_copy),'ByteRow':byte_row,
+              'Origin':origin,'Jobs':jobs,'Force':force}
+    Settings.update(TimingSettings(timing,timing_json,cprofile))
+    if rom:
+        Settings['RomData'] = bytes(chip8core.read_hex(rom).data)
+        Settings['StudioRom']=int(studio_rom)
+    return Settings
+
+def TapeSettings(source,tape,gap,ones_freq,zero_freq,framerate,amplitude,shape,sample_width,leader,trailer,id3,rom,studio_rom,origin):
+    Settings=Hex2WavSettings(source,os.path.dirname(os.path.abspath(tape)),True,ones_freq,zero_freq,framerate,amplitude,
+                             leader,trailer,id3,rom,studio_rom,False,16,origin,False,1,True,
+                             shape=shape,sample_width=sample_width)
+    Settings.update({'TapeFile':tape,'Gap':gap})
+    return Settings
+
+# Options shared by the commands
+def source_option(help):
+    return click.option('--source',required=True,type=click.Path(exists=True,file_okay=False),help=help)
+
+target_option=click.option('--target',default=os.getcwd(),type=click.Path(file_okay=False),show_default=True,help='Target directory.')
+byte_row_option=click.option('--byte-row',default='16',type=click.Choice(['2','4','8','16','32']),callback=lambda ctx,param,value: int(value),show_default=True,help='Number of bytes per Intel Hex row.')
+origin_option=click.option('--origin',default='0000',callback=HexOption,show_default=True,help='Origin start address in hex.')
+ihex_option=click.option('--ihex/--no-ihex',default=True,show_default=True,help='Export Intel Hex files.')
+ihex_copy_option=click.option('--ihex-copy/--no-ihex-copy',default=True,show_default=True,help='Save Intel Hex files in a single directory as well.')
+jobs_option=click.option('--jobs',default=os.cpu_count() or 1,type=click.IntRange(1,256),show_default=True,help='Number of files to convert in parallel.')
+mnemonic_option=click.option('--mnemonic/--no-mnemonic',default=True,show_default=True,help='Export Chip8 Mnemonic files.')
+flow_option=click.option('--flow/--no-flow',default=True,show_default=True,help='Separate code from data in Mnemonic files by following the control flow.')
+relocate_option=click.option('--relocate',default=None,callback=HexOption,help='Relocate the programs from the origin to this address in hex.')
+workspace_option=click.option('--workspace',default=None,callback=HexOption,help='Size in hex of the workspace past the end of the programs relocated with them.')
+display_adjust_option=click.option('--display-adjust',default=None,callback=HexOption,help='Offset in hex added to the y coordinate loads of Show instructions.')
+force_option=click.option('--force',is_flag=True,default=False,help='Convert all files even if unchanged since the last run.')
+timing_options=[
+    click.option('--timing',is_flag=True,default=False,help='Time every stage of the conversion and print a summary.'),
+    click.option('--timing-json',default=None,type=click.Path(dir_okay=False),help='Write the timing summary to this JSON file.'),
+    click.option('--cprofile',default=None,type=click.Path(file_okay=False),help='Write the cProfile statistics of every process to this directory.')]
+
+bin2hex_options=[
+    click.option('--space/--no-space',default=True,show_default=True,help='Include spaces between hex values.'),
+    click.option('--hex-copy/--no-hex-copy',default=True,show_default=True,help='Save Hex files in a single directory as well.'),
+    ihex_option,byte_row_option,origin_option,ihex_copy_option,
+    mnemonic_option,flow_option,relocate_option,workspace_option,display_adjust_option,jobs_option,force_option]+timing_options
+
+encoding_options=[
+    click.option('--ones-freq',default='2400',type=click.Choice(['300','500','600','1000','1200','2400','4800','9600']),callback=lambda ctx,param,value: int(value),show_default=True,help='Bit 1 frequency in Hz.'),
+    click.option('--zero-freq',default='1200',type=click.Choice(['300','500','600','1200','2400','4800','9600']),callback=lambda ctx,param,value: int(value),show_default=True,help='Bit 0 frequency in Hz.'),
+    click.option('--framerate',default='22050',type=click.Choice(['4800','9600','11025','22050','44100','48000']),callback=lambda ctx,param,value: int(value),show_default=True,help='Framerate in Hz.'),
+    click.option('--amplitude',default=225,type=click.IntRange(0,255),show_default=True,help='Amplitude of the square waves.'),
+    click.option('--shape',default='legacy',type=click.Choice(Synth.SHAPES),show_default=True,help='Wave shape, legacy is the square wave with truncated cycle lengths of the archive.'),
+    click.option('--sample-width',default='8',type=click.Choice(['8','16']),callback=lambda ctx,param,value: int(value)//8,show_default=True,help='Bits per sample.'),
+    click.option('--leader',default=2,type=click.IntRange(0,60),show_default=True,help='Leader in seconds.'),
+    click.option('--trailer',default=0,type=click.IntRange(0,60),show_default=True,help='Trailer in seconds.'),
+    click.option('--id3/--no-id3',default=True,show_default=True,help='Write an ID3 tag as well as the RIFF INFO tags.'),
+    click.option('--rom',default=None,type=click.Path(exists=True,dir_okay=False),help='Rom file to add at the beginning of each program.'),
+    click.option('--studio-rom/--no-studio-rom',default=False,show_default=True,help='The rom file is a RCA Studio rom file.')]
+
+hex2wav_options=[
+    click.option('--wav/--no-wav',default=True,show_default=True,help='Export wav files.')]+encoding_options+[
+    ihex_option,byte_row_option,origin_option,ihex_copy_option,jobs_option,force_option]+timing_options
+
+def add_options(options):
+    def decorator(f):
+        for option in reversed(options):
+            f = option(f)
+        return f
+    return decorator
+
+@click.group()
+@click.option('--profile',default=None,help='Profile file or name of a profile in the profiles directory.')
+@click.pass_context
+def cli(ctx,profile):
+    """Convert CHIP-8 binaries to hex, Intel Hex, mnemonic and Kansas City Standard wav files."""
+    if profile:
+        Profile=LoadProfile(profile)
+        ctx.default_map={name:Profile for name in ctx.command.commands}
+
+@cli.command()
+@source_option('Binary source directory.')
+@target_option
+@add_options(bin2hex_options)
+def bin2hex(source,target,**options):
+    """Convert binary files to hex, Intel Hex and mnemonic files."""
+    init(autoreset=True)
+    BinToHexFileCLI.ConvertAll(Bin2HexSettings(source,target,**options))
+
+@cli.command()
+@source_option('Hexadecimal source directory.')
+@target_option
+@add_options(hex2wav_options)
+def hex2wav(source,target,**options):
+    """Convert hex files to wav and Intel Hex files."""
+    init(autoreset=True)
+    HexToWavFileCLI.convert_all(Hex2WavSettings(source,target,**options))
+
+@cli.command()
+@source_option('Hexadecimal source directory.')
+@click.option('--tape',required=True,type=click.Path(dir_okay=False),help='Tape wav file, the index is written next to it with a .json extension.')
+@click.option('--gap',default=1.0,type=click.FloatRange(0,60),show_default=True,help='Carrier between programs in seconds.')
+@add_options(encoding_options)
+@origin_option
+def tape(source,**options):
+    """Pack hex files into one tape wav file with an index of the programs."""
+    init(autoreset=True)
+    HexToWavFileCLI.convert_tape(TapeSettings(source,**options))
+
+@cli.command(name='all')
+@source_option('Binary source directory.')
+@target_option
+@mnemonic_option
+@flow_option
+@relocate_option
+@workspace_option
+@display_adjust_option
+@add_options(hex2wav_options)
+def all_command(source,target,mnemonic,flow,relocate,workspace,display_adjust,**options):
+    """Convert binary files to hex, Intel Hex and mnemonic files and then to wav files."""
+    init(autoreset=True)
+    # The hex files are read back from the single hex directory so it is always written
+    BinToHexFileCLI.ConvertAll(Bin2HexSettings(source,target,True,True,options['ihex'],options['byte_row'],
+                               options['origin'],options['ihex_copy'],mnemonic,flow,relocate,display_adjust,workspace,
+                               options['jobs'],options['force'],options['timing'],options['timing_json'],options['cprofile']))
+    # Intel Hex files were written from the binaries already
+    options['ihex']=False
+    if relocate:
+        options['origin']=relocate
+    HexToWavFileCLI.convert_all(Hex2WavSettings(os.path.join(target,'hex'),target,**options))
+
+if __name__ == '__main__':
+    cli()
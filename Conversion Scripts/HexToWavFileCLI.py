@@ -24,9 +24,20 @@
 #cassette tape input on various vintage home computers. See
 #http://en.wikipedia.org/wiki/Kansas_City_standard
 
-import wave
-import taglib
-from colorama import Fore, Back, Style, init
+import os,sys,time
+import struct
+if __package__:
+    from . import Synth,WavTags,Timing,Output,BuildCache,chip8core,chip8ihex
+    from .Prompts import PromptHex
+else:
+    import Synth
+    import WavTags
+    import Timing
+    import Output
+    import BuildCache
+    import chip8core
+    import chip8ihex
+    from Prompts import PromptHex
 
 # A few global parameters related to the encoding as defaults
 
@@ -35,8 +46,28 @@ ONES_FREQ = 2400       # Hz (per KCS)
 ZERO_FREQ = 1200       # Hz (per KCS)
 AMPLITUDE = 225        # Amplitude of generated square waves
 CENTER    = 128        # Center point of generated waves
+SHAPE     = 'legacy'   # Wave shape (see Synth), legacy is the truncated square wave
+SAMPLE_WIDTH = 1       # Bytes per sample, 1 for 8 bit and 2 for 16 bit
+BUFFER_SIZE = 65536    # Size of the output buffer used to stream wav files
 
-# Create a single square wave cycle of a given frequency
+# Set the encoding parameters and create the synthesizer of the waveforms that encode
+# 1s and 0s. one_pulse, zero_pulse and byte_table are the waveforms at phase 0, the
+# only phase of the legacy shape.
+def set_encoding(ones_freq,zero_freq,framerate,amplitude,shape='legacy',width=1):
+    global ONES_FREQ,ZERO_FREQ,FRAMERATE,AMPLITUDE,SHAPE,SAMPLE_WIDTH,synth,one_pulse,zero_pulse,byte_table
+    ONES_FREQ = ones_freq
+    ZERO_FREQ = zero_freq
+    FRAMERATE = framerate
+    AMPLITUDE = amplitude
+    SHAPE = shape
+    SAMPLE_WIDTH = width
+    synth = Synth.Synth(shape,framerate,ones_freq,zero_freq,amplitude,width)
+    one_pulse  = synth.cycle(1,0)[0]
+    zero_pulse = synth.cycle(0,0)[0]
+    byte_table = [chunk for chunk,phase in synth.table(0)]
+
+# Create a single square wave cycle of a given frequency, the legacy shape with the
+# cycle length truncated to a whole even number of samples
 def make_square_wave(freq,framerate):
     n = int(framerate/freq/2)
     return bytearray([CENTER-AMPLITUDE//2])*n + \
@@ -47,17 +78,6 @@ def HexToBin(hex_string):
   binary_string = ''.join(['{0:04b}'.format(int(d, 16)) for d in hex_string])  
   return binary_string
 
-# Check if string is a valid hex value
-def IsHex(s):
-    try:
-        n = int(s,16)
-        print(n)
-        if n<0:
-            return False
-        return True
-    except ValueError:
-        return False
-
 # Calculate parity using XOR 
 def parity(x):
     parity = 0
@@ -85,253 +105,394 @@ def encode_byte(byteval):
     encoded.extend(zero_pulse if (parity(int(byteval,16))) else one_pulse)
     return encoded
 
-# A generator to divide a sequence into chunks of n units.
-def SplitBy(seq, n):
-    while seq:
-        yield seq[:n]
-        seq = seq[n:]
-
-# Function to convert hex to intel Hex
-def ConvertToIntelHex(DataRow,Origin):    
-     iHex=[]
-     address = int(Origin, 16)
-     recordtype='00'
-     trailer=':00000001FF'
-     for v in DataRow:
-         for v1 in v:
-             v2=list(SplitBy(v1, 2))
-             chksum=0
-             bytecount=0
-             for h in v2:
-                 bytecount=bytecount+1
-                 chksum=chksum+int(h, 16)
-             
-             bytecount=hex(bytecount).replace('0x','')
-             bytecount=bytecount.rjust(2,'0')
- 
-             hexAdd=hex(address).replace('0x','')
-             hexAdd=hexAdd.rjust(4,'0')
-             hexAdd1=hexAdd[:2]
-             hexAdd2=hexAdd[2:]
-
-             chksum=chksum + int(bytecount,16) + int(hexAdd1,16) + int(hexAdd2,16) + int(recordtype,16)
-             chksum=hex(chksum).replace('x','')
-             chksum=int("0100",16)-int(chksum[-2:],16)
-             chksum=hex(chksum).replace('x','')[-2:].rjust(2,'0')
-             data=':' + bytecount + hexAdd + recordtype + ''.join(v2)+chksum
-             iHex.append(data.upper())
-             address=address + int(bytecount,16)
-     iHex.append(trailer)
-     return iHex
- 
-# Write a WAV file with encoded data. leader and trailer specify the
-# number of seconds of carrier signal to encode before and after the data
-def write_wav(filename,data,leader,trailer):  
-    w = wave.open(filename,"wb")
-    w.setnchannels(1)
-    w.setsampwidth(1)
-    w.setframerate(FRAMERATE)
-
-    # Write the leader
+# Build a table holding the complete waveform of each of the 256 byte values
+# (start bit, 8 data bits and parity bit) so a whole program can be encoded
+# with a single join instead of calling encode_byte for every byte.
+def make_byte_table(one_pulse,zero_pulse):
+    table=[]
+    for byteval in range(256):
+        encoded = bytearray(zero_pulse)
+        for i in range(7,-1,-1):
+            encoded.extend(one_pulse if (byteval>>i) & 1 else zero_pulse)
+        encoded.extend(zero_pulse if parity(byteval) else one_pulse)
+        table.append(bytes(encoded))
+    return table
+
+# Encode bytes into one waveform using the byte table
+def encode_bytes(data,table):
+    return b''.join([table[byteval] for byteval in data])
+
+# Generator returning the carrier for the leader or trailer one second at a time.
+# A second of carrier ends at the phase it started.
+def carrier(seconds,phase=0):
+    second = synth.second(phase)
+    for x in range(seconds):
+        yield second
+
+# Generator returning the waveform of the bytes of data from a phase. The phase
+# after each byte is stored in state[0].
+def data_chunks(values,state):
+    phase = state[0]
+    table = synth.table(phase)
+    for byteval in values:
+        chunk,next_phase = table[byteval]
+        if next_phase!=phase:
+            phase = next_phase
+            table = synth.table(phase)
+            state[0] = phase
+        yield chunk
+
+# Generator returning the waveform of leader, data and trailer
+def wav_chunks(values,leader,trailer):
+    state = [0]
     if leader:
-        for x in range(leader):
-            w.writeframes(one_pulse*(int(FRAMERATE/len(one_pulse))))
- 
-    # Encode the actual data
-    for byteval in data:
-        if byteval!='':
-            w.writeframes(encode_byte(byteval))
-  
-    # Write the trailer
+        yield from carrier(leader)
+    yield from data_chunks(values,state)
     if trailer:
-        for x in range(trailer):
-            w.writeframes(one_pulse*(int(FRAMERATE/len(one_pulse))))
-    w.close()
+        yield from carrier(trailer,state[0])
+
+# Create the RIFF header of a mono 8 or 16 bit PCM wav file holding size bytes of
+# data followed by extra bytes of other chunks, at the framerate and sample width of
+# the encoding set unless given
+def wav_header(size,extra=0,framerate=None,width=None):
+    framerate=framerate or FRAMERATE
+    width=width or SAMPLE_WIDTH
+    return struct.pack('<4sI4s4sIHHIIHH4sI',b'RIFF',36+size+(size & 1)+extra,b'WAVE',b'fmt ',16,1,1,
+                       framerate,framerate*width,width,8*width,b'data',size)
+
+# Write a WAV file with encoded data. leader and trailer specify the
+# number of seconds of carrier signal to encode before and after the data.
+# The data is a generator of byte values.
+def write_wav(filename,values,leader,trailer,tags=b''):
+    write_chunks(filename,wav_chunks(values,leader,trailer),tags)
+
+# Write a WAV file from a generator of waveform chunks. The waveform is streamed
+# through a fixed size buffer so memory use does not depend on the program or leader
+# size. The tags are RIFF chunks written after the data (see WavTags) and the
+# header is written once the data size is known. The file replaces filename once it
+# is complete (see Output).
+def write_chunks(filename,chunks,tags=b''):
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    pos = 0
+    with Timing.stage('encode'), Output.AtomicFile(filename,'wb') as f:
+        f.write(wav_header(0))
+        for chunk in chunks:
+            n = len(chunk)
+            if pos+n > BUFFER_SIZE:
+                with Timing.stage('write'):
+                    f.write(view[:pos])
+                pos = 0
+                if n > BUFFER_SIZE:
+                    with Timing.stage('write'):
+                        f.write(chunk)
+                    continue
+            view[pos:pos+n] = chunk
+            pos = pos+n
+        with Timing.stage('write'):
+            f.write(view[:pos])
+            size = f.tell()-len(wav_header(0))
+            if size & 1:
+                f.write(b'\0')
+            f.write(tags)
+            f.seek(0)
+            f.write(wav_header(size,len(tags)))
 
 # Write file
 def write_file(TargetFile,FileData,NewLine):
-    f = open(TargetFile, "w")
-    for data in FileData:
-        if NewLine==1:
-            data=data+"\n"
-        f.write(data)
-    f.close()  
-
-# Write tag
-def write_tag(filename,text1,text2):
-    with taglib.File(filename) as file:    
-        file.tags["ALBUM"] = [text1]
-        file.tags["TITLE"] = [text2]
-        file.save()
-
-def PromptHex(prompt, default=None):
-    if default!='':
-        prompt=prompt+' <'+str(default)+'> :'   
-    while True:     
-        resp=input(prompt).upper()
-        if len(resp)==0 and default!='':
-            resp=default
-        resp=str(resp)   
-        if not IsHex(resp):
-                print('Invalid entry. Please enter valid hexidecimal values')
+    if NewLine==1:
+        FileData=[data+"\n" for data in FileData]
+    Output.WriteText(TargetFile,''.join(FileData))
+
+# Prepare a worker process for the conversion of files
+def init_worker(Settings):
+    from colorama import init
+    init(autoreset=True)
+    if Settings['WavFileFlag']:
+        set_encoding(Settings['OnesFreq'],Settings['ZeroFreq'],Settings['Framerate'],Settings['Amplitude'],
+                     Settings.get('Shape','legacy'),Settings.get('SampleWidth',1))
+
+# Read a hex file with the rom file added at the beginning
+def read_image(SourceFile,Settings):
+    Image=chip8core.read_hex(SourceFile,int(Settings['Origin'],16))
+    RomData=Settings['RomData']
+    if Settings['StudioRom']==1:
+        # Only take Rom from 0000 to 03FF and append software from 0200 onwards
+        Image.data[:256]=RomData[:1024]
+    else:
+        ##Image.data[:0]=RomData[:1536]
+        Image.data[:0]=RomData
+    return Image
+
+# Convert a single hex file into wav and intel hex files.
+# Returns the index line of the wav file, or None when no wav file is created,
+# and the list of files written.
+def convert_file(SourceFile,Settings):
+    from pathlib import Path
+    from colorama import Fore
+    FileName=os.path.splitext(os.path.basename(SourceFile))[0]
+    AlphaName=FileName[0]
+    IndexLine=None
+    Outputs=[]
+
+    with Timing.stage('read'):
+        Image=read_image(SourceFile,Settings)
+    Timing.count(len(Image))
+
+    Address=Image.address_range()
+
+    if Settings['WavFileFlag']:
+        AlphaDir=os.path.join(Settings['WavDir'],AlphaName)
+        Output.MakeDirs(AlphaDir)
+        TargetFile=os.path.join(AlphaDir, FileName+'.wav')
+        print(f'{Fore.LIGHTMAGENTA_EX}Creating wav file '+ TargetFile)
+        FName=Path(TargetFile).resolve().stem
+        # The name is the album and the address range the title of the wav file
+        with Timing.stage('tag'):
+            Tags=WavTags.tag_chunks(Address,FName,Settings.get('Id3Flag',1))
+        write_wav(TargetFile,Image.view(),Settings['Leader'],Settings['Trailer'],Tags)
+        # Format the index line
+        f='{text1:.<70}{text2:15}'
+        IndexLine=f.format(text1=FName,text2=Address)
+        Outputs.append(TargetFile)
+
+    if Settings['iHexFlag']:
+        AlphaDir=os.path.join(Settings['IntelHexDir'],AlphaName)
+        Output.MakeDirs(AlphaDir)
+        IntelHexFile=os.path.join(AlphaDir,FileName+'.hex')
+        print(f'{Fore.GREEN}Writing Intel Hex Format File '+ IntelHexFile)
+        with Timing.stage('ihex'):
+            Output.WriteText(IntelHexFile,chip8ihex.hex_text(Image,Settings['ByteRow']))
+        Outputs.append(IntelHexFile)
+        if Settings['iHexDirFlag']:
+            IntelHexFileCopy=os.path.join(Settings['IntelHexDir'],FileName+'.hex')
+            print(f'{Fore.YELLOW}Copying file '+ FileName+' to '+IntelHexFileCopy)
+            with Timing.stage('ihex'):
+                Output.LinkCopy(IntelHexFile,IntelHexFileCopy)
+            Outputs.append(IntelHexFileCopy)
+    return IndexLine,Outputs
+
+# Return the settings that change the output of a conversion for the build cache
+def cache_params(Settings):
+    import hashlib
+    Params={'Version':'1.1','Origin':Settings['Origin'],'StudioRom':Settings['StudioRom'],
+            'Rom':hashlib.sha256(Settings['RomData']).hexdigest(),
+            'WavFileFlag':Settings['WavFileFlag'],'iHexFlag':Settings['iHexFlag'],'iHexDirFlag':Settings['iHexDirFlag']}
+    if Settings['WavFileFlag']:
+        for Name in ('OnesFreq','ZeroFreq','Framerate','Amplitude','Leader','Trailer'):
+            Params[Name]=Settings[Name]
+        Params['Id3Flag']=Settings.get('Id3Flag',1)
+        # Only set when not the default so older caches stay valid
+        for Name,Default in (('Shape','legacy'),('SampleWidth',1)):
+            if Settings.get(Name,Default)!=Default:
+                Params[Name]=Settings[Name]
+    if Settings['iHexFlag']:
+        Params['ByteRow']=Settings['ByteRow']
+    return Params
+
+# Convert all hex files of the source directory. With more than one job the
+# files are converted in parallel worker processes, the index file is always
+# written in sorted file order. Files unchanged since the last conversion with
+# the same settings are skipped unless Force is set.
+def convert_all(Settings):
+    from concurrent.futures import ProcessPoolExecutor
+    from pathlib import Path
+    from colorama import Fore
+    TargetDir=Settings['TargetDir']
+    # Create new directories if they don't exist
+    if Settings['WavFileFlag']:
+        Settings['WavDir'] = os.path.join(TargetDir, 'wav')
+        IndexDir=os.path.join(Settings['WavDir'], 'Index')
+        Output.MakeDirs(IndexDir)
+    if Settings['iHexFlag']:
+        Settings['IntelHexDir']=os.path.join(TargetDir, 'ihex')
+        Output.MakeDirs(Settings['IntelHexDir'])
+
+    Files=sorted(str(path) for path in Path(Settings['SourceDir']).glob('*.hex'))
+    Cache={} if Settings.get('Force') else BuildCache.LoadCache(TargetDir,'hex2wav')
+    Params=cache_params(Settings)
+    Entries={}
+    Convert=[]
+    for SourceFile in Files:
+        Key=BuildCache.CacheKey(SourceFile,Params)
+        Entry=Cache.get(os.path.basename(SourceFile))
+        if BuildCache.IsCurrent(Entry,Key):
+            print(f'{Fore.CYAN}Skipping unchanged file '+ SourceFile)
+            Entries[os.path.basename(SourceFile)]=Entry
+        else:
+            Entries[os.path.basename(SourceFile)]={'Key':Key}
+            Convert.append(SourceFile)
+
+    Start=time.perf_counter()
+    ConvertFunc=Timing.wrap(convert_file,Settings)
+    if Settings['Jobs']>1 and len(Convert)>1:
+        with ProcessPoolExecutor(max_workers=Settings['Jobs'],initializer=init_worker,initargs=(Settings,)) as executor:
+            Results=list(executor.map(ConvertFunc,Convert,[Settings]*len(Convert)))
+    else:
+        init_worker(Settings)
+        Results=[ConvertFunc(SourceFile,Settings) for SourceFile in Convert]
+    Results,Records=Timing.split(Results,Settings)
+
+    for SourceFile,(IndexLine,Outputs) in zip(Convert,Results):
+        Entries[os.path.basename(SourceFile)].update({'Index':IndexLine,'Outputs':Outputs})
+    BuildCache.SaveCache(TargetDir,'hex2wav',Entries)
+
+    if Settings['WavFileFlag']:
+        Lines=[Entries[os.path.basename(SourceFile)]['Index'] for SourceFile in Files]
+        for IndexLine in Lines:
+            print(IndexLine)
+        Output.WriteText(os.path.join(IndexDir, 'Index.txt'),''.join(IndexLine+'\n' for IndexLine in Lines))
+
+    Timing.report(Settings,'hex2wav',Records,time.perf_counter()-Start)
+
+# Generator returning the waveform of a tape holding many programs, a leader before
+# the first program, a gap of carrier (seconds, may be a fraction) between programs
+# and a trailer after the last. Programs is a generator of (Record, byte values), the
+# sample offsets of each program are stored in its Record as it is encoded:
+# Offset where its leader or gap starts, Data its first start bit and End the sample
+# after its last parity bit.
+def tape_chunks(Programs,leader,gap,trailer):
+    cycles = max(1,round(gap*FRAMERATE*synth.q/synth.lengths[1]))
+    state = [0]
+    pos = 0
+    for n,(Record,values) in enumerate(Programs):
+        Record['Offset'] = pos
+        if n==0:
+            chunks = carrier(leader)
+        elif gap:
+            chunk,state[0] = synth.ones(cycles,state[0])
+            chunks = [chunk]
         else:
-            break
-    return resp
-    
+            chunks = []
+        for chunk in chunks:
+            pos = pos+len(chunk)//SAMPLE_WIDTH
+            yield chunk
+        Record['Data'] = pos
+        for chunk in data_chunks(values,state):
+            pos = pos+len(chunk)//SAMPLE_WIDTH
+            yield chunk
+        Record['End'] = pos
+    if trailer:
+        yield from carrier(trailer,state[0])
+
+# Generator returning the index record and the image of every hex file of a tape
+def tape_programs(Files,Settings,Records):
+    from pathlib import Path
+    from colorama import Fore
+    for SourceFile in Files:
+        Image=read_image(SourceFile,Settings)
+        Record={'Name':Path(SourceFile).stem,'Address':Image.address_range(),'Origin':Image.origin,'Size':len(Image)}
+        Records.append(Record)
+        print(f'{Fore.LIGHTMAGENTA_EX}Adding '+Record['Name'])
+        yield Record,Image.view()
+
+# Pack all hex files of the source directory into one tape wav file instead of a wav
+# file per program, so a whole session loads without swapping files. The sidecar
+# index next to the tape (same name with a .json extension) lists the name and
+# address range of every program, as in Index.txt, with its sample offsets so a
+# player can seek straight to a program (see WavToHex.decode_tape).
+def convert_tape(Settings):
+    import json
+    from pathlib import Path
+    from colorama import Fore
+    TapeFile=Settings['TapeFile']
+    Files=sorted(str(path) for path in Path(Settings['SourceDir']).glob('*.hex'))
+    if os.path.dirname(TapeFile):
+        Output.MakeDirs(os.path.dirname(TapeFile))
+    set_encoding(Settings['OnesFreq'],Settings['ZeroFreq'],Settings['Framerate'],Settings['Amplitude'],
+                 Settings.get('Shape','legacy'),Settings.get('SampleWidth',1))
+    print(f'{Fore.LIGHTMAGENTA_EX}Creating tape file '+ TapeFile)
+    Records=[]
+    Tags=WavTags.tag_chunks('%d programs' % len(Files),Path(TapeFile).stem,Settings.get('Id3Flag',1))
+    write_chunks(TapeFile,tape_chunks(tape_programs(Files,Settings,Records),Settings['Leader'],
+                 Settings['Gap'],Settings['Trailer']),Tags)
+    Index={'Tape':os.path.basename(TapeFile),'Framerate':FRAMERATE,'OnesFreq':ONES_FREQ,'ZeroFreq':ZERO_FREQ,
+           'Shape':SHAPE,'SampleWidth':SAMPLE_WIDTH,'Leader':Settings['Leader'],'Gap':Settings['Gap'],'Trailer':Settings['Trailer'],
+           'Programs':Records}
+    IndexFile=os.path.splitext(TapeFile)[0]+'.json'
+    Output.WriteText(IndexFile,json.dumps(Index,indent=1))
+    print(f'{Fore.GREEN}Writing tape index '+ IndexFile)
+    # Same layout as Index.txt with the time of the first start bit of each program
+    f='{text1:.<70}{text2:15}{text3:>10}'
+    for Record in Records:
+        print(f.format(text1=Record['Name'],text2=Record['Address'],
+                       text3='%d:%06.3f' % divmod(Record['Data']/FRAMERATE,60)))
+    return Index
+
 if __name__ == '__main__':
-    import os,sys
     import click
-    from pathlib import Path
-    
-   
-    if len(sys.argv) != 1:
-        print("Usage : %s" % sys.argv[0],file=sys.stderr)
-        raise SystemExit(1)
-  
-    iHexFlag=0
-    iHexDirFlag=0
-    WavFileFlag=0
-    StudioRom=0
-    os.system('cls')
+    from colorama import Fore, Back, Style, init
+
+    # Options on the command line run the conversion without prompts
+    if len(sys.argv) > 1:
+        if __package__:
+            from .Chip8Convert import hex2wav
+        else:
+            from Chip8Convert import hex2wav
+        hex2wav()
+
+    Settings={'WavFileFlag':0,'iHexFlag':0,'iHexDirFlag':0,'StudioRom':0,'RomData':b''}
+    click.clear()
     init(autoreset=True)
     print(f'{Fore.RED}{Style.BRIGHT}Hexadecimal To Kansas City Standard Wav File Conversion\n')
     print(f'{Fore.YELLOW}{Style.BRIGHT}Kansas City Standard Settings')
     if click.confirm(f'{Fore.YELLOW}Do you want to export wav files?',default='Y'):
-        ONES_FREQ = int(click.prompt(f'{Fore.YELLOW}Bit 1 Frequency Hz' ,default=str(ONES_FREQ), type=click.Choice(['300','500','600','1000','1200','2400','4800','9600']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+str(ONES_FREQ)+'> :'))
-        ZERO_FREQ = int(click.prompt(f'{Fore.YELLOW}Bit 0 Frequency Hz' ,default=str(ZERO_FREQ), type=click.Choice(['300','500','600','1200','2400','4800','9600']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+str(ZERO_FREQ)+'> :'))
-        FRAMERATE = int(click.prompt(f'{Fore.YELLOW}Framerate Hz' ,default=str(FRAMERATE), type=click.Choice(['4800','9600','11025','22050','44100','48000']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+str(FRAMERATE)+'> :'))
-        AMPLITUDE = int(click.prompt(f'{Fore.YELLOW}Amplitude' ,default=str(AMPLITUDE), type=click.IntRange(0, 255),hide_input=False,show_default=False,prompt_suffix=' <'+str(AMPLITUDE)+'> :'))
-        Leader = int(click.prompt(f'{Fore.YELLOW}Leader in seconds' ,default=2,type=click.IntRange(0, 60),hide_input=False,show_default=False,prompt_suffix=' <2> :'))
-        Trailer = int(click.prompt(f'{Fore.YELLOW}Trailer in seconds',default=0,type=click.IntRange(0, 60),hide_input=False,show_default=False,prompt_suffix=' <0> :'))
-        WavFileFlag=1
-        
-        # Create the wave patterns that encode 1s and 0s
-        one_pulse  = make_square_wave(ONES_FREQ,FRAMERATE)
-        zero_pulse = make_square_wave(ZERO_FREQ,FRAMERATE)
-   
+        Settings['OnesFreq'] = int(click.prompt(f'{Fore.YELLOW}Bit 1 Frequency Hz' ,default=str(ONES_FREQ), type=click.Choice(['300','500','600','1000','1200','2400','4800','9600']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+str(ONES_FREQ)+'> :'))
+        Settings['ZeroFreq'] = int(click.prompt(f'{Fore.YELLOW}Bit 0 Frequency Hz' ,default=str(ZERO_FREQ), type=click.Choice(['300','500','600','1200','2400','4800','9600']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+str(ZERO_FREQ)+'> :'))
+        Settings['Framerate'] = int(click.prompt(f'{Fore.YELLOW}Framerate Hz' ,default=str(FRAMERATE), type=click.Choice(['4800','9600','11025','22050','44100','48000']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+str(FRAMERATE)+'> :'))
+        Settings['Amplitude'] = int(click.prompt(f'{Fore.YELLOW}Amplitude' ,default=str(AMPLITUDE), type=click.IntRange(0, 255),hide_input=False,show_default=False,prompt_suffix=' <'+str(AMPLITUDE)+'> :'))
+        Settings['Shape'] = click.prompt(f'{Fore.YELLOW}Wave shape' ,default=SHAPE, type=click.Choice(Synth.SHAPES),hide_input=False,show_choices=True,show_default=False,prompt_suffix=' <'+SHAPE+'> :')
+        Settings['SampleWidth'] = int(click.prompt(f'{Fore.YELLOW}Bits per sample' ,default='8', type=click.Choice(['8','16']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <8> :'))//8
+        Settings['Leader'] = int(click.prompt(f'{Fore.YELLOW}Leader in seconds' ,default=2,type=click.IntRange(0, 60),hide_input=False,show_default=False,prompt_suffix=' <2> :'))
+        Settings['Trailer'] = int(click.prompt(f'{Fore.YELLOW}Trailer in seconds',default=0,type=click.IntRange(0, 60),hide_input=False,show_default=False,prompt_suffix=' <0> :'))
+        Settings['WavFileFlag']=1
+
     print('\n')
     print(f'{Fore.GREEN}{Style.BRIGHT}File Settings')
     SourceDir = click.prompt(f'{Fore.GREEN}Hexadecimal Source Directory', type=click.Path(exists=True), default=os.getcwd(),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+os.getcwd()+'> : ')
     if not SourceDir.endswith(os.sep):
         SourceDir = SourceDir + os.sep
+    Settings['SourceDir']=SourceDir
 
     TargetDir = click.prompt(f'{Fore.GREEN}Export Target Directory', type=click.Path(exists=False), default=os.getcwd(),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <'+os.getcwd()+'> : ')
     if not TargetDir.endswith(os.sep):
         TargetDir = TargetDir + os.sep
+    Settings['TargetDir']=TargetDir
 
     RomFile = click.prompt(f'{Fore.GREEN}Rom File', type=click.Path(exists=False),default='.',hide_input=False,show_choices=False,show_default=False)
-    
+
     if RomFile=='.':
-        RomFile=''   
+        RomFile=''
     elif not os.path.isfile(RomFile):
         print(f'{Fore.WHITE}{Back.RED}{Style.BRIGHT}Rom file '+RomFile+' does not exist. Proceeding without rom file')
-        RomFile='' 
+        RomFile=''
 
     if RomFile!='':
         if click.confirm(f'{Fore.GREEN}Is this a RCA Studio rom File?',default='n'):
-            StudioRom=1
+            Settings['StudioRom']=1
         else:
-            StudioRom=0
+            Settings['StudioRom']=0
 
     print('\n')
     print(f'{Fore.MAGENTA}{Style.BRIGHT}Hexadecimal Settings')
     if click.confirm(f'{Fore.MAGENTA}Do you want to export to Intel Hex files ?',default='Y'):
-        
-        ByteRow=int(click.prompt(f'{Fore.MAGENTA}Number of Bytes per row:',default='16',type=click.Choice(['2','4','8','16','32']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <16> : '))
-        Origin=str(PromptHex(f'{Fore.MAGENTA}Origin start at','0000'))
-        iHexFlag=1
+
+        Settings['ByteRow']=int(click.prompt(f'{Fore.MAGENTA}Number of Bytes per row:',default='16',type=click.Choice(['2','4','8','16','32']),hide_input=False,show_choices=False,show_default=False,prompt_suffix=' <16> : '))
+        Settings['Origin']=str(PromptHex(f'{Fore.MAGENTA}Origin start at','0000'))
+        Settings['iHexFlag']=1
         if click.confirm(f'{Fore.MAGENTA}Do you want to save hex files in one directory as well ?',default='Y'):
-            iHexDirFlag=1
-   
-    if not iHexFlag:
-        Origin=str(PromptHex(f'{Fore.MAGENTA}Origin start at','0000'))
+            Settings['iHexDirFlag']=1
+
+    if not Settings['iHexFlag']:
+        Settings['Origin']=str(PromptHex(f'{Fore.MAGENTA}Origin start at','0000'))
+
+    Jobs=os.cpu_count() or 1
+    Settings['Jobs'] = int(click.prompt(f'{Fore.MAGENTA}Number of files to convert in parallel' ,default=Jobs,type=click.IntRange(1, 256),hide_input=False,show_default=False,prompt_suffix=' <'+str(Jobs)+'> :'))
 
-    # Create new directories if they don't exist
-    if WavFileFlag:
-        WavDir = os.path.join(TargetDir, 'wav')
-        if not os.path.exists(WavDir):
-            os.makedirs(WavDir)
-        IndexDir=os.path.join(WavDir, 'Index')
-        if not os.path.exists(IndexDir):
-            os.makedirs(IndexDir)
-        IndexFile=os.path.join(IndexDir, 'Index.txt')
-        index=open(IndexFile,"w")
-    
-    if iHexFlag:
-        IntelHexDir=os.path.join(TargetDir, 'ihex')
-        if not os.path.exists(IntelHexDir):
-            os.makedirs(IntelHexDir)    
-        
-    RomDataStr=[]
     if os.path.isfile(RomFile):
-        obj = open(RomFile,"r")
-        RomDataStr = obj.read().split(' ')
+        Settings['RomData'] = bytes(chip8core.read_hex(RomFile).data)
         print(f'{Fore.BLUE}ROM File')
-        print(RomDataStr)
-
-    for path in Path(SourceDir).glob('*.hex'):
-        SourceFile=os.path.join(SourceDir, path)
-        FileName=os.path.splitext(path.name)[0]
-        AlphaName=FileName[0]
-               
-        if WavFileFlag:
-            AlphaDir=os.path.join(WavDir,AlphaName)
-            if not os.path.exists(AlphaDir):
-                os.makedirs(AlphaDir)    
-            TargetFile=os.path.join(AlphaDir, FileName+'.wav')
-        
-        if iHexFlag:
-            AlphaDir=os.path.join(IntelHexDir,AlphaName)
-            if not os.path.exists(AlphaDir):
-                os.makedirs(AlphaDir) 
-            
-            IntelHexFile=os.path.join(AlphaDir,FileName+'.hex')
-            if iHexDirFlag:
-                IntelHexFileCopy=os.path.join(IntelHexDir,FileName+'.hex')
-         
-        obj = open(SourceFile,"r")
-        
-        Data = obj.read().split(' ')
-       
-        if StudioRom==1:
-            # Only take Rom from 0000 to 03FF and append software from 0200 onwards
-            Data = RomDataStr[:1024] + Data[256:]
-        else:
-            ##Data = RomDataStr[:1536] + Data
-            Data=RomDataStr+Data
-        
-        DataLen=len(Data)
-        pages=str(-(-DataLen // 256))
-        Address1=hex(int(Origin,16)).replace('x','').upper()
-        Address1=Address1.rjust(4,'0')
-        Address2=hex(DataLen+int(Origin,16)-1).replace('x','')
-        Address2=Address2.upper()
-        if len(Address2)>4:
-            Address2=Address2[1:]
-        Address2=str(Address2.upper()).zfill(4)
-        Address=Address1+' - '+Address2+' ('+ pages +')'
-        
-        if WavFileFlag:
-            print('\n')
-            print(f'{Fore.LIGHTMAGENTA_EX}Creating wav file '+ TargetFile)
-            write_wav(TargetFile,Data,Leader,Trailer)
-            FName=Path(TargetFile).resolve().stem
-            # Format and create index file
-            f='{text1:.<70}{text2:15}'
-            print(f.format(text1=FName,text2=Address))
-            index.write(f.format(text1=FName,text2=Address)+'\n')
-            write_tag(TargetFile,FName,Address)
-                    
-        if iHexFlag:
-            DataStr = ''.join(Data)
-            DataRow=[]
-            DataRow.append(list(SplitBy(DataStr,ByteRow*2)))
-            FileData=[]
-            FileData=ConvertToIntelHex(DataRow,Origin)
-            print(f'{Fore.GREEN}Writing Intel Hex Format File '+ IntelHexFile)   
-            write_file(IntelHexFile,FileData,1)
-            if iHexDirFlag:
-                print(f'{Fore.YELLOW}Copying file '+ FileName+' to '+IntelHexFileCopy)
-                write_file(IntelHexFileCopy,FileData,1)             
-if WavFileFlag:
-    index.close()
\ No newline at end of file
+        print(Settings['RomData'].hex(' ').upper())
+
+    print('\n')
+    convert_all(Settings)
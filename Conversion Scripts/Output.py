@@ -0,0 +1,94 @@
+# Output.py
+# Author : Costas Skordis
+#
+# Output files of the conversion scripts.
+# Every file is built in memory and written with a single call into a temporary file
+# next to it, then moved over the target with os.replace, so a reader or an
+# interrupted run only ever sees the old file or the complete new one, never a
+# truncated one. The copies of the single directory options are hard links to the
+# file just written instead of a second write, and fall back to a copy where the file
+# system has no hard links. Writes never change a file in place, so a copy and its
+# original never change together. The outputs of duplicate programs are symbolic
+# links to the outputs of the first one. Directories created are remembered, so
+# converting a directory does one makedirs per letter instead of one per file.
+#
+# Requires Python 3.1.2 or newer
+
+import os,shutil
+from contextlib import contextmanager
+
+CreatedDirs=set()
+
+# Create a directory and its parents once per process
+def MakeDirs(Dir):
+    if Dir not in CreatedDirs:
+        os.makedirs(Dir,exist_ok=True)
+        CreatedDirs.add(Dir)
+
+# Hidden temporary file next to a target file, one per process
+def TempName(TargetFile):
+    Dir,Name=os.path.split(TargetFile)
+    return os.path.join(Dir,'.%s.%d.tmp' % (Name,os.getpid()))
+
+# Open a temporary file for writing that replaces the target file when it is closed
+# without error and is removed otherwise
+@contextmanager
+def AtomicFile(TargetFile,Mode='w'):
+    TempFile=TempName(TargetFile)
+    try:
+        f=open(TempFile,Mode)
+    except FileNotFoundError:
+        # The directory was removed since it was created
+        Dir=os.path.dirname(TargetFile)
+        CreatedDirs.discard(Dir)
+        MakeDirs(Dir or '.')
+        f=open(TempFile,Mode)
+    try:
+        with f:
+            yield f
+        os.replace(TempFile,TargetFile)
+    except BaseException:
+        try:
+            os.remove(TempFile)
+        except OSError:
+            pass
+        raise
+
+# Write a text file in a single call
+def WriteText(TargetFile,Text):
+    with AtomicFile(TargetFile,'w') as f:
+        f.write(Text)
+
+# Write a binary file in a single call
+def WriteBytes(TargetFile,Data):
+    with AtomicFile(TargetFile,'wb') as f:
+        f.write(Data)
+
+# Make TargetFile a copy of SourceFile, a hard link when the file system allows it
+def LinkCopy(SourceFile,TargetFile):
+    TempFile=TempName(TargetFile)
+    try:
+        try:
+            os.link(SourceFile,TempFile)
+        except FileExistsError:
+            os.remove(TempFile)
+            os.link(SourceFile,TempFile)
+    except OSError:
+        shutil.copyfile(SourceFile,TempFile)
+    os.replace(TempFile,TargetFile)
+
+# Make TargetFile a relative symbolic link to SourceFile, a hard link or a copy where
+# the file system or the user rights allow no symbolic links
+def SymLink(SourceFile,TargetFile):
+    TempFile=TempName(TargetFile)
+    Link=os.path.relpath(SourceFile,os.path.dirname(TargetFile) or '.')
+    try:
+        try:
+            os.symlink(Link,TempFile)
+        except FileExistsError:
+            os.remove(TempFile)
+            os.symlink(Link,TempFile)
+    except OSError:
+        LinkCopy(SourceFile,TargetFile)
+        return
+    os.replace(TempFile,TargetFile)
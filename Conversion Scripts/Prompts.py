@@ -0,0 +1,31 @@
+# Prompts.py
+# Author : Costas Skordis
+#
+# Input checks and prompts shared by BinToHexFileCLI.py and HexToWavFileCLI.py.
+#
+# Requires Python 3.1.2 or newer
+
+# Check if string is a valid hex value
+def IsHex(s):
+    try:
+        n = int(s,16)
+        if n<0:
+            return False
+        return True
+    except ValueError:
+        return False
+
+# Prompt message
+def PromptHex(prompt, default=None):
+    if default!='':
+        prompt=prompt+' <'+str(default)+'> :'   
+    while True:     
+        resp=input(prompt).upper()
+        if len(resp)==0 and default!='':
+            resp=default
+        resp=str(resp)   
+        if not IsHex(resp):
+                print('Invalid entry. Please enter valid hexidecimal values')
+        else:
+            break
+    return resp
@@ -0,0 +1,121 @@
+# Synth.py
+# Author : Costas Skordis
+#
+# Phase accurate waveform synthesizer of the Kansas City Standard encoding.
+# Every bit is one cycle of the bit 1 or bit 0 frequency, framerate/freq samples long.
+# Time is counted in 1/Q of a sample, Q being the smallest step that makes both cycle
+# lengths whole (22050 Hz with 1000 Hz and 500 Hz gives 441/20 and 441/10 samples, so
+# Q is 20), so the start of every cycle is exact and the bit timing never drifts
+# however long the tape. The phase of a cycle is where its first sample falls after
+# its start. The waveform of a cycle only depends on the phase, so the cycles are
+# memoized per (shape, framerate, frequency, amplitude, phase) and the waveforms of
+# the 256 byte values are built once per phase, encoding stays one lookup per byte.
+#
+# Shapes : legacy     square cycles of a whole even number of samples as
+#                     make_square_wave has always written them (1000 Hz at 22050 Hz
+#                     gives 22 samples, 1002 Hz), the wav files of the archive
+#          square     square cycles of the exact length
+#          trapezoid  square cycles with linear edges taking RAMP of the cycle
+#          sine       one period of a sine starting at its falling zero crossing
+# Samples are 8 bit unsigned or 16 bit signed little endian. Every cycle starts with
+# its low half so the decoder finds a falling edge at the start of every bit.
+#
+# Requires Python 3.1.2 or newer
+
+import math,struct,functools
+
+SHAPES = ('legacy','square','trapezoid','sine')
+CENTER = 128           # Center point of 8 bit waves
+RAMP   = 0.125         # Part of a cycle taken by each edge of the trapezoid
+
+# Level between -1 and 1 of a shape at a position x between 0 and 1 of a cycle
+def level(shape,x):
+    if shape=='sine':
+        return -math.sin(2*math.pi*x)
+    if shape=='trapezoid':
+        edge=RAMP/2
+        if x<edge:
+            return -x/edge
+        if x<0.5-edge:
+            return -1.0
+        if x<0.5+edge:
+            return (x-0.5)/edge
+        if x<1-edge:
+            return 1.0
+        return (1-x)/edge
+    return -1.0 if x<0.5 else 1.0
+
+# Length of a cycle in 1/q of a sample
+def cycle_length(shape,framerate,freq,q):
+    if shape=='legacy':
+        return 2*int(framerate/freq/2)*q
+    return framerate*q//freq
+
+# Samples of one cycle of a frequency starting at a phase, in 1/q of a sample
+@functools.lru_cache(maxsize=None)
+def cycle(shape,framerate,freq,amplitude,phase,q,width):
+    length=cycle_length(shape,framerate,freq,q)
+    levels=[level(shape,t/length) for t in range(phase,length,q)]
+    if width==2:
+        return struct.pack('<%dh' % len(levels),*[round(v*(amplitude//2)*256) for v in levels])
+    return bytes([CENTER+round(v*(amplitude//2)) for v in levels])
+
+class Synth:
+    def __init__(self,shape,framerate,ones_freq,zero_freq,amplitude,width=1):
+        if shape not in SHAPES:
+            raise ValueError('Unknown shape '+shape)
+        if width not in (1,2):
+            raise ValueError('Unsupported sample width %d' % width)
+        self.shape=shape
+        self.framerate=framerate
+        self.amplitude=amplitude
+        self.width=width
+        self.freqs=(zero_freq,ones_freq)
+        if shape=='legacy':
+            self.q=1
+        else:
+            q0=zero_freq//math.gcd(framerate,zero_freq)
+            q1=ones_freq//math.gcd(framerate,ones_freq)
+            self.q=q0*q1//math.gcd(q0,q1)
+        self.lengths=tuple(cycle_length(shape,framerate,freq,self.q) for freq in self.freqs)
+        # Bit 1 cycles of a second of carrier, the phase after it is the one before
+        self.per_second=framerate*self.q//self.lengths[1]
+        self.tables={}
+        self.seconds={}
+
+    # Waveform of one cycle of a bit from a phase and the phase after it
+    def cycle(self,bit,phase):
+        chunk=cycle(self.shape,self.framerate,self.freqs[bit],self.amplitude,phase,self.q,self.width)
+        return chunk,phase+len(chunk)//self.width*self.q-self.lengths[bit]
+
+    # Waveform of a sequence of bits from a phase and the phase after it
+    def cycles(self,bits,phase):
+        chunks=[]
+        for bit in bits:
+            chunk,phase=self.cycle(bit,phase)
+            chunks.append(chunk)
+        return b''.join(chunks),phase
+
+    # Waveform of the start bit, 8 data bits and parity bit of the 256 byte values
+    # from a phase, each with the phase after it
+    def table(self,phase):
+        table=self.tables.get(phase)
+        if table is None:
+            table=[]
+            for byteval in range(256):
+                bits=[0]+[(byteval>>i) & 1 for i in range(7,-1,-1)]+[1-(bin(byteval).count('1') & 1)]
+                table.append(self.cycles(bits,phase))
+            self.tables[phase]=table
+        return table
+
+    # One second of carrier from a phase
+    def second(self,phase):
+        chunk=self.seconds.get(phase)
+        if chunk is None:
+            chunk=self.cycles([1]*self.per_second,phase)[0]
+            self.seconds[phase]=chunk
+        return chunk
+
+    # Carrier of a number of bit 1 cycles from a phase and the phase after it
+    def ones(self,count,phase):
+        return self.cycles([1]*count,phase)
@@ -0,0 +1,311 @@
+# TapeServer.py
+# Author : Costas Skordis
+#
+# Local server streaming Kansas City Standard audio of the programs of the archive to
+# ETI-660 machines and emulators, generated on the fly from the binaries.
+# Every program is a VirtualWav with the encoding settings of the server (bit 1 and
+# bit 0 frequency, framerate, amplitude, leader and trailer). The wav is rendered in
+# fixed size chunks kept in a small least recently used cache shared by all
+# connections, so clients loading the same program only render it once. Each chunk is
+# written and drained before the next one is rendered, so a slow client only holds
+# back its own stream.
+#
+# Plain TCP : send a program name, optionally followed by a byte offset, on one line
+#             and the wav file is streamed back. LIST returns the index.
+# HTTP      : GET / returns the index, GET /wav/<name>.wav the wav file with support
+#             for a single byte Range.
+#
+#   python TapeServer.py serve --profile eti660
+#   python TapeServer.py fetch --clients 32 --program PONG
+#
+# Requires Python 3.1.2 or newer
+
+import os,time,asyncio
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote,unquote
+import click
+from colorama import Fore, init
+
+if __package__:
+    from . import chip8core,VirtualWav,Synth
+    from . import HexToWavFileCLI as kcs
+else:
+    import chip8core
+    import HexToWavFileCLI as kcs
+    import VirtualWav
+    import Synth
+
+CHUNK_SIZE = 65536     # Size of the rendered chunks of a wav file
+SoftwareDir=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'Software')
+
+# Programs of the archive as virtual wav files with a cache of rendered chunks. Each
+# library has its own synthesizer, so libraries of different encodings can run in
+# one process.
+class Library:
+    def __init__(self,Settings):
+        self.synth=Synth.Synth(Settings['Shape'],Settings['Framerate'],Settings['OnesFreq'],Settings['ZeroFreq'],
+                               Settings['Amplitude'],Settings['SampleWidth'])
+        self.settings=Settings
+        self.files={path.stem:str(path) for path in Path(Settings['SourceDir']).glob('*.ch8')}
+        self.wavs={}
+        self.addresses={}
+        self.cache=OrderedDict()
+
+    # Virtual wav file of a program, None when there is no such program
+    def wav(self,Name):
+        wav=self.wavs.get(Name)
+        if wav is None and Name in self.files:
+            Image=chip8core.read_binary(self.files[Name],int(self.settings['Origin'],16))
+            wav=VirtualWav.program_wav(Image,Name,self.settings['Leader'],self.settings['Trailer'],synth=self.synth)
+            self.wavs[Name]=wav
+            self.addresses[Name]=Image.address_range()
+        return wav
+
+    # Index of the programs in the layout of Index.txt
+    def index(self):
+        f='{text1:.<70}{text2:15}'
+        lines=[]
+        for Name in sorted(self.files,key=str.lower):
+            self.wav(Name)
+            lines.append(f.format(text1=Name,text2=self.addresses[Name])+'\n')
+        return ''.join(lines).encode('utf-8')
+
+    # Chunk k of the wav file of a program from the cache or rendered
+    def chunk(self,Name,k):
+        key=(Name,k)
+        chunk=self.cache.get(key)
+        if chunk is not None:
+            self.cache.move_to_end(key)
+            return chunk
+        chunk=self.wav(Name).range(k*CHUNK_SIZE,(k+1)*CHUNK_SIZE)
+        self.cache[key]=chunk
+        if len(self.cache)>self.settings['Cache']:
+            self.cache.popitem(last=False)
+        return chunk
+
+    # Write the bytes of the wav file of a program between two offsets, waiting for
+    # the client to take every chunk before rendering the next one
+    async def stream(self,writer,Name,start,stop):
+        k=start//CHUNK_SIZE
+        while start<stop:
+            chunk=memoryview(self.chunk(Name,k))
+            data=chunk[start-k*CHUNK_SIZE:min(stop-k*CHUNK_SIZE,len(chunk))]
+            writer.write(data)
+            await writer.drain()
+            start=start+len(data)
+            k=k+1
+
+# Close a connection, the client may be gone already
+async def close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+async def handle_tcp(library,reader,writer):
+    try:
+        request=(await reader.readline()).decode('utf-8','replace').strip()
+        Name,_,offset=request.rpartition(' ')
+        if not Name or not offset.isdigit():
+            Name,offset=request,'0'
+        if request.upper()=='LIST':
+            writer.write(library.index())
+        elif library.wav(Name) is None:
+            writer.write(('ERROR No program '+Name+'\n').encode('utf-8'))
+        else:
+            print(f'{Fore.CYAN}TCP  {Name}')
+            await library.stream(writer,Name,int(offset),len(library.wav(Name)))
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        await close(writer)
+
+# Start and stop offsets of a single byte Range header, None when it cannot be served
+def parse_range(value,size):
+    unit,_,spec=value.partition('=')
+    if unit.strip()!='bytes' or ',' in spec:
+        return None
+    first,_,last=spec.strip().partition('-')
+    try:
+        if not first:
+            start=max(0,size-int(last))
+        else:
+            start=int(first)
+        stop=min(size,int(last)+1) if last and first else size
+    except ValueError:
+        return None
+    if start>=size or stop<=start:
+        return None
+    return start,stop
+
+def http_response(status,headers):
+    return ('HTTP/1.1 '+status+'\r\n'+''.join('%s: %s\r\n' % header for header in headers)+
+            'Connection: close\r\n\r\n').encode('latin-1')
+
+async def handle_http(library,reader,writer):
+    try:
+        request=(await reader.readline()).decode('latin-1').split()
+        headers={}
+        while True:
+            line=(await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key,_,value=line.partition(':')
+            headers[key.strip().lower()]=value.strip()
+        if len(request)<2 or request[0] not in ('GET','HEAD'):
+            writer.write(http_response('405 Method Not Allowed',[('Content-Length',0)]))
+            return
+        method,path=request[0],unquote(request[1].split('?')[0])
+        if path in ('/','/index','/Index.txt'):
+            body=library.index()
+            writer.write(http_response('200 OK',[('Content-Type','text/plain; charset=utf-8'),('Content-Length',len(body))]))
+            if method=='GET':
+                writer.write(body)
+            return
+        Name=path[len('/wav/'):-len('.wav')] if path.startswith('/wav/') and path.endswith('.wav') else ''
+        wav=library.wav(Name)
+        if wav is None:
+            body=('No program '+path+'\n').encode('utf-8')
+            writer.write(http_response('404 Not Found',[('Content-Type','text/plain; charset=utf-8'),('Content-Length',len(body))]))
+            writer.write(body)
+            return
+        size=len(wav)
+        start,stop=0,size
+        status='200 OK'
+        extra=[]
+        if 'range' in headers:
+            span=parse_range(headers['range'],size)
+            if span is None:
+                writer.write(http_response('416 Range Not Satisfiable',[('Content-Range','bytes */%d' % size),('Content-Length',0)]))
+                return
+            start,stop=span
+            status='206 Partial Content'
+            extra=[('Content-Range','bytes %d-%d/%d' % (start,stop-1,size))]
+        writer.write(http_response(status,[('Content-Type','audio/wav'),('Accept-Ranges','bytes'),
+                                           ('Content-Length',stop-start)]+extra))
+        print(f'{Fore.GREEN}HTTP {Name} {start}-{stop-1}')
+        if method=='GET':
+            await library.stream(writer,Name,start,stop)
+    except ConnectionError:
+        pass
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        await close(writer)
+
+# Serve until cancelled. Port 0 picks a free port, the TCP and HTTP ports listened on
+# are the result of the future started once the servers accept connections.
+async def serve(Settings,started=None):
+    library=Library(Settings)
+    tcp=await asyncio.start_server(lambda r,w: handle_tcp(library,r,w),Settings['Host'],Settings['Port'])
+    http=await asyncio.start_server(lambda r,w: handle_http(library,r,w),Settings['Host'],Settings['HttpPort'])
+    Ports=(tcp.sockets[0].getsockname()[1],http.sockets[0].getsockname()[1])
+    print(f'{Fore.YELLOW}Serving %d programs, TCP on %s:%d, HTTP on http://%s:%d/' % (len(library.files),
+          Settings['Host'],Ports[0],Settings['Host'],Ports[1]))
+    if started is not None:
+        started.set_result(Ports)
+    async with tcp,http:
+        await asyncio.gather(tcp.serve_forever(),http.serve_forever())
+
+# Load a wav file from the server over TCP or HTTP, returns the number of bytes
+async def fetch(host,port,Name,http):
+    reader,writer=await asyncio.open_connection(host,port)
+    try:
+        if http:
+            writer.write(('GET /wav/%s.wav HTTP/1.1\r\nHost: %s\r\n\r\n' % (quote(Name),host)).encode('latin-1'))
+            status=(await reader.readline()).decode('latin-1')
+            if ' 200 ' not in status:
+                raise click.ClickException(Name+' : '+status.strip())
+            while (await reader.readline()).strip():
+                pass
+        else:
+            writer.write((Name+'\n').encode('utf-8'))
+        size=0
+        while True:
+            data=await reader.read(CHUNK_SIZE)
+            if not data:
+                break
+            size+=len(data)
+        return size
+    finally:
+        await close(writer)
+
+async def fetch_all(host,port,Name,http,clients):
+    return await asyncio.gather(*[fetch(host,port,Name,http) for x in range(clients)])
+
+# Encoding options of Chip8Convert.py, a profile gives their defaults
+def load_settings(profile,options):
+    if profile:
+        if __package__:
+            from .Chip8Convert import LoadProfile
+        else:
+            from Chip8Convert import LoadProfile
+        for key,value in LoadProfile(profile).items():
+            if key in options and options[key] is None:
+                options[key]=value
+    defaults={'ones_freq':1000,'zero_freq':500,'framerate':22050,'amplitude':kcs.AMPLITUDE,'leader':2,'trailer':0,'origin':'0600',
+              'shape':'legacy','sample_width':'8'}
+    for key,value in defaults.items():
+        if options[key] is None:
+            options[key]=value
+    return {'OnesFreq':int(options['ones_freq']),'ZeroFreq':int(options['zero_freq']),'Framerate':int(options['framerate']),
+            'Amplitude':int(options['amplitude']),'Leader':int(options['leader']),'Trailer':int(options['trailer']),
+            'Origin':str(options['origin']).upper(),'Shape':options['shape'],'SampleWidth':int(options['sample_width'])//8}
+
+@click.group()
+def cli():
+    """Stream Kansas City Standard audio of the archive to many clients."""
+    init(autoreset=True)
+
+host_option=click.option('--host',default='127.0.0.1',show_default=True,help='Address to listen on or connect to.')
+port_option=click.option('--port',default=6600,type=click.IntRange(0,65535),show_default=True,help='TCP port.')
+http_port_option=click.option('--http-port',default=6680,type=click.IntRange(0,65535),show_default=True,help='HTTP port.')
+
+@cli.command(name='serve')
+@click.option('--source',default=os.path.join(SoftwareDir,'binary'),type=click.Path(exists=True,file_okay=False),show_default=True,help='Binary source directory.')
+@click.option('--profile',default=None,help='Profile file or name of a profile in the profiles directory for the encoding settings.')
+@click.option('--ones-freq',default=None,type=click.Choice(['300','500','600','1000','1200','2400','4800','9600']),help='Bit 1 frequency in Hz.  [default: 1000]')
+@click.option('--zero-freq',default=None,type=click.Choice(['300','500','600','1200','2400','4800','9600']),help='Bit 0 frequency in Hz.  [default: 500]')
+@click.option('--framerate',default=None,type=click.Choice(['4800','9600','11025','22050','44100','48000']),help='Framerate in Hz.  [default: 22050]')
+@click.option('--amplitude',default=None,type=click.IntRange(0,255),help='Amplitude of the square waves.  [default: 225]')
+@click.option('--shape',default=None,type=click.Choice(Synth.SHAPES),help='Wave shape.  [default: legacy]')
+@click.option('--sample-width',default=None,type=click.Choice(['8','16']),help='Bits per sample.  [default: 8]')
+@click.option('--leader',default=None,type=click.IntRange(0,60),help='Leader in seconds.  [default: 2]')
+@click.option('--trailer',default=None,type=click.IntRange(0,60),help='Trailer in seconds.  [default: 0]')
+@click.option('--origin',default=None,help='Origin start address in hex.  [default: 0600]')
+@click.option('--cache',default=256,type=click.IntRange(1),show_default=True,help='Number of rendered chunks of %d bytes to keep.' % CHUNK_SIZE)
+@host_option
+@port_option
+@http_port_option
+def serve_command(source,profile,cache,host,port,http_port,**options):
+    """Serve the wav files of the binaries over TCP and HTTP."""
+    Settings=load_settings(profile,options)
+    Settings.update({'SourceDir':source,'Cache':cache,'Host':host,'Port':port,'HttpPort':http_port})
+    try:
+        asyncio.run(serve(Settings))
+    except KeyboardInterrupt:
+        pass
+
+@cli.command(name='fetch')
+@click.option('--program',required=True,help='Name of the program to load.')
+@click.option('--clients',default=1,type=click.IntRange(1,1000),show_default=True,help='Number of simultaneous clients.')
+@click.option('--http/--tcp',default=True,show_default=True,help='Load over HTTP or plain TCP.')
+@host_option
+@port_option
+@http_port_option
+def fetch_command(program,clients,http,host,port,http_port):
+    """Load a program from a running server with many clients at once."""
+    start=time.perf_counter()
+    sizes=asyncio.run(fetch_all(host,http_port if http else port,program,http,clients))
+    elapsed=time.perf_counter()-start
+    if len(set(sizes))!=1:
+        raise click.ClickException('Clients received different sizes %s' % sorted(set(sizes)))
+    print('%d clients received %d bytes each in %.3f s, %.1f MB/s' % (clients,sizes[0],elapsed,sum(sizes)/elapsed/1e6))
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,136 @@
+# Timing.py
+# Author : Costas Skordis
+#
+# Opt in timing of the stages of a conversion for the conversion scripts.
+# Turned on with --timing (Timing setting) or the CHIP8_TIMING environment variable.
+# Every file is converted through call(), which records the time spent in each
+# stage() of the conversion, nested stages are not counted in the enclosing stage.
+# At the end report() prints the files/s, bytes/s and per stage p50/p95 times and
+# can write them as JSON (--timing-json or CHIP8_TIMING_JSON). With --cprofile or
+# CHIP8_PROFILE_DIR each process also writes its cProfile statistics to that directory.
+#
+# Requires Python 3.1.2 or newer
+
+import os,time,math,functools
+from contextlib import contextmanager
+if __package__:
+    from . import Output
+else:
+    import Output
+
+# Record of the file being converted, None when timing is off
+_record=None
+# Stages running, each is [name, time of nested stages]
+_stack=[]
+_profiler=None
+
+def enabled(Settings):
+    return bool(Settings.get('Timing') or Settings.get('TimingJson') or Settings.get('ProfileDir') or
+                os.environ.get('CHIP8_TIMING') or os.environ.get('CHIP8_TIMING_JSON') or os.environ.get('CHIP8_PROFILE_DIR'))
+
+# Time a stage of the conversion of the current file
+@contextmanager
+def stage(name):
+    if _record is None:
+        yield
+        return
+    entry=[name,0.0]
+    _stack.append(entry)
+    start=time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed=time.perf_counter()-start
+        _stack.pop()
+        if _stack:
+            _stack[-1][1]+=elapsed
+        stages=_record['Stages']
+        stages[name]=stages.get(name,0.0)+elapsed-entry[1]
+
+# Number of bytes converted for the current file
+def count(size):
+    if _record is not None:
+        _record['Bytes']+=size
+
+# Convert a file with func and return its result and timing record
+def call(func,SourceFile,Settings):
+    global _record,_profiler
+    ProfileDir=Settings.get('ProfileDir') or os.environ.get('CHIP8_PROFILE_DIR')
+    if ProfileDir and _profiler is None:
+        import cProfile
+        _profiler=cProfile.Profile()
+    _record={'File':os.path.basename(SourceFile),'Bytes':0,'Stages':{}}
+    start=time.perf_counter()
+    if _profiler:
+        _profiler.enable()
+    try:
+        result=func(SourceFile,Settings)
+    finally:
+        if _profiler:
+            _profiler.disable()
+            os.makedirs(ProfileDir,exist_ok=True)
+            _profiler.dump_stats(os.path.join(ProfileDir,'%s-%d.prof' % (func.__name__,os.getpid())))
+        record=_record
+        record['Seconds']=time.perf_counter()-start
+        _record=None
+        del _stack[:]
+    return result,record
+
+# Function to convert a file with, timed when timing is on
+def wrap(func,Settings):
+    return functools.partial(call,func) if enabled(Settings) else func
+
+# Separate the results of wrap() into the conversion results and timing records
+def split(Results,Settings):
+    if not enabled(Settings):
+        return Results,[]
+    return [Result for Result,Record in Results],[Record for Result,Record in Results]
+
+# Nearest rank percentile, part is between 0 and 1
+def percentile(values,part):
+    values=sorted(values)
+    if not values:
+        return 0.0
+    return values[max(0,math.ceil(part*len(values))-1)]
+
+# Summary of the timing records of a run taking Seconds
+def summary(Records,Seconds):
+    Names=[]
+    for Record in Records:
+        for Name in Record['Stages']:
+            if Name not in Names:
+                Names.append(Name)
+    Stages={}
+    for Name in Names:
+        Times=[Record['Stages'][Name] for Record in Records if Name in Record['Stages']]
+        Stages[Name]={'Files':len(Times),'Seconds':sum(Times),'P50':percentile(Times,0.5),'P95':percentile(Times,0.95)}
+    Bytes=sum(Record['Bytes'] for Record in Records)
+    return {'Files':len(Records),'Bytes':Bytes,'Seconds':Seconds,
+            'FilesPerSecond':len(Records)/Seconds if Seconds else 0.0,
+            'BytesPerSecond':Bytes/Seconds if Seconds else 0.0,
+            'Stages':Stages,'Records':Records}
+
+# Print the summary table and write the JSON file when timing is on
+def report(Settings,Name,Records,Seconds):
+    if not enabled(Settings):
+        return
+    Summary=summary(Records,Seconds)
+    p='{0:<12}{1:>8}{2:>12}{3:>12}{4:>12}'
+    print()
+    print(p.format(Name,'Files','Total s','p50 ms','p95 ms'))
+    for Stage,Times in Summary['Stages'].items():
+        print(p.format(Stage,Times['Files'],'%.3f' % Times['Seconds'],'%.3f' % (Times['P50']*1000),'%.3f' % (Times['P95']*1000)))
+    print('%d files, %d bytes in %.3f s, %.1f files/s, %.0f bytes/s' % (Summary['Files'],Summary['Bytes'],
+          Seconds,Summary['FilesPerSecond'],Summary['BytesPerSecond']))
+    JsonFile=Settings.get('TimingJson') or os.environ.get('CHIP8_TIMING_JSON')
+    if JsonFile:
+        import json
+        Runs={}
+        if os.path.isfile(JsonFile):
+            try:
+                with open(JsonFile,'r') as f:
+                    Runs=json.load(f)
+            except ValueError:
+                Runs={}
+        Runs[Name]=Summary
+        Output.WriteText(JsonFile,json.dumps(Runs,indent=1))
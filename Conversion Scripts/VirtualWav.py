@@ -0,0 +1,135 @@
+# VirtualWav.py
+# Author : Costas Skordis
+#
+# Wav files of programs synthesized on demand instead of stored.
+# A VirtualWav is a read only, seekable file object holding exactly the bytes
+# HexToWavFileCLI.write_wav writes: the header, the leader, the encoded program, the
+# trailer and the tags. Only the bytes asked for are synthesized. The leader and
+# trailer repeat one second of carrier, which ends at the phase it starts (see Synth),
+# so any sample of them is found with a modulo. The offset and the phase of every byte
+# of the program are kept in tables of running sums (the waveform of a byte depends on
+# the number of 1 bits when the two frequencies have different cycle lengths) so a
+# byte is found with a binary search. Seeking anywhere costs the same and memory use
+# depends on the program size, not on the leader or trailer length.
+#
+#   synth=Synth.Synth('legacy',22050,1000,500,225)
+#   wav=VirtualWav.program_wav(Image,'PONG',leader=2,trailer=0,synth=synth)
+#   wav.seek(3*60*22050)
+#   samples=wav.read(4096)
+#
+# The encoding is the Synth a VirtualWav is created with, so wav files of different
+# encodings can be served side by side. program_wav uses the encoding set with
+# HexToWavFileCLI.set_encoding when no Synth is given.
+#
+# Requires Python 3.1.2 or newer
+
+import io,bisect
+from array import array
+if __package__:
+    from . import WavTags
+    from . import HexToWavFileCLI as kcs
+else:
+    import HexToWavFileCLI as kcs
+    import WavTags
+
+class VirtualWav(io.RawIOBase):
+    # parts is a list of ('carrier', seconds) and ('data', byte values) encoded with
+    # the synthesizer synth
+    def __init__(self,parts,synth,tags=b''):
+        self.synth=synth
+        self.segments=[]
+        pos=0
+        phase=0
+        for kind,value in parts:
+            if kind=='carrier':
+                second=self.synth.second(phase)
+                self.segments.append((pos,len(second)*value,self.carrier(second)))
+                pos=pos+len(second)*value
+            else:
+                data=bytes(value)
+                offsets=array('I',[0])
+                phases=array('Q')     # Phases are below Synth.q, which can pass 65535
+                n=0
+                for byteval in data:
+                    phases.append(phase)
+                    chunk,phase=self.synth.table(phase)[byteval]
+                    n=n+len(chunk)
+                    offsets.append(n)
+                self.segments.append((pos,n,self.encoder(data,offsets,phases)))
+                pos=pos+n
+        header=kcs.wav_header(pos,len(tags),synth.framerate,synth.width)
+        trailing=(b'\0' if pos & 1 else b'')+tags
+        self.segments.insert(0,(-len(header),len(header),lambda start,n: header[start:start+n]))
+        self.segments.append((pos,len(trailing),lambda start,n: trailing[start:start+n]))
+        # Segments are kept by file offset
+        self.segments=[(start+len(header),size,func) for start,size,func in self.segments if size]
+        self.starts=[start for start,size,func in self.segments]
+        self.size=len(header)+pos+len(trailing)
+        self.pos=0
+
+    # Function returning n bytes of a repeated second of carrier from byte start
+    def carrier(self,second):
+        def repeat(start,n):
+            offset=start % len(second)
+            return (second*((offset+n)//len(second)+1))[offset:offset+n]
+        return repeat
+
+    # Function returning n bytes of the waveform of data from byte start
+    def encoder(self,data,offsets,phases):
+        synth=self.synth
+        def encode(start,n):
+            first=bisect.bisect_right(offsets,start)-1
+            last=bisect.bisect_left(offsets,start+n)
+            chunk=b''.join([synth.table(phases[k])[data[k]][0] for k in range(first,last)])
+            return chunk[start-offsets[first]:start-offsets[first]+n]
+        return encode
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self,offset,whence=io.SEEK_SET):
+        if whence==io.SEEK_CUR:
+            offset=self.pos+offset
+        elif whence==io.SEEK_END:
+            offset=self.size+offset
+        elif whence!=io.SEEK_SET:
+            raise ValueError('Invalid whence %d' % whence)
+        if offset<0:
+            raise ValueError('Negative seek position %d' % offset)
+        self.pos=offset
+        return self.pos
+
+    # Bytes of the file between two offsets
+    def range(self,start,stop):
+        stop=min(stop,self.size)
+        chunks=[]
+        k=max(0,bisect.bisect_right(self.starts,start)-1)
+        while start<stop and k<len(self.segments):
+            seg_start,seg_size,func=self.segments[k]
+            n=min(stop,seg_start+seg_size)-start
+            if n>0:
+                chunks.append(func(start-seg_start,n))
+                start=start+n
+            k=k+1
+        return b''.join(chunks)
+
+    def readinto(self,buffer):
+        data=self.range(self.pos,self.pos+len(buffer))
+        buffer[:len(data)]=data
+        self.pos=self.pos+len(data)
+        return len(data)
+
+    def __len__(self):
+        return self.size
+
+# Virtual wav file of a program with the same leader, trailer and tags as the wav file
+# HexToWavFileCLI.convert_file writes for it
+def program_wav(Image,Name,leader,trailer,id3=True,synth=None):
+    return VirtualWav([('carrier',leader),('data',Image.view()),('carrier',trailer)],synth or kcs.synth,
+                      WavTags.tag_chunks(Image.address_range(),Name,id3))
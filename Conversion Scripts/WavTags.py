@@ -0,0 +1,126 @@
+# WavTags.py
+# Author : Costas Skordis
+#
+# Tags of the wav files written by HexToWavFileCLI.py without taglib.
+# The name of a program is written as the album and the start and end address as the
+# title, in a RIFF LIST INFO chunk (IPRD and INAM) and optionally in an ID3v2.4 chunk,
+# laid out as taglib wrote them so existing players and the archive files agree.
+# The reader walks the RIFF chunks and seeks over the sample data, so the tags of a
+# whole directory of wav files are read in milliseconds.
+#
+#   python WavTags.py ../Software/wav
+#
+# Requires Python 3.1.2 or newer
+
+import os,struct
+
+ID3_PADDING = 1024     # Padding taglib leaves after the ID3 frames
+
+# RIFF chunk with the pad byte that keeps the next chunk at an even offset
+def riff_chunk(cid,data):
+    return struct.pack('<4sI',cid,len(data))+data+(b'\0' if len(data) & 1 else b'')
+
+# LIST INFO chunk with the title (INAM) and album (IPRD)
+def info_chunk(title,album):
+    return riff_chunk(b'LIST',b'INFO'+riff_chunk(b'INAM',title.encode('latin-1','replace')+b'\0')+
+                                      riff_chunk(b'IPRD',album.encode('latin-1','replace')+b'\0'))
+
+def syncsafe(n):
+    return bytes([n>>21 & 0x7F,n>>14 & 0x7F,n>>7 & 0x7F,n & 0x7F])
+
+# ID3 chunk with an ID3v2.4 tag holding the album (TALB) and title (TIT2)
+def id3_chunk(title,album):
+    frames=b''
+    for fid,text in ((b'TALB',album),(b'TIT2',title)):
+        data=b'\x03'+text.encode('utf-8')
+        frames+=fid+syncsafe(len(data))+b'\0\0'+data
+    return riff_chunk(b'ID3 ',b'ID3\x04\x00\x00'+syncsafe(len(frames)+ID3_PADDING)+frames+bytes(ID3_PADDING))
+
+# Chunks written after the sample data of a wav file
+def tag_chunks(title,album,id3=True):
+    return (id3_chunk(title,album) if id3 else b'')+info_chunk(title,album)
+
+# Frames of an ID3v2 tag as a dict of frame id to text
+def parse_id3(tag):
+    tags={}
+    if tag[:3]!=b'ID3' or len(tag)<10:
+        return tags
+    version=tag[3]
+    size=tag[6]<<21 | tag[7]<<14 | tag[8]<<7 | tag[9]
+    pos=10
+    end=min(len(tag),10+size)
+    while pos+10<=end and tag[pos]!=0:
+        fid=tag[pos:pos+4].decode('latin-1')
+        if version>=4:
+            fsize=tag[pos+4]<<21 | tag[pos+5]<<14 | tag[pos+6]<<7 | tag[pos+7]
+        else:
+            fsize=struct.unpack('>I',tag[pos+4:pos+8])[0]
+        data=tag[pos+10:pos+10+fsize]
+        if fid[0]=='T' and data:
+            encoding={0:'latin-1',1:'utf-16',2:'utf-16-be',3:'utf-8'}.get(data[0],'latin-1')
+            tags[fid]=data[1:].decode(encoding,'replace').rstrip('\0')
+        pos+=10+fsize
+    return tags
+
+# Read the TITLE and ALBUM tags of a wav file, from the LIST INFO chunk or the ID3
+# chunk. Returns an empty dict when the file has no tags.
+def read_tags(filename):
+    tags={}
+    id3={}
+    with open(filename,'rb') as f:
+        header=f.read(12)
+        if len(header)<12 or header[:4]!=b'RIFF' or header[8:12]!=b'WAVE':
+            return tags
+        while True:
+            chunk=f.read(8)
+            if len(chunk)<8:
+                break
+            cid,size=struct.unpack('<4sI',chunk)
+            if cid==b'LIST':
+                info=f.read(size)
+                if info[:4]==b'INFO':
+                    pos=4
+                    while pos+8<=len(info):
+                        sid,ssize=struct.unpack('<4sI',info[pos:pos+8])
+                        text=info[pos+8:pos+8+ssize].split(b'\0')[0].decode('latin-1')
+                        if sid==b'INAM':
+                            tags['TITLE']=text
+                        elif sid==b'IPRD':
+                            tags['ALBUM']=text
+                        pos=pos+8+ssize+(ssize & 1)
+                if size & 1:
+                    f.seek(1,1)
+            elif cid in (b'ID3 ',b'id3 '):
+                id3=parse_id3(f.read(size))
+                if size & 1:
+                    f.seek(1,1)
+            else:
+                f.seek(size+(size & 1),1)
+    if 'TITLE' not in tags and 'TIT2' in id3:
+        tags['TITLE']=id3['TIT2']
+    if 'ALBUM' not in tags and 'TALB' in id3:
+        tags['ALBUM']=id3['TALB']
+    return tags
+
+# Tags of every wav file below a directory in file name order
+def scan(Dir):
+    from pathlib import Path
+    return [(str(path),read_tags(str(path))) for path in sorted(Path(Dir).rglob('*.wav'),key=lambda path: path.name.lower())]
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from pathlib import Path
+
+    if len(sys.argv) < 2:
+        print("Usage : %s WavDirectory ..." % sys.argv[0],file=sys.stderr)
+        raise SystemExit(1)
+
+    start=time.perf_counter()
+    files=[entry for Dir in sys.argv[1:] for entry in (scan(Dir) if os.path.isdir(Dir) else [(Dir,read_tags(Dir))])]
+    elapsed=time.perf_counter()-start
+    # Same layout as Index.txt
+    f='{text1:.<70}{text2:15}'
+    for filename,tags in files:
+        print(f.format(text1=tags.get('ALBUM',Path(filename).stem),text2=tags.get('TITLE','')))
+    print('%d files in %.1f ms' % (len(files),elapsed*1000),file=sys.stderr)
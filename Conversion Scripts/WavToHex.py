@@ -0,0 +1,166 @@
+# WavToHex.py
+# Author : Costas Skordis
+#
+# Decode Kansas City Standard wav files, as written by HexToWavFileCLI.py or captured
+# from a cassette, back into hex files.
+# Each bit is one cycle of the bit 1 or bit 0 frequency. Each byte is a start bit (0),
+# 8 data bits with the most significant bit first and an odd parity bit.
+# The signal is turned into a square wave with a hysteresis threshold, the length of
+# every cycle is measured between falling zero crossings and compared with the cycle
+# length of the two frequencies. All steps are vectorized with NumPy.
+# The start and end address are read from the title of the wav file when present.
+# Programs of a tape wav file are found with its sidecar index and decoded from their
+# sample offsets without reading the rest of the tape.
+#
+#   python WavToHex.py --ones-freq 1000 --zero-freq 500 --target hex ../Software/wav/P/PONG.wav
+#   python WavToHex.py --ones-freq 1000 --zero-freq 500 --tape --program PONG session.wav
+#
+# Requires Python 3.1.2 or newer and NumPy
+
+import os,wave,json
+import numpy as np
+if __package__:
+    from . import WavTags
+else:
+    import WavTags
+
+ONES_FREQ = 2400       # Hz (per KCS)
+ZERO_FREQ = 1200       # Hz (per KCS)
+HYSTERESIS = 0.4       # Part of the peak amplitude ignored around the center
+
+# Read the samples of the first channel of a wav file centered around 0, from
+# sample start and at most count samples, all of them by default
+def read_samples(filename,start=0,count=None):
+    with wave.open(filename,'rb') as w:
+        framerate=w.getframerate()
+        channels=w.getnchannels()
+        width=w.getsampwidth()
+        w.setpos(start)
+        frames=w.readframes(w.getnframes()-start if count is None else count)
+    if width==1:
+        samples=np.frombuffer(frames,dtype=np.uint8).astype(np.int32)-128
+    elif width==2:
+        samples=np.frombuffer(frames,dtype='<i2').astype(np.int32)
+    else:
+        raise ValueError('Unsupported sample width %d' % width)
+    samples=samples[::channels]
+    if len(samples)==0:
+        return samples,framerate
+    # Center on the middle of the range, the median of a square wave whose cycles are
+    # as long high as low is one of its two levels
+    low,high=np.percentile(samples,[1,99])
+    return samples-int(round((low+high)/2)),framerate
+
+# Turn samples into bits, one bit per cycle between falling zero crossings
+def demodulate(samples,framerate,ones_freq=ONES_FREQ,zero_freq=ZERO_FREQ):
+    if len(samples)==0:
+        return np.zeros(0,dtype=np.uint8)
+    # Square the signal with hysteresis, samples close to the center keep the
+    # level of the last sample outside of the threshold
+    threshold=HYSTERESIS*np.percentile(np.abs(samples),99)
+    outside=np.abs(samples)>threshold
+    last=np.maximum.accumulate(np.where(outside,np.arange(len(samples)),0))
+    high=samples[last]>0
+    # Cycles start with the low half, so a bit starts on every falling edge
+    edges=np.flatnonzero(high[:-1] & ~high[1:])+1
+    if not high[0]:
+        edges=np.concatenate(([0],edges))
+    if high[-1]:
+        edges=np.concatenate((edges,[len(samples)]))
+    periods=np.diff(edges)
+    one_period=framerate/ones_freq
+    zero_period=framerate/zero_freq
+    return (np.abs(periods-one_period)<np.abs(periods-zero_period)).astype(np.uint8)
+
+# Turn bits into bytes. The data starts at the first 0 bit after the leader and ends
+# at the first frame without a start bit (the trailer) or at the end of the bits.
+# Returns the data and the offsets of the bytes with a parity error.
+def decode_bits(bits):
+    zeros=np.flatnonzero(bits==0)
+    if len(zeros)==0:
+        return b'',[]
+    start=zeros[0]
+    n=(len(bits)-start)//10
+    frames=bits[start:start+n*10].reshape(n,10)
+    ends=np.flatnonzero(frames[:,0]!=0)
+    if len(ends):
+        frames=frames[:ends[0]]
+    data=np.packbits(frames[:,1:9],axis=1)[:,0].tobytes()
+    errors=np.flatnonzero(frames[:,1:10].sum(axis=1)%2==0).tolist()
+    return data,errors
+
+# Decode a wav file into bytes
+def decode_wav(filename,ones_freq=ONES_FREQ,zero_freq=ZERO_FREQ):
+    samples,framerate=read_samples(filename)
+    return decode_bits(demodulate(samples,framerate,ones_freq,zero_freq))
+
+# Read the sidecar index of a tape wav file written by HexToWavFileCLI.convert_tape
+def read_tape_index(filename):
+    with open(os.path.splitext(filename)[0]+'.json','r') as f:
+        return json.load(f)
+
+# Decode one program of a tape wav file, only the samples of its record are read
+def decode_tape(filename,Record,ones_freq=ONES_FREQ,zero_freq=ZERO_FREQ):
+    samples,framerate=read_samples(filename,Record['Offset'],Record['End']-Record['Offset'])
+    return decode_bits(demodulate(samples,framerate,ones_freq,zero_freq))
+
+# Read the title (the address range) of a wav file
+def read_title(filename):
+    return WavTags.read_tags(filename).get('TITLE','')
+
+# Get the start and end address from a title such as '0600 - 06F5 (1)'
+def parse_address(title):
+    try:
+        parts=title.split('(')[0].split('-')
+        return int(parts[0],16),int(parts[1],16)
+    except (IndexError,ValueError):
+        return None
+
+if __name__ == '__main__':
+    import click
+
+    @click.command()
+    @click.argument('files',nargs=-1,required=True,type=click.Path(exists=True,dir_okay=False))
+    @click.option('--ones-freq',default=ONES_FREQ,type=int,show_default=True,help='Bit 1 frequency in Hz.')
+    @click.option('--zero-freq',default=ZERO_FREQ,type=int,show_default=True,help='Bit 0 frequency in Hz.')
+    @click.option('--target',default=None,type=click.Path(file_okay=False),help='Directory for the hex files, by default next to the wav files.')
+    @click.option('--binary',is_flag=True,default=False,help='Write binary .ch8 files instead of hex files.')
+    @click.option('--tape',is_flag=True,default=False,help='The files are tapes, decode their programs with the sidecar index.')
+    @click.option('--program','programs',multiple=True,help='Name of a program of the tape to decode, all by default. Can be repeated.')
+    def main(files,ones_freq,zero_freq,target,binary,tape,programs):
+        """Decode Kansas City Standard wav files into hex files."""
+        for filename in files:
+            TargetDir=target if target else os.path.dirname(filename)
+            os.makedirs(TargetDir,exist_ok=True)
+            if not tape:
+                data,errors=decode_wav(filename,ones_freq,zero_freq)
+                write_program(filename,os.path.splitext(os.path.basename(filename))[0],read_title(filename),
+                              data,errors,TargetDir,binary)
+                continue
+            Index=read_tape_index(filename)
+            Records=[Record for Record in Index['Programs'] if not programs or Record['Name'] in programs]
+            for Name in sorted(set(programs)-set(Record['Name'] for Record in Records)):
+                print('{0:<10}No program {1} on {2}'.format('Error',Name,filename))
+            for Record in Records:
+                data,errors=decode_tape(filename,Record,ones_freq,zero_freq)
+                write_program(filename+' : '+Record['Name'],Record['Name'],Record['Address'],data,errors,TargetDir,binary)
+
+    # Print the summary of a decoded program and write it as a hex or binary file
+    def write_program(source,name,title,data,errors,TargetDir,binary):
+        print(source)
+        print('{0:<10}{1} bytes'.format('Size',len(data)))
+        if title:
+            print('{0:<10}{1}'.format('Title',title))
+            address=parse_address(title)
+            if address and address[1]-address[0]+1!=len(data):
+                print('{0:<10}Expected {1} bytes'.format('Warning',address[1]-address[0]+1))
+        if errors:
+            print('{0:<10}Parity errors at byte {1}'.format('Error',', '.join(str(e) for e in errors)))
+        if binary:
+            with open(os.path.join(TargetDir,name+'.ch8'),'wb') as f:
+                f.write(data)
+        else:
+            with open(os.path.join(TargetDir,name+'.hex'),'w') as f:
+                f.write(' '.join('%02X' % b for b in data))
+
+    main()
@@ -0,0 +1,65 @@
+# chip8core.py
+# Author : Costas Skordis
+#
+# Shared program model for the conversion scripts.
+# A program is kept as a bytearray image with the address of its first byte (origin).
+# The scripts work on memoryview slices of the image and only convert to hex text
+# when writing the output files.
+#
+# Requires Python 3.1.2 or newer
+
+import sys
+from array import array
+
+class Program:
+    def __init__(self,data=b'',origin=0):
+        self.data=bytearray(data)
+        self.origin=origin
+
+    def __len__(self):
+        return len(self.data)
+
+    # Address of the last byte of the program
+    @property
+    def end(self):
+        return self.origin+len(self.data)-1
+
+    # Number of 256 byte pages used by the program
+    @property
+    def pages(self):
+        return -(-len(self.data) // 256)
+
+    # Zero copy view of the image between two addresses
+    def view(self,start=None,stop=None):
+        start=self.origin if start is None else start
+        stop=self.origin+len(self.data) if stop is None else stop
+        return memoryview(self.data)[start-self.origin:stop-self.origin]
+
+    # Big endian 16 bit words of the image, a trailing odd byte is not a word and is left out
+    def words(self):
+        n=len(self.data) & ~1
+        w=array('H')
+        w.frombytes(memoryview(self.data)[:n])
+        if sys.byteorder=='little':
+            w.byteswap()
+        return w
+
+    # Hex text of the image with an optional separator between bytes
+    def hex(self,sep=''):
+        if sep:
+            return self.data.hex(sep).upper()
+        return self.data.hex().upper()
+
+    # Start and end address with the number of pages as written in the index file
+    def address_range(self):
+        return '%04X - %04X (%d)' % (self.origin,self.end & 0xFFFF,self.pages)
+
+# Read a binary file into a program
+def read_binary(filename,origin=0):
+    with open(filename,'rb') as f:
+        return Program(f.read(),origin)
+
+# Read a hex text file of byte pairs, separated by spaces or not, into a program
+def read_hex(filename,origin=0):
+    with open(filename,'r') as f:
+        return Program(bytes.fromhex(f.read()),origin)
@@ -0,0 +1,286 @@
+# chip8corpus.py
+# Author : Costas Skordis
+#
+# Packed corpus of the archive with a prebuilt search index.
+# build() writes every binary of a directory back to back into one corpus file that is
+# opened with mmap, followed by the n-gram postings used for substring search: the
+# sorted n-grams of all images, the start of the postings of every n-gram and the
+# numbers of the programs holding it, as little endian arrays read in place through
+# memoryview casts. The catalogue next to it (same name with a .json extension) holds
+# the name, address range and offset of every program and the histogram of the
+# instructions found by the control flow analysis (chip8flow).
+# Queries bisect the mmap'd arrays and never open the program files, so a lookup
+# across the archive takes microseconds once the corpus is open.
+#
+#   python chip8corpus.py build --source ../Software/binary --corpus chip8.c8c --origin 0600
+#   python chip8corpus.py uses Fx00
+#   python chip8corpus.py find "A2 1E D0 15"
+#
+# Requires Python 3.1.2 or newer
+
+import os,sys,json,mmap,bisect
+from array import array
+from pathlib import Path
+
+if __package__:
+    from . import chip8core,chip8flow
+    from . import chip8decode as dc
+else:
+    import chip8core
+    import chip8decode as dc
+    import chip8flow
+
+MAGIC = b'CHIP8CRP'
+VERSION = 1
+NGRAM = 3              # Length of the byte sequences in the postings
+HEADER_SIZE = 16       # Magic and version, padded so the arrays are aligned
+
+# Little endian bytes of an array
+def le_bytes(values):
+    if sys.byteorder!='little':
+        values=array(values.typecode,values)
+        values.byteswap()
+    return values.tobytes()
+
+# Array of count little endian values at an offset of the corpus, cast in place
+# on little endian machines
+def section(mm,offset,count,typecode):
+    size=array(typecode).itemsize
+    view=memoryview(mm)[offset:offset+count*size]
+    if sys.byteorder=='little':
+        return view.cast(typecode)
+    values=array(typecode,view.tobytes())
+    values.byteswap()
+    return values
+
+# N-grams of an image as integers
+def ngrams(data):
+    return set(int.from_bytes(data[k:k+NGRAM],'big') for k in range(len(data)-NGRAM+1))
+
+# Instruction counts of the code of a program by pattern
+def histogram(Image):
+    flow=chip8flow.analyse(Image)
+    counts=[0]*len(dc.PATTERNS)
+    data=Image.data
+    for pos in range(len(data)-1):
+        if flow.code[pos]==chip8flow.CODE:
+            counts[dc.KIND[data[pos]<<8 | data[pos+1]]]+=1
+    return {dc.PATTERNS[kind]:n for kind,n in enumerate(counts) if n}
+
+# Pack the binaries of a directory into a corpus file and write its catalogue
+def build(SourceDir,CorpusFile,Origin=0x0600):
+    Files=sorted(Path(SourceDir).glob('*.ch8'),key=lambda path: path.name.lower())
+    Programs=[]
+    Postings={}
+    Images=[]
+    offset=HEADER_SIZE
+    for n,path in enumerate(Files):
+        Image=chip8core.read_binary(str(path),Origin)
+        Images.append(Image.data)
+        Programs.append({'Name':path.stem,'Origin':Image.origin,'Offset':offset,'Size':len(Image),
+                         'Address':Image.address_range(),'Histogram':histogram(Image)})
+        offset=offset+len(Image)
+        for gram in ngrams(Image.data):
+            Postings.setdefault(gram,[]).append(n)
+    keys=array('I',sorted(Postings))
+    starts=array('I',[0])
+    programs=array('H')
+    for gram in keys:
+        programs.extend(Postings[gram])
+        starts.append(len(programs))
+    if os.path.dirname(CorpusFile):
+        os.makedirs(os.path.dirname(CorpusFile),exist_ok=True)
+    with open(CorpusFile,'wb') as f:
+        f.write(MAGIC+VERSION.to_bytes(4,'little')+bytes(HEADER_SIZE-len(MAGIC)-4))
+        for data in Images:
+            f.write(data)
+        f.write(bytes(-f.tell() & 3))
+        KeysOffset=f.tell()
+        f.write(le_bytes(keys))
+        StartsOffset=f.tell()
+        f.write(le_bytes(starts))
+        ProgramsOffset=f.tell()
+        f.write(le_bytes(programs))
+    Catalogue={'Version':VERSION,'NGram':NGRAM,'Grams':len(keys),'Postings':len(programs),
+               'KeysOffset':KeysOffset,'StartsOffset':StartsOffset,'ProgramsOffset':ProgramsOffset,
+               'Programs':Programs}
+    with open(catalogue_file(CorpusFile),'w') as f:
+        json.dump(Catalogue,f,indent=1)
+    return Catalogue
+
+def catalogue_file(CorpusFile):
+    return os.path.splitext(CorpusFile)[0]+'.json'
+
+class CorpusError(Exception):
+    pass
+
+# Read only view of a corpus file
+class Corpus:
+    def __init__(self,CorpusFile):
+        with open(catalogue_file(CorpusFile),'r') as f:
+            self.catalogue=json.load(f)
+        if self.catalogue.get('Version')!=VERSION:
+            raise CorpusError('Corpus '+CorpusFile+' has version %s, rebuild it' % self.catalogue.get('Version'))
+        self.file=open(CorpusFile,'rb')
+        self.mm=mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)]!=MAGIC:
+            self.close()
+            raise CorpusError(CorpusFile+' is not a corpus file')
+        c=self.catalogue
+        self.programs=c['Programs']
+        self.keys=section(self.mm,c['KeysOffset'],c['Grams'],'I')
+        self.starts=section(self.mm,c['StartsOffset'],c['Grams']+1,'I')
+        self.postings=section(self.mm,c['ProgramsOffset'],c['Postings'],'H')
+
+    def close(self):
+        # The casts of the mmap have to be released before it is closed
+        for name in ('keys','starts','postings'):
+            view=self.__dict__.pop(name,None)
+            if isinstance(view,memoryview):
+                view.release()
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def __len__(self):
+        return len(self.programs)
+
+    # Program image copied out of the corpus
+    def image(self,n):
+        Program=self.programs[n]
+        return chip8core.Program(self.mm[Program['Offset']:Program['Offset']+Program['Size']],Program['Origin'])
+
+    # Number of the program with a name
+    def lookup(self,Name):
+        for n,Program in enumerate(self.programs):
+            if Program['Name']==Name:
+                return n
+        raise CorpusError('No program '+Name)
+
+    # Programs using an instruction pattern such as Fx00 or 0nnn, with the number of uses
+    def uses(self,pattern):
+        for Pattern in dc.PATTERNS:
+            if Pattern.lower()==pattern.lower():
+                break
+        else:
+            raise CorpusError('Unknown instruction pattern '+pattern)
+        return [(n,Program['Histogram'][Pattern]) for n,Program in enumerate(self.programs) if Pattern in Program['Histogram']]
+
+    # Programs holding every n-gram of a byte sequence, all programs for short sequences
+    def candidates(self,data):
+        found=None
+        for gram in sorted(ngrams(data)):
+            k=bisect.bisect_left(self.keys,gram)
+            if k==len(self.keys) or self.keys[k]!=gram:
+                return []
+            programs=set(self.postings[self.starts[k]:self.starts[k+1]])
+            found=programs if found is None else found & programs
+            if not found:
+                return []
+        return range(len(self.programs)) if found is None else sorted(found)
+
+    # Programs and addresses where a byte sequence occurs
+    def find(self,data):
+        data=bytes(data)
+        matches=[]
+        for n in self.candidates(data):
+            Program=self.programs[n]
+            start=Program['Offset']
+            end=start+Program['Size']
+            pos=self.mm.find(data,start,end) if data else -1
+            while pos>=0:
+                matches.append((n,Program['Origin']+pos-start))
+                pos=self.mm.find(data,pos+1,end)
+        return matches
+
+    # Programs loaded at an address
+    def at(self,address):
+        return [n for n,Program in enumerate(self.programs) if Program['Origin']<=address<Program['Origin']+Program['Size']]
+
+if __name__ == '__main__':
+    import time
+    import click
+
+    CorpusFile=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'Software','corpus','chip8.c8c')
+    corpus_option=click.option('--corpus','corpus_file',default=CorpusFile,type=click.Path(dir_okay=False),show_default=True,help='Corpus file.')
+
+    # Run a query on the corpus and print the time it took
+    def query(corpus_file,func,*args):
+        try:
+            with Corpus(corpus_file) as corpus:
+                start=time.perf_counter()
+                result=func(corpus,*args)
+                elapsed=time.perf_counter()-start
+                rows=[(corpus.programs[row[0]] if isinstance(row,tuple) else corpus.programs[row],row) for row in result]
+        except (OSError,CorpusError) as e:
+            raise click.ClickException(str(e))
+        return rows,elapsed
+
+    @click.group()
+    def cli():
+        """Packed corpus of the archive with a search index."""
+
+    @cli.command(name='build')
+    @click.option('--source',default=os.path.join(os.path.dirname(os.path.dirname(CorpusFile)),'binary'),type=click.Path(exists=True,file_okay=False),show_default=True,help='Binary source directory.')
+    @corpus_option
+    @click.option('--origin',default='0600',show_default=True,help='Origin start address in hex.')
+    def build_command(source,corpus_file,origin):
+        """Pack the binaries into the corpus file and build its index."""
+        start=time.perf_counter()
+        Catalogue=build(source,corpus_file,int(origin,16))
+        print('%d programs, %d n-grams, %d postings in %.1f ms' % (len(Catalogue['Programs']),Catalogue['Grams'],
+              Catalogue['Postings'],(time.perf_counter()-start)*1000))
+
+    @cli.command(name='list')
+    @corpus_option
+    def list_command(corpus_file):
+        """List the programs with their address ranges."""
+        rows,elapsed=query(corpus_file,lambda corpus: range(len(corpus)))
+        f='{text1:.<70}{text2:15}'
+        for Program,n in rows:
+            print(f.format(text1=Program['Name'],text2=Program['Address']))
+
+    @cli.command(name='uses')
+    @corpus_option
+    @click.argument('pattern')
+    def uses_command(corpus_file,pattern):
+        """List the programs using an instruction pattern such as Fx00 or 0nnn."""
+        rows,elapsed=query(corpus_file,Corpus.uses,pattern)
+        for Program,(n,count) in rows:
+            print('{0:.<70}{1:>6}'.format(Program['Name'],count))
+        print('%d programs in %.1f us' % (len(rows),elapsed*1e6),file=sys.stderr)
+
+    @cli.command(name='find')
+    @corpus_option
+    @click.argument('hexbytes')
+    def find_command(corpus_file,hexbytes):
+        """List the programs and addresses holding a byte sequence in hex."""
+        try:
+            data=bytes.fromhex(hexbytes)
+        except ValueError:
+            raise click.BadParameter('Please enter valid hexidecimal values',param_hint='HEXBYTES')
+        rows,elapsed=query(corpus_file,Corpus.find,data)
+        for Program,(n,address) in rows:
+            print('{0:.<70}{1:04X}'.format(Program['Name'],address))
+        print('%d matches in %.1f us' % (len(rows),elapsed*1e6),file=sys.stderr)
+
+    @cli.command(name='at')
+    @corpus_option
+    @click.argument('address')
+    def at_command(corpus_file,address):
+        """List the programs loaded at an address in hex."""
+        try:
+            address=int(address,16)
+        except ValueError:
+            raise click.BadParameter('Please enter valid hexidecimal values',param_hint='ADDRESS')
+        rows,elapsed=query(corpus_file,Corpus.at,address)
+        for Program,n in rows:
+            print('{0:.<70}{1:15}'.format(Program['Name'],Program['Address']))
+        print('%d programs in %.1f us' % (len(rows),elapsed*1e6),file=sys.stderr)
+
+    cli()
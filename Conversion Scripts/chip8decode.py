@@ -0,0 +1,144 @@
+# chip8decode.py
+# Author : Costas Skordis
+#
+# Table driven CHIP-8 / ETI-660 opcode decoder.
+# KIND maps every 16 bit opcode to an instruction number. It is filled once at import
+# with slice assignments, one per instruction pattern, so decoding an opcode is a single
+# index. The mnemonic text of all 65536 opcodes is built on first use by mnemonic_table().
+#
+# Requires Python 3.1.2 or newer
+
+# Instruction numbers
+DATA   = 0      # Not an instruction
+NOP    = 1      # 0000
+CLS    = 2      # 00E0
+RET    = 3      # 00EE
+SYS    = 4      # 0nnn  machine code subroutine
+JP     = 5      # 1nnn
+CALL   = 6      # 2nnn
+SE     = 7      # 3xnn
+SNE    = 8      # 4xnn
+SEV    = 9      # 5xy0
+LD     = 10     # 6xnn
+ADD    = 11     # 7xnn
+LDV    = 12     # 8xy0
+OR     = 13     # 8xy1
+AND    = 14     # 8xy2
+XOR    = 15     # 8xy3
+ADDV   = 16     # 8xy4
+SUB    = 17     # 8xy5
+SHR    = 18     # 8xy6
+SUBN   = 19     # 8xy7
+SHL    = 20     # 8xyE
+SNEV   = 21     # 9xy0
+LDI    = 22     # Annn
+JPV0   = 23     # Bnnn
+RND    = 24     # Cxnn
+DRW    = 25     # Dxyn
+SKP    = 26     # Ex9E
+SKNP   = 27     # ExA1
+PITCH  = 28     # Fx00  ETI-660 tone pitch
+LDVDT  = 29     # Fx07
+LDK    = 30     # Fx0A
+LDDT   = 31     # Fx15
+LDST   = 32     # Fx18
+ADDI   = 33     # Fx1E
+LDF    = 34     # Fx29
+BCD    = 35     # Fx33
+STORE  = 36     # Fx55
+LOAD   = 37     # Fx65
+
+# Mnemonic templates by instruction number
+TEMPLATES = [
+    'Data',
+    'NoOp',
+    'Clear',
+    'Return',
+    'Call {NNN}',
+    'Goto {NNN}',
+    'Do {NNN}',
+    'Skip if V{X} = {NN}',
+    'Skip if not V{X} = {NN}',
+    'Skip if V{X} = V{Y}',
+    'V{X} = {NN}',
+    'V{X} = V{X} + {NN}',
+    'V{X} = V{Y}',
+    'V{X} or V{Y}',
+    'V{X} and V{Y}',
+    'V{X} xor V{Y}',
+    'V{X} = V{X} + V{Y}',
+    'V{X} = V{X} - V{Y}',
+    'V{X} = V{Y} shr 1',
+    'V{X} = V{Y} - V{X}',
+    'V{X} = V{Y} shl 1',
+    'Skip if not V{X} = V{Y}',
+    'I = {NNN}',
+    'Goto {NNN} + V0',
+    'V{X} = random and {NN}',
+    'Show {N} at V{X}, V{Y}',
+    'Skip if V{X} is key',
+    'Skip if not V{X} is key',
+    'Pitch = V{X}',
+    'V{X} = Time',
+    'V{X} = Key',
+    'Time = V{X}',
+    'Tone = V{X}',
+    'I = I + V{X}',
+    'I = Display V{X}',
+    'M(I)=DECML V{X}',
+    'M(I)=V0:V{X}',
+    'V0:V{X} = M(I)',
+]
+
+# Opcode patterns by instruction number as written in the documentation
+PATTERNS = [
+    'Data','0000','00E0','00EE','0nnn','1nnn','2nnn','3xnn','4xnn','5xy0','6xnn','7xnn',
+    '8xy0','8xy1','8xy2','8xy3','8xy4','8xy5','8xy6','8xy7','8xyE','9xy0','Annn','Bnnn',
+    'Cxnn','Dxyn','Ex9E','ExA1','Fx00','Fx07','Fx0A','Fx15','Fx18','Fx1E','Fx29','Fx33',
+    'Fx55','Fx65',
+]
+
+# Build the decode table of all opcodes
+def build_table():
+    table=bytearray(65536)
+    # Whole high nibble
+    for kind,op in ((SYS,0x0),(JP,0x1),(CALL,0x2),(SE,0x3),(SNE,0x4),(LD,0x6),(ADD,0x7),
+                    (LDI,0xA),(JPV0,0xB),(RND,0xC),(DRW,0xD)):
+        table[op<<12:(op+1)<<12]=bytes([kind])*4096
+    # High and low nibble
+    for kind,op,n in ((SEV,0x5,0x0),(LDV,0x8,0x0),(OR,0x8,0x1),(AND,0x8,0x2),(XOR,0x8,0x3),
+                      (ADDV,0x8,0x4),(SUB,0x8,0x5),(SHR,0x8,0x6),(SUBN,0x8,0x7),(SHL,0x8,0xE),
+                      (SNEV,0x9,0x0)):
+        table[(op<<12)+n:(op+1)<<12:16]=bytes([kind])*256
+    # High nibble and low byte
+    for kind,op,nn in ((SKP,0xE,0x9E),(SKNP,0xE,0xA1),(PITCH,0xF,0x00),(LDVDT,0xF,0x07),
+                       (LDK,0xF,0x0A),(LDDT,0xF,0x15),(LDST,0xF,0x18),(ADDI,0xF,0x1E),
+                       (LDF,0xF,0x29),(BCD,0xF,0x33),(STORE,0xF,0x55),(LOAD,0xF,0x65)):
+        table[(op<<12)+nn:(op+1)<<12:256]=bytes([kind])*16
+    # Full opcodes
+    table[0x0000]=NOP
+    table[0x00E0]=CLS
+    table[0x00EE]=RET
+    return table
+
+KIND=build_table()
+
+# Return the mnemonic of a single opcode
+def mnemonic(opcode):
+    return TEMPLATES[KIND[opcode]].format(X='%X' % (opcode>>8 & 0xF),Y='%X' % (opcode>>4 & 0xF),
+                                           N='%X' % (opcode & 0xF),NN='%02X' % (opcode & 0xFF),
+                                           NNN='%03X' % (opcode & 0xFFF))
+
+_mnemonics=None
+
+# Return the mnemonics of all 65536 opcodes, built on first use
+def mnemonic_table():
+    global _mnemonics
+    if _mnemonics is None:
+        _mnemonics=[mnemonic(opcode) for opcode in range(65536)]
+    return _mnemonics
+
+# Return the mnemonics of a sequence of opcodes
+def disassemble(words):
+    table=mnemonic_table()
+    return [table[w] for w in words]
@@ -0,0 +1,410 @@
+# chip8dedup.py
+# Author : Costas Skordis
+#
+# Content addressed store of the archive with near duplicate detection.
+# The store keeps every distinct image once, as objects/<sha256>.ch8 named by the
+# SHA-256 of its bytes, and every program name as a symbolic link to its object
+# (names/<Name>.ch8), so a program already in the store under another name only adds a
+# link. The catalogue next to them (store.json) holds the names of the programs, the
+# size and sketch of every object and the size and modification time of every file
+# ingested, so ingesting a dump again reads and hashes the new and changed files only.
+# The names of the files gone from the dump are removed, their images are kept.
+# The sketch of an image is a bottom-k MinHash of its instructions: every window of
+# SHINGLE consecutive instructions is read as one 64 bit integer, mixed, and the
+# SKETCH smallest values are kept. The share of the smallest values of two sketches
+# found in both estimates the Jaccard similarity of their windows, so padded,
+# corrected and updated versions of a program score high while programs sharing a
+# few idioms score low. Candidates come from an inverted index of the sketch values
+# so the images are never compared pair by pair. Similar images are grouped and each
+# variant is kept as a delta against the first image of its group: copies of ranges
+# of the base, runs of one byte and literal bytes, as varints.
+#
+#   python chip8dedup.py ingest --source ../Software/binary
+#   python chip8dedup.py groups
+#   python chip8dedup.py deltas --target ../Software/store/deltas
+#
+# Requires Python 3.1.2 or newer
+
+import os,sys,json,heapq,hashlib,difflib
+from array import array
+from collections import Counter
+from pathlib import Path
+
+if __package__:
+    from . import Output
+else:
+    import Output
+
+VERSION = 1
+SHINGLE = 4            # Instructions per window, 64 bits
+SKETCH = 64            # Values kept in a sketch
+THRESHOLD = 0.5        # Similarity of the variants of a program
+MASK = (1<<64)-1
+DELTA_MAGIC = b'C8D'
+COPY,FILL,LITERAL = 0,1,2
+MIN_COPY = 4           # Shorter matches are cheaper as literal bytes
+MIN_FILL = 4           # Shorter runs are cheaper as literal bytes
+
+class DedupError(Exception):
+    pass
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+# Finalizer of splitmix64, spreads the windows evenly over 64 bits
+def mix(x):
+    x=(x^(x>>30))*0xBF58476D1CE4E5B9 & MASK
+    x=(x^(x>>27))*0x94D049BB133111EB & MASK
+    return x^(x>>31)
+
+# Windows of SHINGLE instructions at every even offset of an image as big endian 64
+# bit integers, read as arrays of 8 byte values from the first SHINGLE instructions
+def shingles(data):
+    data=bytes(data)
+    if len(data)<2*SHINGLE:
+        return {int.from_bytes(data,'big')} if data else set()
+    values=set()
+    for k in range(0,2*SHINGLE,2):
+        windows=array('Q',data[k:k+(len(data)-k)//8*8])
+        if sys.byteorder=='little':
+            windows.byteswap()
+        values.update(windows)
+    return values
+
+# Sorted bottom-k MinHash sketch of an image
+def sketch(data):
+    return sorted(map(mix,shingles(data)))[:SKETCH]
+
+# Estimated Jaccard similarity of the images of two sketches
+def similarity(a,b):
+    union=heapq.nsmallest(SKETCH,set(a) | set(b))
+    if not union:
+        return 1.0
+    both=set(a) & set(b)
+    return sum(1 for value in union if value in both)/len(union)
+
+def varint(n):
+    out=bytearray()
+    while n>=0x80:
+        out.append(n & 0x7F | 0x80)
+        n>>=7
+    out.append(n)
+    return bytes(out)
+
+def read_varint(data,pos):
+    n=shift=0
+    while True:
+        if pos>=len(data):
+            raise DedupError('Truncated delta')
+        byte=data[pos]
+        pos+=1
+        n|=(byte & 0x7F)<<shift
+        shift+=7
+        if byte<0x80:
+            return n,pos
+
+# Literal bytes as fill and literal operations
+def literal_ops(data):
+    out=bytearray()
+    pos=start=0
+    while pos<len(data):
+        end=pos
+        while end<len(data) and data[end]==data[pos]:
+            end+=1
+        if end-pos>=MIN_FILL:
+            if pos>start:
+                out+=varint((pos-start)<<2 | LITERAL)+data[start:pos]
+            out+=varint((end-pos)<<2 | FILL)+data[pos:pos+1]
+            start=end
+        pos=end
+    if len(data)>start:
+        out+=varint((len(data)-start)<<2 | LITERAL)+data[start:]
+    return out
+
+# Delta turning the image base into target: the magic, the first 8 bytes of the
+# SHA-256 of base, the size of target and the operations
+def delta(base,target):
+    base=bytes(base)
+    target=bytes(target)
+    out=bytearray(DELTA_MAGIC+hashlib.sha256(base).digest()[:8]+varint(len(target)))
+    matcher=difflib.SequenceMatcher(None,base,target,autojunk=False)
+    # Walk the target, copying the long matches and keeping the rest literal
+    pos=0
+    for i,j,n in matcher.get_matching_blocks():
+        if n<MIN_COPY:
+            continue
+        out+=literal_ops(target[pos:j])
+        out+=varint(n<<2 | COPY)+varint(i)
+        pos=j+n
+    out+=literal_ops(target[pos:])
+    return bytes(out)
+
+# Image rebuilt from its base and a delta
+def patch(base,data):
+    base=bytes(base)
+    if data[:len(DELTA_MAGIC)]!=DELTA_MAGIC:
+        raise DedupError('Not a delta')
+    pos=len(DELTA_MAGIC)+8
+    if data[len(DELTA_MAGIC):pos]!=hashlib.sha256(base).digest()[:8]:
+        raise DedupError('The delta is not made against this base')
+    size,pos=read_varint(data,pos)
+    out=bytearray()
+    while pos<len(data):
+        op,pos=read_varint(data,pos)
+        n,kind=op>>2,op & 3
+        if kind==COPY:
+            offset,pos=read_varint(data,pos)
+            out+=base[offset:offset+n]
+        elif kind==FILL:
+            out+=data[pos:pos+1]*n
+            pos+=1
+        else:
+            out+=data[pos:pos+n]
+            pos+=n
+    if len(out)!=size:
+        raise DedupError('Corrupt delta')
+    return bytes(out)
+
+# Content addressed store of program images
+class Store:
+    def __init__(self,StoreDir):
+        self.dir=StoreDir
+        try:
+            with open(self.catalogue_file(),'r') as f:
+                self.catalogue=json.load(f)
+        except FileNotFoundError:
+            self.catalogue={'Version':VERSION,'Objects':{},'Names':{}}
+        if self.catalogue.get('Version')!=VERSION:
+            raise DedupError('Store '+StoreDir+' has version %s' % self.catalogue.get('Version'))
+        # Objects by digest with their size and sketch, in the order they were added
+        self.objects=self.catalogue['Objects']
+        # Digest of the image of every program name
+        self.names=self.catalogue['Names']
+        # Size, modification time and digest of every source file ingested
+        self.sources=self.catalogue.setdefault('Sources',{})
+        self.index=None
+
+    def catalogue_file(self):
+        return os.path.join(self.dir,'store.json')
+
+    def object_file(self,Digest):
+        return os.path.join(self.dir,'objects',Digest+'.ch8')
+
+    def name_file(self,Name):
+        return os.path.join(self.dir,'names',Name+'.ch8')
+
+    def save(self):
+        Output.MakeDirs(self.dir)
+        Output.WriteText(self.catalogue_file(),json.dumps(self.catalogue,indent=1))
+
+    # Add the image of a program, returns its digest and whether the image is new
+    def add(self,Name,data):
+        Digest=digest(data)
+        New=Digest not in self.objects
+        if New:
+            Output.MakeDirs(os.path.dirname(self.object_file(Digest)))
+            Output.WriteBytes(self.object_file(Digest),data)
+            self.objects[Digest]={'Size':len(data),'Sketch':sketch(data)}
+            self.index=None
+        if self.names.get(Name)!=Digest:
+            Output.MakeDirs(os.path.dirname(self.name_file(Name)))
+            Output.SymLink(self.object_file(Digest),self.name_file(Name))
+            self.names[Name]=Digest
+        return Digest,New
+
+    # Remove a program name, its image is kept
+    def remove(self,Name):
+        if self.names.pop(Name,None) is None:
+            return
+        try:
+            os.remove(self.name_file(Name))
+        except FileNotFoundError:
+            pass
+
+    def read(self,Digest):
+        with open(self.object_file(Digest),'rb') as f:
+            return f.read()
+
+    # Program names of every object, the start of the digest for an object whose
+    # programs were all changed by a later ingest
+    def aliases(self):
+        Names={}
+        for Name,Digest in sorted(self.names.items(),key=lambda item: item[0].lower()):
+            Names.setdefault(Digest,[]).append(Name)
+        for Digest in self.objects:
+            Names.setdefault(Digest,[Digest[:12]])
+        return Names
+
+    # Objects holding every sketch value
+    def postings(self):
+        if self.index is None:
+            self.index={}
+            for Digest,Object in self.objects.items():
+                for value in Object['Sketch']:
+                    self.index.setdefault(value,[]).append(Digest)
+        return self.index
+
+    # Objects similar to an object, most similar first. A similarity of at least
+    # threshold needs that share of the larger sketch in both, so the objects sharing
+    # fewer values are never compared.
+    def similar(self,Digest,threshold=THRESHOLD):
+        a=self.objects[Digest]['Sketch']
+        index=self.postings()
+        shared=Counter(other for value in a for other in index[value] if other!=Digest)
+        found=[]
+        for other,n in shared.items():
+            b=self.objects[other]['Sketch']
+            if n>=threshold*max(len(a),len(b)):
+                score=similarity(a,b)
+                if score>=threshold:
+                    found.append((other,score))
+        return sorted(found,key=lambda item: -item[1])
+
+    # Groups of similar objects, each starting with its oldest object
+    def groups(self,threshold=THRESHOLD):
+        order={Digest:n for n,Digest in enumerate(self.objects)}
+        parent={}
+        def find(Digest):
+            while parent.get(Digest,Digest)!=Digest:
+                Digest=parent[Digest]
+            return Digest
+        for Digest in self.objects:
+            for other,score in self.similar(Digest,threshold):
+                a,b=find(Digest),find(other)
+                if a!=b:
+                    parent[max(a,b,key=order.get)]=min(a,b,key=order.get)
+        Groups={}
+        for Digest in self.objects:
+            Groups.setdefault(find(Digest),[]).append(Digest)
+        return [Group for Group in Groups.values() if len(Group)>1]
+
+# Add the binaries of a directory to a store. Files with the size and modification
+# time of their last ingest under the same name are not read again and the names of
+# the files ingested before from the directory that are gone are removed. Returns the
+# store, the number of programs, the digests of the new images and the names removed.
+def ingest(SourceDir,StoreDir):
+    store=Store(StoreDir)
+    Files=sorted(Path(SourceDir).glob('*.ch8'),key=lambda path: path.name.lower())
+    New=[]
+    Removed=[]
+    Dir=str(Path(SourceDir).resolve())
+    Present={str(path.resolve()) for path in Files}
+    for Source,Seen in list(store.sources.items()):
+        if os.path.dirname(Source)!=Dir or Source in Present:
+            continue
+        del store.sources[Source]
+        Name=Path(Source).stem
+        # The name may have been ingested since from a file of another directory
+        if store.names.get(Name)==Seen[2] and not any(Path(Other).stem==Name for Other in store.sources):
+            store.remove(Name)
+            Removed.append(Name)
+    for path in Files:
+        Source=str(path.resolve())
+        Stat=path.stat()
+        Seen=store.sources.get(Source)
+        if Seen and Seen[:2]==[Stat.st_size,Stat.st_mtime_ns] and store.names.get(path.stem)==Seen[2]:
+            continue
+        Digest,IsNew=store.add(path.stem,path.read_bytes())
+        store.sources[Source]=[Stat.st_size,Stat.st_mtime_ns,Digest]
+        if IsNew:
+            New.append(Digest)
+    store.save()
+    return store,len(Files),New,Removed
+
+if __name__ == '__main__':
+    import time
+    import click
+
+    StoreDir=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'Software','store')
+    store_option=click.option('--store','store_dir',default=StoreDir,type=click.Path(file_okay=False),show_default=True,help='Store directory.')
+    threshold_option=click.option('--threshold',default=THRESHOLD,type=click.FloatRange(0,1),show_default=True,help='Similarity of the variants of a program.')
+
+    def open_store(store_dir):
+        try:
+            return Store(store_dir)
+        except (OSError,ValueError,DedupError) as e:
+            raise click.ClickException(str(e))
+
+    @click.group()
+    def cli():
+        """Content addressed store of the archive with near duplicate detection."""
+
+    @cli.command(name='ingest')
+    @click.option('--source',default=os.path.join(os.path.dirname(StoreDir),'binary'),type=click.Path(exists=True,file_okay=False),show_default=True,help='Binary source directory.')
+    @store_option
+    @threshold_option
+    def ingest_command(source,store_dir,threshold):
+        """Add the binaries of a directory to the store and list the new variants."""
+        start=time.perf_counter()
+        try:
+            store,Count,New,Removed=ingest(source,store_dir)
+        except (OSError,ValueError,DedupError) as e:
+            raise click.ClickException(str(e))
+        # Each new image with the images stored before it that it is a variant of
+        order={Digest:n for n,Digest in enumerate(store.objects)}
+        Found=[(Digest,[(other,score) for other,score in store.similar(Digest,threshold) if order[other]<order[Digest]])
+               for Digest in New]
+        elapsed=time.perf_counter()-start
+        Names=store.aliases()
+        for Digest,similar in Found:
+            for other,score in similar:
+                print('{0:.<60}{1:.<60}{2:5.2f}'.format(Names[Digest][0],Names[other][0],score))
+        for Name in Removed:
+            print('Removed : '+Name)
+        print('%d programs, %d new images, %d already stored, %d removed in %.1f ms' % (Count,len(New),Count-len(New),len(Removed),elapsed*1000),file=sys.stderr)
+
+    @cli.command(name='groups')
+    @store_option
+    @threshold_option
+    def groups_command(store_dir,threshold):
+        """List the programs stored under more than one name and the groups of variants."""
+        store=open_store(store_dir)
+        Names=store.aliases()
+        for Digest,Aliases in Names.items():
+            if len(Aliases)>1:
+                print('Same image : '+' = '.join(Aliases))
+        for Group in store.groups(threshold):
+            base=Group[0]
+            print(Names[base][0])
+            for Digest in Group[1:]:
+                print('  {0:.<70}{1:5.2f}{2:>7}'.format(Names[Digest][0],similarity(store.objects[base]['Sketch'],
+                      store.objects[Digest]['Sketch']),store.objects[Digest]['Size']))
+
+    @cli.command(name='deltas')
+    @store_option
+    @threshold_option
+    @click.option('--target',required=True,type=click.Path(file_okay=False),help='Directory for the delta files.')
+    def deltas_command(store_dir,threshold,target):
+        """Write every variant as a delta against the first image of its group."""
+        store=open_store(store_dir)
+        Names=store.aliases()
+        Output.MakeDirs(target)
+        Total=Size=0
+        for Group in store.groups(threshold):
+            base=store.read(Group[0])
+            for Digest in Group[1:]:
+                data=store.read(Digest)
+                Delta=delta(base,data)
+                Output.WriteBytes(os.path.join(target,Names[Digest][0]+'.c8d'),Delta)
+                print('{0:.<70}{1:>6} {2:>6}  {3}'.format(Names[Digest][0],len(data),len(Delta),Names[Group[0]][0]))
+                Total+=len(data)
+                Size+=len(Delta)
+        if Total:
+            print('%d bytes of variants in %d bytes of deltas' % (Total,Size),file=sys.stderr)
+
+    @cli.command(name='patch')
+    @click.argument('base',type=click.Path(exists=True,dir_okay=False))
+    @click.argument('delta_file',metavar='DELTA',type=click.Path(exists=True,dir_okay=False))
+    @click.argument('target',type=click.Path(dir_okay=False))
+    def patch_command(base,delta_file,target):
+        """Rebuild a variant from its base image and its delta."""
+        try:
+            with open(base,'rb') as f:
+                Base=f.read()
+            with open(delta_file,'rb') as f:
+                Delta=f.read()
+            Output.WriteBytes(target,patch(Base,Delta))
+        except (OSError,DedupError) as e:
+            raise click.ClickException(str(e))
+
+    cli()
@@ -0,0 +1,169 @@
+# chip8flow.py
+# Author : Costas Skordis
+#
+# Control flow analysis of CHIP-8 / ETI-660 programs to separate code from data.
+# Starting at the origin every reachable instruction is traced with a worklist,
+# following Goto (1nnn), Do (2nnn), Goto + V0 (Bnnn) and both paths of the skip
+# instructions and stopping at Return (00EE) and invalid opcodes. I = nnn (Annn)
+# targets are recorded as data references. A visited bitmap keeps the trace linear
+# in the size of the image. Results are cached by the hash of the image, and can be
+# saved and loaded as records (see BinToHexFileCLI, which keeps them in the build cache
+# of the target directory) so a later run or another worker process does not trace
+# the same program again.
+#
+# Requires Python 3.1.2 or newer
+
+import hashlib
+if __package__:
+    from . import chip8decode as dc
+else:
+    import chip8decode as dc
+
+# Flags of the code bitmap
+CODE  = 1      # First byte of an instruction
+CODE2 = 2      # Second byte of an instruction
+
+# Instructions that skip the next instruction
+SKIPS = frozenset([dc.SE,dc.SNE,dc.SEV,dc.SNEV,dc.SKP,dc.SKNP])
+# Instructions after which the next instruction is not executed
+ENDS = frozenset([dc.RET,dc.JP,dc.JPV0,dc.DATA])
+
+class Flow:
+    def __init__(self,origin,size):
+        self.origin=origin
+        self.code=bytearray(size)
+        # Target address -> list of (source address, instruction number)
+        self.xrefs={}
+        # Addresses of jumps, calls and entry points
+        self.targets=set([origin])
+        # Addresses loaded into I
+        self.data_refs=set()
+
+    # Name of the label at an address, or '' when there is none
+    def label(self,address):
+        if address in self.targets:
+            return 'L%04X' % address
+        if address in self.data_refs:
+            return 'D%04X' % address
+        return ''
+
+    def is_code(self,address):
+        return self.code[address-self.origin]==CODE
+
+VERSION = 1            # Version of the trace, part of the keys of saved records
+
+_cache={}
+_saved={}
+_used={}
+
+# Key of the results of a program
+def cache_key(Image):
+    return '%s:%04X:%d' % (hashlib.sha256(Image.data).hexdigest(),Image.origin,VERSION)
+
+# Trace the control flow of a program, results are cached by image hash and origin
+def analyse(Image):
+    key=cache_key(Image)
+    flow=_cache.get(key)
+    if flow is None:
+        record=_saved.get(key)
+        flow=from_record(record) if record else trace(Image)
+        _cache[key]=flow
+    _used[key]=flow
+    return flow
+
+# Record of a flow that can be saved as JSON
+def to_record(flow):
+    return {'Origin':flow.origin,'Code':flow.code.hex(),
+            'Xrefs':[[target,source,kind] for target,refs in sorted(flow.xrefs.items()) for source,kind in refs],
+            'Targets':sorted(flow.targets),'DataRefs':sorted(flow.data_refs)}
+
+def from_record(record):
+    code=bytes.fromhex(record['Code'])
+    flow=Flow(record['Origin'],len(code))
+    flow.code[:]=code
+    for target,source,kind in record['Xrefs']:
+        flow.xrefs.setdefault(target,[]).append((source,kind))
+    flow.targets=set(record['Targets'])
+    flow.data_refs=set(record['DataRefs'])
+    return flow
+
+# Add saved records by key to the cache
+def preload(records):
+    _saved.update(records)
+
+# Records by key of the programs analysed since the last call
+def take_records():
+    records={key:_saved.get(key) or to_record(flow) for key,flow in _used.items()}
+    _used.clear()
+    return records
+
+def trace(Image):
+    data=Image.data
+    origin=Image.origin
+    size=len(data)
+    flow=Flow(origin,size)
+    code=flow.code
+    xrefs=flow.xrefs
+    kinds=dc.KIND
+    work=[origin]
+    while work:
+        address=work.pop()
+        while True:
+            pos=address-origin
+            if pos<0 or pos+1>=size or code[pos]==CODE:
+                break
+            opcode=data[pos]<<8 | data[pos+1]
+            kind=kinds[opcode]
+            if kind==dc.DATA:
+                break
+            code[pos]=CODE
+            if not code[pos+1]:
+                code[pos+1]=CODE2
+            if kind==dc.JP or kind==dc.CALL or kind==dc.JPV0 or kind==dc.LDI or kind==dc.SYS:
+                target=opcode & 0xFFF
+                xrefs.setdefault(target,[]).append((address,kind))
+                if kind==dc.LDI:
+                    flow.data_refs.add(target)
+                elif kind!=dc.SYS:
+                    flow.targets.add(target)
+                    work.append(target)
+            if kind in SKIPS:
+                work.append(address+4)
+            if kind in ENDS:
+                break
+            address=address+2
+    return flow
+
+# Sprite pattern of a data byte
+def pattern(byte):
+    return format(byte,'08b').replace('0','.').replace('1','#')
+
+# Create a listing of a program with labels, data blocks and a cross reference index.
+# Returns a list of (address, opcode, mnemonic) rows and label lines.
+def listing(Image):
+    flow=analyse(Image)
+    table=dc.mnemonic_table()
+    data=Image.data
+    origin=Image.origin
+    rows=[]
+    pos=0
+    while pos<len(data):
+        address=origin+pos
+        label=flow.label(address)
+        if label:
+            rows.append(label+':')
+        # An instruction whose second byte starts another instruction or is a jump
+        # target is listed as a data byte, so the instruction or label after it is not
+        # lost. A data label on the second byte, where a program changes its own
+        # instruction, is listed as an offset of the instruction.
+        if flow.code[pos]==CODE and flow.code[pos+1]!=CODE and address+1 not in flow.targets:
+            inner=flow.label(address+1)
+            if inner:
+                rows.append('%s = %04X+1' % (inner,address))
+            opcode=data[pos]<<8 | data[pos+1]
+            rows.append(('%04X' % address,'%04X' % opcode,table[opcode]))
+            pos=pos+2
+        else:
+            rows.append(('%04X' % address,'%02X' % data[pos],'Data '+pattern(data[pos])))
+            pos=pos+1
+    return rows,flow
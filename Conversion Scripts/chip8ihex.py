@@ -0,0 +1,159 @@
+# chip8ihex.py
+# Author : Costas Skordis
+#
+# Intel Hex writer and validating parser shared by the conversion scripts.
+# The writer works on a chip8core program and emits data records (00) with extended
+# linear address records (04) for images above 64K, ending with the end of file record.
+# The parser checks the checksum of every record, merges the data into contiguous
+# segments and reports the gaps between segments and overlapping records.
+#
+# Requires Python 3.1.2 or newer
+
+if __package__:
+    from . import chip8core,Output
+else:
+    import chip8core
+    import Output
+
+EOF_RECORD=':00000001FF'
+
+class IntelHexError(ValueError):
+    pass
+
+# Create the Intel Hex records of a program with ByteRow bytes per data record
+def encode(Image,ByteRow=16):
+    records=[]
+    view=Image.view()
+    address=Image.origin
+    upper=0
+    pos=0
+    while pos<len(view):
+        if address>>16!=upper:
+            upper=address>>16
+            records.append(':02000004%04X%02X' % (upper,(-(6+(upper>>8)+(upper & 0xFF))) & 0xFF))
+        # A record never crosses a 64K boundary
+        n=min(ByteRow,len(view)-pos,0x10000-(address & 0xFFFF))
+        row=view[pos:pos+n]
+        low=address & 0xFFFF
+        chksum=(-(n+(low>>8)+(low & 0xFF)+sum(row))) & 0xFF
+        records.append(':%02X%04X00%s%02X' % (n,low,row.hex().upper(),chksum))
+        address=address+n
+        pos=pos+n
+    records.append(EOF_RECORD)
+    return records
+
+# Text of the Intel Hex file of a program
+def hex_text(Image,ByteRow=16):
+    return '\n'.join(encode(Image,ByteRow))+'\n'
+
+# Write the Intel Hex file of a program in a single call (see Output)
+def write(filename,Image,ByteRow=16):
+    text=hex_text(Image,ByteRow)
+    Output.WriteText(filename,text)
+    return text
+
+class HexImage:
+    def __init__(self,segments,overlaps,start=None):
+        # Contiguous programs in address order
+        self.segments=segments
+        # (address, length) of bytes written by more than one record
+        self.overlaps=overlaps
+        # Start address from a 03 or 05 record
+        self.start=start
+
+    # (address, length) of the holes between segments
+    @property
+    def gaps(self):
+        return [(a.origin+len(a),b.origin-a.origin-len(a)) for a,b in zip(self.segments,self.segments[1:])]
+
+    # Single program from the lowest to the highest address, gaps filled with fill
+    def image(self,fill=0xFF):
+        if not self.segments:
+            return chip8core.Program()
+        origin=self.segments[0].origin
+        data=bytearray([fill])*(self.segments[-1].origin+len(self.segments[-1])-origin)
+        for segment in self.segments:
+            data[segment.origin-origin:segment.origin-origin+len(segment)]=segment.data
+        return chip8core.Program(data,origin)
+
+# Parse the text of an Intel Hex file
+def parse(text):
+    records=[]
+    base=0
+    start=None
+    for number,line in enumerate(text.splitlines(),1):
+        line=line.strip()
+        if not line:
+            continue
+        if line[0]!=':':
+            raise IntelHexError('Line %d: record does not start with :' % number)
+        try:
+            record=bytes.fromhex(line[1:])
+        except ValueError:
+            raise IntelHexError('Line %d: invalid hex value' % number) from None
+        if len(record)<5 or len(record)!=record[0]+5:
+            raise IntelHexError('Line %d: invalid record length' % number)
+        if sum(record) & 0xFF:
+            raise IntelHexError('Line %d: checksum error' % number)
+        rtype=record[3]
+        if rtype==0x00:
+            records.append((base+(record[1]<<8 | record[2]),record[4:-1]))
+        elif rtype==0x01:
+            break
+        elif rtype==0x02:
+            base=(record[4]<<8 | record[5])<<4
+        elif rtype==0x04:
+            base=(record[4]<<8 | record[5])<<16
+        elif rtype==0x03 or rtype==0x05:
+            start=int.from_bytes(record[4:-1],'big')
+        else:
+            raise IntelHexError('Line %d: unknown record type %02X' % (number,rtype))
+    return merge(records,start)
+
+# Merge data records into contiguous segments
+def merge(records,start=None):
+    records.sort(key=lambda r: r[0])
+    segments=[]
+    overlaps=[]
+    for address,data in records:
+        if not data:
+            continue
+        if segments:
+            last=segments[-1]
+            end=last.origin+len(last)
+            if address<end:
+                overlaps.append((address,min(end,address+len(data))-address))
+                last.data[address-last.origin:address-last.origin+len(data)]=data
+                continue
+            if address==end:
+                last.data+=data
+                continue
+        segments.append(chip8core.Program(data,address))
+    return HexImage(segments,overlaps,start)
+
+# Read and parse an Intel Hex file
+def read(filename):
+    with open(filename,'r') as f:
+        return parse(f.read())
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage : %s IntelHexFile ..." % sys.argv[0],file=sys.stderr)
+        raise SystemExit(1)
+
+    p='{text0:<10}{text1:<16}{text2}'
+    for filename in sys.argv[1:]:
+        print(filename)
+        try:
+            h=read(filename)
+        except IntelHexError as e:
+            print(p.format(text0='Error',text1='',text2=str(e)))
+            continue
+        for segment in h.segments:
+            print(p.format(text0='Segment',text1='%04X - %04X' % (segment.origin,segment.end),text2='%d bytes' % len(segment)))
+        for address,length in h.gaps:
+            print(p.format(text0='Gap',text1='%04X - %04X' % (address,address+length-1),text2='%d bytes' % length))
+        for address,length in h.overlaps:
+            print(p.format(text0='Overlap',text1='%04X - %04X' % (address,address+length-1),text2='%d bytes' % length))
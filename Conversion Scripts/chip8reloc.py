@@ -0,0 +1,124 @@
+# chip8reloc.py
+# Author : Costas Skordis
+#
+# Relocation of CHIP-8 / ETI-660 programs, for example between the ETI-660 origin 0600
+# and the CHIP-8 origin 0200.
+# Only instructions reached by the control flow analysis of chip8flow are changed, so
+# sprites and text that look like instructions are left alone. Addresses of Goto (1nnn),
+# Do (2nnn), Goto + V0 (Bnnn), I = (Annn) and machine code calls (0nnn) that point into
+# the program are moved by the offset, addresses outside the program are kept.
+# Programs often use the memory just past their end as workspace, a margin of that size
+# past the end can be moved with the program and addresses past the end that are kept
+# are reported apart from the addresses below the program.
+# The entries of a Goto + V0 jump table past the first are not traced, every Bnnn is
+# reported so its table can be checked by hand.
+# Every change is recorded in a report of (address, old opcode, new opcode, note).
+#
+# Requires Python 3.1.2 or newer
+
+if __package__:
+    from . import chip8core,chip8flow
+    from . import chip8decode as dc
+else:
+    import chip8core
+    import chip8decode as dc
+    import chip8flow
+
+# Instructions with an address
+ADDRESSED = frozenset([dc.SYS,dc.JP,dc.CALL,dc.JPV0,dc.LDI])
+
+# Positions of the instructions of a program
+def code_positions(flow):
+    code=flow.code
+    positions=[]
+    pos=code.find(chip8flow.CODE)
+    while pos>=0:
+        positions.append(pos)
+        pos=code.find(chip8flow.CODE,pos+1)
+    return positions
+
+# Move a program to a new origin, with the Workspace bytes past its end.
+# The instructions are visited one by one as only the reachable ones are changed.
+# Returns the relocated program and the report.
+def relocate(Image,NewOrigin,Workspace=0):
+    flow=chip8flow.analyse(Image)
+    New=chip8core.Program(Image.data,NewOrigin)
+    report=[]
+    offset=NewOrigin-Image.origin
+    if offset==0:
+        return New,report
+    data=New.data
+    start=Image.origin
+    end=Image.origin+len(data)
+    kinds=dc.KIND
+    for pos in code_positions(flow):
+        opcode=data[pos]<<8 | data[pos+1]
+        kind=kinds[opcode]
+        if kind not in ADDRESSED:
+            continue
+        target=opcode & 0xFFF
+        new=opcode
+        if end<=target<end+Workspace and 0<=target+offset<=0xFFF:
+            new=(opcode & 0xF000) | (target+offset)
+            data[pos]=new>>8
+            data[pos+1]=new & 0xFF
+            note='Workspace relocated'
+        elif target>=end:
+            note='Address past the end kept, check it'
+        elif target<start:
+            note='External address kept'
+        elif not 0<=target+offset<=0xFFF:
+            note='Address out of range'
+        else:
+            new=(opcode & 0xF000) | (target+offset)
+            data[pos]=new>>8
+            data[pos+1]=new & 0xFF
+            note='Machine code call, check the machine code' if kind==dc.SYS else 'Relocated'
+        report.append(('%04X' % (NewOrigin+pos),'%04X' % opcode,'%04X' % new,note))
+        if kind==dc.JPV0:
+            # Only the base of the table is traced and relocated
+            report.append(('%04X' % (NewOrigin+pos),'%04X' % new,'%04X' % new,'Jump table not traced past %03X, check its entries' % (new & 0xFFF)))
+    return New,report
+
+# Add an offset to the V register loads (6xnn) used as the y coordinate of Show (Dxyn).
+# Only the last load in the same block of straight line code before the Show is changed,
+# and not across a Do (2nnn), as the subroutine may change the register. Shows in the
+# untraced entries of a Goto + V0 jump table are reported instead.
+# Returns the report.
+def adjust_display(Image,Adjust):
+    report=[]
+    if Adjust==0:
+        return report
+    flow=chip8flow.analyse(Image)
+    data=Image.data
+    origin=Image.origin
+    kinds=dc.KIND
+    loads=[None]*16
+    adjusted=set()
+    for pos in code_positions(flow):
+        if origin+pos in flow.targets:
+            loads=[None]*16
+        opcode=data[pos]<<8 | data[pos+1]
+        kind=kinds[opcode]
+        if kind==dc.LD:
+            loads[opcode>>8 & 0xF]=pos
+        elif kind==dc.DRW:
+            load=loads[opcode>>4 & 0xF]
+            if load is None or load in adjusted:
+                continue
+            adjusted.add(load)
+            old=data[load]<<8 | data[load+1]
+            data[load+1]=min(data[load+1]+Adjust,255)
+            report.append(('%04X' % (origin+load),'%04X' % old,'%04X' % (data[load]<<8 | data[load+1]),'Display adjusted'))
+        elif kind==dc.JPV0:
+            report.append(('%04X' % (origin+pos),'%04X' % opcode,'%04X' % opcode,'Jump table not traced past %03X, check its Shows' % (opcode & 0xFFF)))
+            loads=[None]*16
+        elif kind in chip8flow.ENDS or kind in chip8flow.SKIPS or kind==dc.CALL:
+            loads=[None]*16
+        elif kind==dc.LOAD:
+            for r in range((opcode>>8 & 0xF)+1):
+                loads[r]=None
+        elif opcode>>12==0x8 or kind in (dc.ADD,dc.RND,dc.LDVDT,dc.LDK):
+            # The register is changed by something other than a load
+            loads[opcode>>8 & 0xF]=None
+    return report
@@ -0,0 +1,92 @@
+# chip8tools
+# Author : Costas Skordis
+#
+# Library API of the conversion scripts, installed with pip install -e . from the
+# root of the repository. The modules and functions below are imported from the
+# conversion scripts on first use, so importing the package loads none of them and
+# click, colorama and NumPy are only loaded by the parts that need them.
+# The conversion scripts and their profiles are installed as the subpackage
+# chip8tools.scripts, so their names do not clash with other modules. From the source
+# tree without installing they are the modules next to the package.
+#
+#   import chip8tools
+#   Image=chip8tools.read_binary('PONG.ch8',0x600)
+#   chip8tools.set_encoding(1000,500,22050,225)
+#   chip8tools.write_wav('PONG.wav',Image.view(),2,0)
+#
+#   python -m chip8tools --help
+#
+# Requires Python 3.1.2 or newer
+
+import importlib,importlib.util
+
+# Modules by the name they have in the package
+MODULES = {
+    'core':       'chip8core',
+    'decode':     'chip8decode',
+    'flow':       'chip8flow',
+    'ihex':       'chip8ihex',
+    'reloc':      'chip8reloc',
+    'vm':         'chip8vm',
+    'corpus':     'chip8corpus',
+    'dedup':      'chip8dedup',
+    'kcs':        'HexToWavFileCLI',
+    'bin2hex':    'BinToHexFileCLI',
+    'wav':        'WavToHex',
+    'tags':       'WavTags',
+    'virtualwav': 'VirtualWav',
+    'prompts':    'Prompts',
+}
+
+# Functions and classes by the module they come from
+API = {
+    'Program':         'chip8core',
+    'read_binary':     'chip8core',
+    'read_hex':        'chip8core',
+    'mnemonic':        'chip8decode',
+    'disassemble':     'chip8decode',
+    'analyse':         'chip8flow',
+    'listing':         'chip8flow',
+    'relocate':        'chip8reloc',
+    'adjust_display':  'chip8reloc',
+    'Chip8':           'chip8vm',
+    'Chip8Blocks':     'chip8vm',
+    'Chip8Error':      'chip8vm',
+    'Corpus':          'chip8corpus',
+    'Store':           'chip8dedup',
+    'set_encoding':    'HexToWavFileCLI',
+    'make_square_wave':'HexToWavFileCLI',
+    'make_byte_table': 'HexToWavFileCLI',
+    'encode_bytes':    'HexToWavFileCLI',
+    'wav_header':      'HexToWavFileCLI',
+    'write_wav':       'HexToWavFileCLI',
+    'decode_wav':      'WavToHex',
+    'read_tags':       'WavTags',
+    'tag_chunks':      'WavTags',
+    'VirtualWav':      'VirtualWav',
+    'program_wav':     'VirtualWav',
+    'IsHex':           'Prompts',
+    'PromptHex':       'Prompts',
+}
+
+__all__ = sorted(list(MODULES)+list(API))
+
+# Package of the conversion scripts, empty when they are plain modules
+SCRIPTS = 'chip8tools.scripts' if importlib.util.find_spec('chip8tools.scripts') else ''
+
+# Import a conversion script by its module name
+def module(name):
+    return importlib.import_module(SCRIPTS+'.'+name if SCRIPTS else name)
+
+def __getattr__(name):
+    if name in MODULES:
+        value=module(MODULES[name])
+    elif name in API:
+        value=getattr(module(API[name]),name)
+    else:
+        raise AttributeError("module 'chip8tools' has no attribute '%s'" % name)
+    globals()[name]=value
+    return value
+
+def __dir__():
+    return __all__
@@ -0,0 +1,67 @@
+# python -m chip8tools
+# Author : Costas Skordis
+#
+# Single entry point for the command lines of the conversion scripts. The conversion
+# commands of Chip8Convert.py are run directly, the other tools by name with the rest
+# of the arguments, only the module of the tool asked for is imported.
+#
+#   python -m chip8tools --profile eti660 all --source Software/binary --target Software
+#   python -m chip8tools check --software Software
+#   python -m chip8tools corpus uses Fx00
+#
+# Requires Python 3.1.2 or newer
+
+import sys,runpy
+import chip8tools
+
+# Tools by name with their module and click command, None when the command line of
+# the module is only defined when it runs as a script
+TOOLS = {
+    'check':  ('Chip8Check','main','Run the archived programs headless and check the archive files.'),
+    'decode': ('WavToHex',None,'Decode Kansas City Standard wav files into hex files.'),
+    'tags':   ('WavTags',None,'List the tags of wav files.'),
+    'corpus': ('chip8corpus',None,'Build and query the packed corpus of the archive.'),
+    'dedup':  ('chip8dedup',None,'Content addressed store of the archive with near duplicate detection.'),
+    'server': ('TapeServer','cli','Stream the wav files of the archive over TCP and HTTP.'),
+    'vm':     ('chip8vm',None,'Run programs headless with the interpreter.'),
+}
+
+# Commands of Chip8Convert.py
+CONVERT = {
+    'bin2hex': 'Convert binary files to hex, Intel Hex and mnemonic files.',
+    'hex2wav': 'Convert hex files to wav and Intel Hex files.',
+    'all':     'Convert binary files to hex, Intel Hex, mnemonic and wav files.',
+    'tape':    'Pack hex files into one tape wav file with an index.',
+}
+
+def usage():
+    print('Usage : python -m chip8tools [--profile PROFILE] COMMAND [ARGS]...\n')
+    print('Conversion commands (see Chip8Convert.py):')
+    for name,text in CONVERT.items():
+        print('  %-10s%s' % (name,text))
+    print('\nTools:')
+    for name,(module,command,text) in TOOLS.items():
+        print('  %-10s%s' % (name,text))
+
+def main(argv=None):
+    argv=sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h','--help'):
+        usage()
+        return
+    if argv[0] in TOOLS:
+        module,command,text=TOOLS[argv[0]]
+        sys.argv=['chip8tools '+argv[0]]+argv[1:]
+        if command is None:
+            runpy.run_module(chip8tools.SCRIPTS+'.'+module if chip8tools.SCRIPTS else module,run_name='__main__',alter_sys=True)
+        else:
+            getattr(chip8tools.module(module),command)(args=argv[1:],prog_name='chip8tools '+argv[0])
+        return
+    if argv[0] in CONVERT or argv[0].startswith('-'):
+        chip8tools.module('Chip8Convert').cli(args=argv,prog_name='chip8tools')
+        return
+    print('Unknown command %s\n' % argv[0],file=sys.stderr)
+    usage()
+    raise SystemExit(2)
+
+if __name__ == '__main__':
+    main()
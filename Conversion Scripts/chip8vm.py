@@ -0,0 +1,594 @@
+# chip8vm.py
+# Author : Costas Skordis
+#
+# Headless CHIP-8 / ETI-660 interpreter used to smoke test converted programs.
+# Opcodes are decoded with the same table as the disassembler (chip8decode.KIND) and
+# each of the 65536 opcodes is mapped once to its handler, so executing an instruction is
+# a table index and a call. Memory is a bytearray, the V registers a bytearray and the
+# display a list of rows packed into integers, one bit per pixel.
+# The ETI-660 loads programs at 0600 and has a 64x48 display. Machine code calls (0nnn)
+# cannot be executed and are counted in syscalls.
+# Chip8Blocks adds a translation cache that compiles hot code into Python functions.
+#
+# Requires Python 3.1.2 or newer
+
+import random
+if __package__:
+    from . import chip8decode as dc
+else:
+    import chip8decode as dc
+
+ETI660_ORIGIN = 0x0600
+CHIP8_ORIGIN  = 0x0200
+MEMORY_SIZE   = 4096
+FONT_ADDRESS  = 0x0000
+
+# Hexadecimal digit sprites for Fx29
+FONT = bytes([
+    0xF0,0x90,0x90,0x90,0xF0, 0x20,0x60,0x20,0x20,0x70, 0xF0,0x10,0xF0,0x80,0xF0, 0xF0,0x10,0xF0,0x10,0xF0,
+    0x90,0x90,0xF0,0x10,0x10, 0xF0,0x80,0xF0,0x10,0xF0, 0xF0,0x80,0xF0,0x90,0xF0, 0xF0,0x10,0x20,0x40,0x40,
+    0xF0,0x90,0xF0,0x90,0xF0, 0xF0,0x90,0xF0,0x10,0xF0, 0xF0,0x90,0xF0,0x90,0x90, 0xE0,0x90,0xE0,0x90,0xE0,
+    0xF0,0x80,0x80,0x80,0xF0, 0xE0,0x90,0x90,0x90,0xE0, 0xF0,0x80,0xF0,0x80,0xF0, 0xF0,0x80,0xF0,0x80,0x80,
+])
+
+class Chip8Error(Exception):
+    pass
+
+class Chip8:
+    def __init__(self,origin=ETI660_ORIGIN,width=64,height=48,seed=0):
+        self.origin=origin
+        self.width=width
+        self.height=height
+        self.random=random.Random(seed)
+        # Two spare bytes so fetching the last word of memory does not fail
+        self.memory=bytearray(MEMORY_SIZE+2)
+        self.V=bytearray(16)
+        self.stack=[]
+        self.keys=bytearray(16)
+        self.display=[0]*height
+        self.handlers=self.build_handlers()
+        self.reset()
+
+    # Clear memory, registers, display and timers. The handlers hold on to memory,
+    # registers, stack and display so these are cleared in place.
+    def reset(self):
+        self.memory[:]=bytes(MEMORY_SIZE+2)
+        self.memory[FONT_ADDRESS:FONT_ADDRESS+len(FONT)]=FONT
+        self.V[:]=bytes(16)
+        self.keys[:]=bytes(16)
+        self.display[:]=[0]*self.height
+        del self.stack[:]
+        self.I=0
+        self.pc=self.origin
+        self.delay=0
+        self.sound=0
+        self.pitch=0
+        self.syscalls=0
+        self.cycles=0
+
+    # Load a chip8core program into memory and start at its origin
+    def load(self,Image):
+        if Image.origin+len(Image)>MEMORY_SIZE:
+            raise Chip8Error('Program %s does not fit in memory' % Image.address_range())
+        self.memory[Image.origin:Image.origin+len(Image)]=Image.data
+        self.pc=Image.origin
+
+    # Execute a number of instructions
+    def run(self,cycles):
+        memory=self.memory
+        handlers=self.handlers
+        pc=self.pc
+        try:
+            for x in range(cycles):
+                op=memory[pc]<<8 | memory[pc+1]
+                pc=handlers[op](op,pc+2)
+        except IndexError:
+            raise Chip8Error('Access outside of memory at %04X' % pc) from None
+        finally:
+            self.pc=pc
+            self.cycles+=cycles
+
+    # Execute the instructions of one 60Hz frame and count down the timers
+    def frame(self,cycles=30):
+        self.run(cycles)
+        if self.delay:
+            self.delay-=1
+        if self.sound:
+            self.sound-=1
+
+    # Display packed into bytes, one bit per pixel, row by row
+    def framebuffer(self):
+        size=self.width//8
+        return b''.join(row.to_bytes(size,'big') for row in self.display)
+
+    # Create the handler of every opcode, each takes the opcode and the address of the
+    # next instruction and returns the address of the instruction to execute next
+    def build_handlers(self):
+        vm=self
+        V=self.V
+        memory=self.memory
+        stack=self.stack
+        display=self.display
+        keys=self.keys
+        width=self.width
+        height=self.height
+        full=(1<<width)-1
+
+        # Show n rows of the sprite at i at x, y and return 1 on a collision
+        def draw(x,y,i,n):
+            x=x % width
+            y=y % height
+            shift=width-8-x
+            collision=0
+            for row in memory[i:i+n]:
+                if y>=height:
+                    break
+                bits=(row<<shift if shift>=0 else row>>-shift) & full
+                if display[y] & bits:
+                    collision=1
+                display[y]^=bits
+                y+=1
+            return collision
+        self.draw=draw
+
+        def data(op,pc):
+            raise Chip8Error('Invalid opcode %04X at %04X' % (op,pc-2))
+        def nop(op,pc):
+            return pc
+        def cls(op,pc):
+            for y in range(height):
+                display[y]=0
+            return pc
+        def ret(op,pc):
+            if not stack:
+                raise Chip8Error('Return without Do at %04X' % (pc-2))
+            return stack.pop()
+        def sys(op,pc):
+            vm.syscalls+=1
+            return pc
+        def jp(op,pc):
+            return op & 0xFFF
+        def call(op,pc):
+            if len(stack)>=16:
+                raise Chip8Error('Stack overflow at %04X' % (pc-2))
+            stack.append(pc)
+            return op & 0xFFF
+        def se(op,pc):
+            return pc+2 if V[op>>8 & 0xF]==op & 0xFF else pc
+        def sne(op,pc):
+            return pc+2 if V[op>>8 & 0xF]!=op & 0xFF else pc
+        def sev(op,pc):
+            return pc+2 if V[op>>8 & 0xF]==V[op>>4 & 0xF] else pc
+        def ld(op,pc):
+            V[op>>8 & 0xF]=op & 0xFF
+            return pc
+        def add(op,pc):
+            x=op>>8 & 0xF
+            V[x]=(V[x]+op) & 0xFF
+            return pc
+        def ldv(op,pc):
+            V[op>>8 & 0xF]=V[op>>4 & 0xF]
+            return pc
+        def or_(op,pc):
+            V[op>>8 & 0xF]|=V[op>>4 & 0xF]
+            return pc
+        def and_(op,pc):
+            V[op>>8 & 0xF]&=V[op>>4 & 0xF]
+            return pc
+        def xor(op,pc):
+            V[op>>8 & 0xF]^=V[op>>4 & 0xF]
+            return pc
+        def addv(op,pc):
+            x=op>>8 & 0xF
+            r=V[x]+V[op>>4 & 0xF]
+            V[x]=r & 0xFF
+            V[15]=r>>8
+            return pc
+        def sub(op,pc):
+            x=op>>8 & 0xF
+            r=V[x]-V[op>>4 & 0xF]
+            V[x]=r & 0xFF
+            V[15]=r>=0
+            return pc
+        def shr(op,pc):
+            y=V[op>>4 & 0xF]
+            V[op>>8 & 0xF]=y>>1
+            V[15]=y & 1
+            return pc
+        def subn(op,pc):
+            x=op>>8 & 0xF
+            r=V[op>>4 & 0xF]-V[x]
+            V[x]=r & 0xFF
+            V[15]=r>=0
+            return pc
+        def shl(op,pc):
+            y=V[op>>4 & 0xF]
+            V[op>>8 & 0xF]=(y<<1) & 0xFF
+            V[15]=y>>7
+            return pc
+        def snev(op,pc):
+            return pc+2 if V[op>>8 & 0xF]!=V[op>>4 & 0xF] else pc
+        def ldi(op,pc):
+            vm.I=op & 0xFFF
+            return pc
+        def jpv0(op,pc):
+            return ((op & 0xFFF)+V[0]) & 0xFFF
+        def rnd(op,pc):
+            V[op>>8 & 0xF]=vm.random.getrandbits(8) & op
+            return pc
+        def drw(op,pc):
+            V[15]=draw(V[op>>8 & 0xF],V[op>>4 & 0xF],vm.I,op & 0xF)
+            return pc
+        def skp(op,pc):
+            return pc+2 if keys[V[op>>8 & 0xF] & 0xF] else pc
+        def sknp(op,pc):
+            return pc if keys[V[op>>8 & 0xF] & 0xF] else pc+2
+        def pitch(op,pc):
+            vm.pitch=V[op>>8 & 0xF]
+            return pc
+        def ldvdt(op,pc):
+            V[op>>8 & 0xF]=vm.delay
+            return pc
+        def ldk(op,pc):
+            for k in range(16):
+                if keys[k]:
+                    V[op>>8 & 0xF]=k
+                    return pc
+            # Wait for a key by executing this instruction again
+            return pc-2
+        def lddt(op,pc):
+            vm.delay=V[op>>8 & 0xF]
+            return pc
+        def ldst(op,pc):
+            vm.sound=V[op>>8 & 0xF]
+            return pc
+        def addi(op,pc):
+            vm.I=(vm.I+V[op>>8 & 0xF]) & 0xFFF
+            return pc
+        def ldf(op,pc):
+            vm.I=FONT_ADDRESS+(V[op>>8 & 0xF] & 0xF)*5
+            return pc
+        def bcd(op,pc):
+            v=V[op>>8 & 0xF]
+            i=vm.I
+            memory[i]=v//100
+            memory[i+1]=v//10 % 10
+            memory[i+2]=v % 10
+            return pc
+        def store(op,pc):
+            x=(op>>8 & 0xF)+1
+            i=vm.I
+            if i+x>MEMORY_SIZE:
+                raise IndexError
+            memory[i:i+x]=V[:x]
+            vm.I=i+x
+            return pc
+        def load(op,pc):
+            x=(op>>8 & 0xF)+1
+            i=vm.I
+            if i+x>MEMORY_SIZE:
+                raise IndexError
+            V[:x]=memory[i:i+x]
+            vm.I=i+x
+            return pc
+
+        kinds=[data,nop,cls,ret,sys,jp,call,se,sne,sev,ld,add,ldv,or_,and_,xor,addv,sub,shr,subn,
+               shl,snev,ldi,jpv0,rnd,drw,skp,sknp,pitch,ldvdt,ldk,lddt,ldst,addi,ldf,bcd,store,load]
+        return [kinds[kind] for kind in dc.KIND]
+
+# Longest block in instructions
+BLOCK_SIZE = 64
+# Number of times an address is entered before it is translated
+HOT = 8
+# Entry count of code that is not translated again
+NEVER = -1<<62
+
+# Python source of the straight line instructions by instruction number
+BLOCK_SOURCE = {
+    dc.NOP:   [],
+    dc.CLS:   ['display[:]=[0]*len(display)'],
+    dc.SYS:   ['vm.syscalls+=1'],
+    dc.LD:    ['V[{x}]={nn}'],
+    dc.ADD:   ['V[{x}]=(V[{x}]+{nn}) & 0xFF'],
+    dc.LDV:   ['V[{x}]=V[{y}]'],
+    dc.OR:    ['V[{x}]|=V[{y}]'],
+    dc.AND:   ['V[{x}]&=V[{y}]'],
+    dc.XOR:   ['V[{x}]^=V[{y}]'],
+    dc.ADDV:  ['r=V[{x}]+V[{y}]','V[{x}]=r & 0xFF','V[15]=r>>8'],
+    dc.SUB:   ['r=V[{x}]-V[{y}]','V[{x}]=r & 0xFF','V[15]=r>=0'],
+    dc.SHR:   ['r=V[{y}]','V[{x}]=r>>1','V[15]=r & 1'],
+    dc.SUBN:  ['r=V[{y}]-V[{x}]','V[{x}]=r & 0xFF','V[15]=r>=0'],
+    dc.SHL:   ['r=V[{y}]','V[{x}]=(r<<1) & 0xFF','V[15]=r>>7'],
+    dc.LDI:   ['I={nnn}'],
+    dc.RND:   ['V[{x}]=vm.random.getrandbits(8) & {nn}'],
+    dc.DRW:   ['V[15]=draw(V[{x}],V[{y}],I,{n})'],
+    dc.PITCH: ['vm.pitch=V[{x}]'],
+    dc.LDVDT: ['V[{x}]=vm.delay'],
+    dc.LDDT:  ['vm.delay=V[{x}]'],
+    dc.LDST:  ['vm.sound=V[{x}]'],
+    dc.ADDI:  ['I=(I+V[{x}]) & 0xFFF'],
+    dc.LDF:   ['I=%d+(V[{x}] & 0xF)*5' % FONT_ADDRESS],
+    dc.LOAD:  ['if I+{x1}>%d: raise IndexError' % MEMORY_SIZE,'V[:{x1}]=memory[I:I+{x1}]','I+={x1}'],
+}
+# Condition under which a skip instruction skips, by instruction number
+SKIP_SOURCE = {
+    dc.SE:    'V[{x}]=={nn}',
+    dc.SNE:   'V[{x}]!={nn}',
+    dc.SEV:   'V[{x}]==V[{y}]',
+    dc.SNEV:  'V[{x}]!=V[{y}]',
+    dc.SKP:   'keys[V[{x}] & 0xF]',
+    dc.SKNP:  'not keys[V[{x}] & 0xF]',
+}
+# Instructions that use or change I
+USES_I = frozenset([dc.LDI,dc.DRW,dc.ADDI,dc.LDF,dc.LOAD,dc.BCD,dc.STORE])
+
+# Values of the fields of an opcode at an address for the source templates
+def fields(op,pc):
+    x=op>>8 & 0xF
+    return dict(x=x,x1=x+1,y=op>>4 & 0xF,n=op & 0xF,nn=op & 0xFF,nnn=op & 0xFFF,pc=pc,next=pc+2)
+
+# Interpreter with a translation cache. Code from an address that has been entered
+# HOT times is translated into one Python function, following Goto (1nnn), Do (2nnn) and
+# the matching Return, with a skip followed by a Goto or a straight line instruction
+# turned into an if. A block that returns to its own start loops within the function.
+# Blocks are cached by start address and dropped when Fx55 or Fx33 write into them,
+# which end a block and always return to run, so changed code is never run stale.
+# Blocks stop when the cycles run out, so up to an error the results are the same as
+# Chip8.
+class Chip8Blocks(Chip8):
+    def __init__(self,*args,**kwargs):
+        # Start address -> (function, addresses)
+        self.blocks={}
+        # Number of blocks that contain each address
+        self.covered=[0]*(MEMORY_SIZE+2)
+        # Number of times each address has been entered
+        self.entries=[0]*(MEMORY_SIZE+2)
+        Chip8.__init__(self,*args,**kwargs)
+
+    def reset(self):
+        Chip8.reset(self)
+        self.clear_blocks()
+
+    def load(self,Image):
+        Chip8.load(self,Image)
+        self.clear_blocks()
+
+    def clear_blocks(self):
+        self.blocks.clear()
+        self.covered[:]=[0]*(MEMORY_SIZE+2)
+        self.entries[:]=[0]*(MEMORY_SIZE+2)
+
+    # Memory from address to address + size has been written. Blocks that contain the
+    # address are dropped and their code is left to the handlers from then on.
+    def written(self,address,size):
+        if not any(self.covered[address:address+size]):
+            return
+        changed=range(address,address+size)
+        for start,block in list(self.blocks.items()):
+            if any(a in block[1] for a in changed):
+                del self.blocks[start]
+                self.entries[start]=NEVER
+                for a in block[1]:
+                    self.covered[a]-=1
+
+    # The interpreter writes memory with the handlers of Fx55 and Fx33
+    def build_handlers(self):
+        handlers=Chip8.build_handlers(self)
+        vm=self
+        def writes(handler):
+            def h(op,pc):
+                i=vm.I
+                pc=handler(op,pc)
+                vm.written(i,3 if dc.KIND[op]==dc.BCD else (op>>8 & 0xF)+1)
+                return pc
+            return h
+        for op in range(0xF000,0x10000):
+            if dc.KIND[op]==dc.BCD or dc.KIND[op]==dc.STORE:
+                handlers[op]=writes(handlers[op])
+        return handlers
+
+    # Translate the code at an address into a block, returns None when the first
+    # instruction is not valid. The function of a block takes the number of cycles left
+    # and returns the next address and the number of instructions executed.
+    def translate(self,start):
+        memory=self.memory
+        kinds=dc.KIND
+        lines=[]
+        addresses=set()
+        # Return addresses of the Do instructions in the block
+        returns=[]
+        uses_i=False
+        loops=False
+        count=0
+        # Instructions executed in this pass through the block, not counting the
+        # instructions inside an if, those add to n
+        k=0
+
+        # Source to leave the block to a target address after k instructions. I is
+        # written back on every exit and the lines are dropped at the end when no
+        # instruction of the block uses I, as an exit may come before the first one.
+        def leave(target,k,loop=True):
+            nonlocal loops
+            if loop and target==start:
+                loops=True
+                return ['n+=%d' % k,'continue']
+            return ['vm.I=I','return %s,n+%s' % (target,k)]
+
+        # Source to leave the block before the instruction at pc when the cycles run out
+        def check(pc,k):
+            return ['if n+%d>=left:' % k]+['    '+line for line in leave(pc,k,False)]
+
+        pc=start
+        while count<BLOCK_SIZE:
+            op=memory[pc]<<8 | memory[pc+1] if pc+1<MEMORY_SIZE else None
+            if op is None or kinds[op]==dc.DATA or pc in addresses:
+                if count==0:
+                    return None
+                lines.extend(leave(pc,k))
+                break
+            kind=kinds[op]
+            if count:
+                lines.extend(check(pc,k))
+            addresses.update((pc,pc+1))
+            count+=1
+            k+=1
+            values=fields(op,pc)
+            uses_i=uses_i or kind in USES_I
+            if kind in BLOCK_SOURCE:
+                lines.extend(line.format(**values) for line in BLOCK_SOURCE[kind])
+                pc=pc+2
+            elif kind==dc.JP:
+                pc=op & 0xFFF
+            elif kind==dc.CALL:
+                lines.append('if len(stack)>=16: raise Chip8Error("Stack overflow at %04X")' % pc)
+                lines.append('stack.append(%d)' % (pc+2))
+                returns.append(pc+2)
+                pc=op & 0xFFF
+            elif kind==dc.RET and returns:
+                lines.append('stack.pop()')
+                pc=returns.pop()
+            elif kind in SKIP_SOURCE:
+                skip=SKIP_SOURCE[kind].format(**values)
+                op=memory[pc+2]<<8 | memory[pc+3]
+                kind=kinds[op]
+                if pc+2 in addresses or not (kind==dc.JP or kind in BLOCK_SOURCE):
+                    lines.extend(leave('%d if %s else %d' % (pc+4,skip,pc+2),k))
+                    break
+                # The next instruction runs when there is no skip
+                addresses.update((pc+2,pc+3))
+                count+=1
+                uses_i=uses_i or kind in USES_I
+                lines.append('if not %s:' % skip)
+                lines.extend('    '+line for line in check(pc+2,k))
+                if kind==dc.JP:
+                    lines.extend('    '+line for line in leave(op & 0xFFF,k+1))
+                else:
+                    lines.extend('    '+line.format(**fields(op,pc+2)) for line in BLOCK_SOURCE[kind])
+                    lines.append('    n+=1')
+                pc=pc+4
+            else:
+                # Instructions that end the block
+                if kind==dc.RET:
+                    lines.append('if not stack: raise Chip8Error("Return without Do at %04X")' % pc)
+                    lines.extend(leave('stack.pop()',k))
+                elif kind==dc.JPV0:
+                    lines.extend(leave('(%d+V[0]) & 0xFFF' % (op & 0xFFF),k))
+                elif kind==dc.LDK:
+                    # The keys do not change during a run, without a key the rest of
+                    # the cycles are spent waiting
+                    lines.append('key=next((key for key in range(16) if keys[key]),None)')
+                    lines.append('if key is None:')
+                    lines.extend('    '+line for line in leave(pc,'left-n',False))
+                    lines.append('V[%d]=key' % values['x'])
+                    lines.extend(leave(pc+2,k))
+                elif kind==dc.BCD:
+                    lines.extend(line.format(**values) for line in
+                                 ['r=V[{x}]','memory[I]=r//100','memory[I+1]=r//10 % 10','memory[I+2]=r % 10','vm.written(I,3)'])
+                    # The store may have dropped this block, so never loop back
+                    lines.extend(leave(pc+2,k,False))
+                elif kind==dc.STORE:
+                    lines.extend(line.format(**values) for line in
+                                 ['if I+{x1}>%d: raise IndexError' % MEMORY_SIZE,'memory[I:I+{x1}]=V[:{x1}]','I+={x1}','vm.written(I-{x1},{x1})'])
+                    lines.extend(leave(pc+2,k,False))
+                break
+        else:
+            lines.extend(leave(pc,k))
+
+        if loops:
+            # The cycles may run out before the first instruction of the next pass
+            lines=['while True:']+['    '+line for line in check(start,0)+lines]
+        if uses_i:
+            lines.insert(0,'I=vm.I')
+        else:
+            lines=[line for line in lines if line.strip()!='vm.I=I']
+        text=('def block(vm,V,memory,stack,display,keys,draw,left):\n    n=0\n'+
+              ''.join('    '+line+'\n' for line in lines))
+        namespace={'Chip8Error':Chip8Error}
+        exec(compile(text,'<block %04X>' % start,'exec'),namespace)
+        return namespace['block'],frozenset(addresses)
+
+    # Execute a number of instructions. Code that has not been translated is executed
+    # with the handlers up to the next jump.
+    def run(self,cycles):
+        vm=self
+        V=self.V
+        memory=self.memory
+        stack=self.stack
+        display=self.display
+        keys=self.keys
+        draw=self.draw
+        handlers=self.handlers
+        blocks=self.blocks
+        entries=self.entries
+        pc=self.pc
+        left=cycles
+        try:
+            while left:
+                block=blocks.get(pc)
+                if block is None:
+                    entries[pc]+=1
+                    if entries[pc]>=HOT:
+                        block=self.translate(pc)
+                        if block is not None:
+                            blocks[pc]=block
+                            for a in block[1]:
+                                self.covered[a]+=1
+                if block is not None:
+                    pc,n=block[0](vm,V,memory,stack,display,keys,draw,left)
+                    left-=n
+                    continue
+                while left:
+                    op=memory[pc]<<8 | memory[pc+1]
+                    next=handlers[op](op,pc+2)
+                    left-=1
+                    if next!=pc+2:
+                        pc=next
+                        break
+                    pc=next
+        except IndexError:
+            raise Chip8Error('Access outside of memory at %04X' % pc) from None
+        finally:
+            self.pc=pc
+            self.cycles+=cycles-left
+
+if __name__ == '__main__':
+    import os
+    import sys
+    import time
+    if __package__:
+        from . import chip8core
+    else:
+        import chip8core
+
+    usage="Usage : %s [--blocks] BinaryFile ..." % os.path.basename(sys.argv[0])
+    if '-h' in sys.argv[1:] or '--help' in sys.argv[1:]:
+        print(usage)
+        print('\nRun every program for 1000 frames of 100 instructions, --blocks translates hot code into Python functions.')
+        raise SystemExit(0)
+    files=[arg for arg in sys.argv[1:] if arg!='--blocks']
+    options=[arg for arg in files if arg.startswith('-')]
+    if options:
+        print('Unknown option %s\n%s' % (options[0],usage),file=sys.stderr)
+        raise SystemExit(2)
+    if not files:
+        print(usage,file=sys.stderr)
+        raise SystemExit(1)
+    Machine=Chip8Blocks if '--blocks' in sys.argv else Chip8
+
+    # Run every program for 1000 frames of 100 instructions
+    p='{text0:<60}{text1:<12}{text2}'
+    total=0
+    start=time.perf_counter()
+    for filename in files:
+        vm=Machine()
+        try:
+            vm.load(chip8core.read_binary(filename,ETI660_ORIGIN))
+            for x in range(1000):
+                vm.frame(100)
+            status='Ok'
+        except Chip8Error as e:
+            status=str(e)
+        total+=vm.cycles
+        print(p.format(text0=filename[-60:],text1='%d' % vm.cycles,text2=status))
+    elapsed=time.perf_counter()-start
+    print('%d instructions in %.2f seconds, %.0f per second' % (total,elapsed,total/elapsed if elapsed else 0))
@@ -0,0 +1,64 @@
+# bench_encode.py
+#
+# Compare the per byte encode_byte path of HexToWavFileCLI with the byte table
+# encoder over every program in Software/binary and check both give the same
+# waveform.
+#
+# Usage : python benchmarks/bench_encode.py [repeat]
+
+import os,sys,time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Conversion Scripts'))
+import HexToWavFileCLI as kcs
+
+BinaryDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Software', 'binary')
+
+# Load every binary in the archive
+def load_corpus():
+    corpus=[]
+    for file in sorted(os.listdir(BinaryDir)):
+        with open(os.path.join(BinaryDir,file),'rb') as f:
+            corpus.append(f.read())
+    return corpus
+
+def encode_per_byte(data):
+    encoded = bytearray()
+    for byteval in data:
+        encoded.extend(kcs.encode_byte('%02X' % byteval))
+    return bytes(encoded)
+
+def encode_table(data):
+    return kcs.encode_bytes(data,kcs.byte_table)
+
+def timed(func,corpus,repeat):
+    best=None
+    for x in range(repeat):
+        start=time.perf_counter()
+        for data in corpus:
+            func(data)
+        t=time.perf_counter()-start
+        best=t if best is None or t<best else best
+    return best
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    corpus=load_corpus()
+    nbytes=sum(len(data) for data in corpus)
+
+    for ones,zeros,rate in ((1000,500,22050),(2400,1200,22050),(2400,1200,48000)):
+        kcs.one_pulse  = kcs.make_square_wave(ones,rate)
+        kcs.zero_pulse = kcs.make_square_wave(zeros,rate)
+        start=time.perf_counter()
+        kcs.byte_table = kcs.make_byte_table(kcs.one_pulse,kcs.zero_pulse)
+        build=time.perf_counter()-start
+
+        for data in corpus:
+            if encode_per_byte(data)!=encode_table(data):
+                raise SystemExit('Byte table output differs from encode_byte')
+
+        t1=timed(encode_per_byte,corpus,repeat)
+        t2=timed(encode_table,corpus,repeat)
+        print('%d/%d Hz at %d Hz, %d programs, %d bytes' % (ones,zeros,rate,len(corpus),nbytes))
+        print('  {0:<12}{1:>10.2f} ms {2:>12.0f} bytes/s'.format('encode_byte',t1*1000,nbytes/t1))
+        print('  {0:<12}{1:>10.2f} ms {2:>12.0f} bytes/s'.format('byte table',t2*1000,nbytes/t2))
+        print('  table build {0:.2f} ms, speedup {1:.1f}x'.format(build*1000,t1/t2))
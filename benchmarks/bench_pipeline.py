@@ -0,0 +1,178 @@
+# bench_pipeline.py
+#
+# Benchmark every stage of the conversion pipeline over the programs in Software/binary
+# and over synthetic 4 KB and 64 KB images. For each stage the best time of a number
+# of runs gives the throughput (bytes/s, and samples/s for the wav stages) and a
+# separate run under tracemalloc gives the peak memory. Results can be saved as a JSON
+# baseline and later runs fail when a stage is slower or uses more memory than the
+# baseline by more than the threshold.
+#
+# Usage : python benchmarks/bench_pipeline.py [--repeat 5] [--save] [--threshold 0.25]
+#         python benchmarks/bench_pipeline.py --stage write_wav --corpus 64k
+
+import os,sys,json,time,random,tempfile,tracemalloc
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Conversion Scripts'))
+import chip8core
+import chip8ihex
+import chip8flow
+import HexToWavFileCLI as kcs
+import BinToHexFileCLI as b2h
+
+BinaryDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Software', 'binary')
+BaselineFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+ORIGIN = 0x0600
+
+# Load every binary in the archive
+def load_corpus():
+    corpus=[]
+    for file in sorted(os.listdir(BinaryDir)):
+        corpus.append(chip8core.read_binary(os.path.join(BinaryDir,file),ORIGIN))
+    return corpus
+
+# Random program of a given size, the same on every run (the bytes of randbytes,
+# which needs Python 3.9)
+def synthetic(size):
+    return [chip8core.Program(random.Random(size).getrandbits(8*size).to_bytes(size,'little'),ORIGIN)]
+
+CORPORA = {
+    'archive': load_corpus,
+    '4k':      lambda: synthetic(4096),
+    '64k':     lambda: synthetic(65536),
+}
+
+# Stages take a program and a scratch directory and return the number of samples
+# written, 0 when the stage writes no audio
+def encode_byte(Image,TempDir):
+    encoded = bytearray()
+    for byteval in Image.data:
+        encoded.extend(kcs.encode_byte('%02X' % byteval))
+    return len(encoded)
+
+def encode_bytes(Image,TempDir):
+    return len(kcs.encode_bytes(Image.data,kcs.byte_table))
+
+def write_wav(Image,TempDir):
+    filename=os.path.join(TempDir,'bench.wav')
+    kcs.write_wav(filename,Image.data,2,0)
+    return os.path.getsize(filename)-len(kcs.wav_header(0))
+
+def intel_hex(Image,TempDir):
+    chip8ihex.write(os.path.join(TempDir,'bench.hex'),Image,16)
+    return 0
+
+def create_mnemonic(Image,TempDir):
+    b2h.CreateMnemonic(Image)
+    return 0
+
+def flow_listing(Image,TempDir):
+    # The flow analysis is cached by image, clear it so every run traces
+    chip8flow._cache.clear()
+    chip8flow.listing(Image)
+    return 0
+
+def update_hex(Image,TempDir):
+    chip8flow._cache.clear()
+    b2h.UpdateHex(Image,'0200')
+    return 0
+
+STAGES = {
+    'encode_byte':     encode_byte,
+    'encode_bytes':    encode_bytes,
+    'write_wav':       write_wav,
+    'intel_hex':       intel_hex,
+    'create_mnemonic': create_mnemonic,
+    'flow_listing':    flow_listing,
+    'update_hex':      update_hex,
+}
+
+# Run a stage over a corpus, returns the best time and the samples written
+def timed(stage,corpus,TempDir,repeat):
+    best=None
+    for x in range(repeat):
+        samples=0
+        start=time.perf_counter()
+        for Image in corpus:
+            samples+=stage(Image,TempDir)
+        t=time.perf_counter()-start
+        best=t if best is None or t<best else best
+    return best,samples
+
+# Peak memory allocated while a stage runs once over a corpus
+def peak_memory(stage,corpus,TempDir):
+    tracemalloc.start()
+    try:
+        for Image in corpus:
+            stage(Image,TempDir)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench(stages,corpora,repeat):
+    kcs.set_encoding(1000,500,22050,kcs.AMPLITUDE)
+    # The mnemonic table is built on first use, keep it out of the timings
+    b2h.CreateMnemonic(chip8core.Program(b'\x00\xE0'))
+    results={}
+    with tempfile.TemporaryDirectory() as TempDir:
+        for corpus_name in corpora:
+            corpus=CORPORA[corpus_name]()
+            nbytes=sum(len(Image) for Image in corpus)
+            for stage_name in stages:
+                stage=STAGES[stage_name]
+                t,samples=timed(stage,corpus,TempDir,repeat)
+                result={'Seconds':t,'BytesPerSecond':nbytes/t,'PeakBytes':peak_memory(stage,corpus,TempDir)}
+                if samples:
+                    result['SamplesPerSecond']=samples/t
+                results[stage_name+'/'+corpus_name]=result
+                print('{0:<28}{1:>10.2f} ms {2:>14.0f} bytes/s {3:>14} {4:>10.0f} KB peak'.format(
+                      stage_name+'/'+corpus_name,t*1000,nbytes/t,
+                      '%.0f samples/s' % (samples/t) if samples else '',result['PeakBytes']/1024))
+    return results
+
+# Compare results with a baseline, returns the regressions
+def compare(results,baseline,threshold):
+    regressions=[]
+    for name,result in sorted(results.items()):
+        base=baseline.get(name)
+        if base is None:
+            continue
+        if result['BytesPerSecond']<base['BytesPerSecond']*(1-threshold):
+            regressions.append('%s throughput %.0f bytes/s, baseline %.0f bytes/s' % (name,result['BytesPerSecond'],base['BytesPerSecond']))
+        if result['PeakBytes']>base['PeakBytes']*(1+threshold):
+            regressions.append('%s peak memory %d bytes, baseline %d bytes' % (name,result['PeakBytes'],base['PeakBytes']))
+    return regressions
+
+@click.command()
+@click.option('--stage','stages',multiple=True,type=click.Choice(list(STAGES)),help='Stage to run, all by default. Can be repeated.')
+@click.option('--corpus','corpora',multiple=True,type=click.Choice(list(CORPORA)),help='Corpus to run, all by default. Can be repeated.')
+@click.option('--repeat',default=5,type=click.IntRange(1),show_default=True,help='Number of runs, the best is kept.')
+@click.option('--baseline',default=BaselineFile,type=click.Path(dir_okay=False),show_default=True,help='JSON baseline file.')
+@click.option('--save',is_flag=True,default=False,help='Save the results as the baseline.')
+@click.option('--threshold',default=0.25,type=click.FloatRange(0),show_default=True,help='Allowed slow down or memory growth as a fraction of the baseline.')
+def main(stages,corpora,repeat,baseline,save,threshold):
+    """Benchmark the conversion pipeline and compare with a baseline."""
+    results=bench(stages or list(STAGES),corpora or list(CORPORA),repeat)
+    if save:
+        saved={}
+        if os.path.isfile(baseline):
+            with open(baseline,'r') as f:
+                saved=json.load(f)
+        saved.update(results)
+        with open(baseline,'w') as f:
+            json.dump(saved,f,indent=1,sort_keys=True)
+        print('Saved '+baseline)
+        return
+    if not os.path.isfile(baseline):
+        print('No baseline '+baseline+', run with --save to create it')
+        return
+    with open(baseline,'r') as f:
+        regressions=compare(results,json.load(f),threshold)
+    for regression in regressions:
+        print('Regression : '+regression)
+    if regressions:
+        raise SystemExit(1)
+    print('No regressions beyond %.0f%%' % (threshold*100))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+# Words of a program and the mnemonic rows made from them
+
+import BinToHexFileCLI
+import chip8core
+
+def test_words():
+    assert list(chip8core.Program(bytes.fromhex('00E01234'),0x600).words())==[0x00E0,0x1234]
+    assert list(chip8core.Program(b'',0x600).words())==[]
+
+def test_words_odd_byte_left_out():
+    assert list(chip8core.Program(bytes.fromhex('00E01234AB'),0x600).words())==[0x00E0,0x1234]
+    assert list(chip8core.Program(bytes.fromhex('05'),0x600).words())==[]
+
+def test_mnemonic_odd_byte_is_data():
+    rows=BinToHexFileCLI.CreateMnemonic(chip8core.Program(bytes.fromhex('00E00005'),0x600))
+    assert rows==[['0600','00E0','Clear'],['0602','0005','Call 005']]
+    rows=BinToHexFileCLI.CreateMnemonic(chip8core.Program(bytes.fromhex('00E005'),0x600))
+    assert rows==[['0600','00E0','Clear'],['0602','05','Data .....#.#']]
@@ -0,0 +1,77 @@
+# Decoding of one opcode of every instruction pattern and of the opcodes that are
+# not instructions
+
+import pytest
+
+import chip8decode as dc
+
+CASES = [
+    (0x0000,'0000','NoOp'),
+    (0x00E0,'00E0','Clear'),
+    (0x00EE,'00EE','Return'),
+    (0x0123,'0nnn','Call 123'),
+    (0x00E1,'0nnn','Call 0E1'),
+    (0x0012,'0nnn','Call 012'),
+    (0x1234,'1nnn','Goto 234'),
+    (0x2345,'2nnn','Do 345'),
+    (0x3A12,'3xnn','Skip if VA = 12'),
+    (0x4B34,'4xnn','Skip if not VB = 34'),
+    (0x5120,'5xy0','Skip if V1 = V2'),
+    (0x6C56,'6xnn','VC = 56'),
+    (0x7D01,'7xnn','VD = VD + 01'),
+    (0x8120,'8xy0','V1 = V2'),
+    (0x8121,'8xy1','V1 or V2'),
+    (0x8122,'8xy2','V1 and V2'),
+    (0x8123,'8xy3','V1 xor V2'),
+    (0x8124,'8xy4','V1 = V1 + V2'),
+    (0x8125,'8xy5','V1 = V1 - V2'),
+    (0x8126,'8xy6','V1 = V2 shr 1'),
+    (0x8127,'8xy7','V1 = V2 - V1'),
+    (0x812E,'8xyE','V1 = V2 shl 1'),
+    (0x9340,'9xy0','Skip if not V3 = V4'),
+    (0xA678,'Annn','I = 678'),
+    (0xB9AB,'Bnnn','Goto 9AB + V0'),
+    (0xC5FF,'Cxnn','V5 = random and FF'),
+    (0xD125,'Dxyn','Show 5 at V1, V2'),
+    (0xE69E,'Ex9E','Skip if V6 is key'),
+    (0xE7A1,'ExA1','Skip if not V7 is key'),
+    (0xF800,'Fx00','Pitch = V8'),
+    (0xF907,'Fx07','V9 = Time'),
+    (0xFA0A,'Fx0A','VA = Key'),
+    (0xFB15,'Fx15','Time = VB'),
+    (0xFC18,'Fx18','Tone = VC'),
+    (0xFD1E,'Fx1E','I = I + VD'),
+    (0xFE29,'Fx29','I = Display VE'),
+    (0xF133,'Fx33','M(I)=DECML V1'),
+    (0xF255,'Fx55','M(I)=V0:V2'),
+    (0xF365,'Fx65','V0:V3 = M(I)'),
+]
+
+# Opcodes sharing the high nibble of an instruction that are not instructions
+DATA = [0x5121,0x512F,0x8128,0x812D,0x812F,0x9341,0x934F,0xE600,0xE69F,0xE7A0,0xF801,
+        0xF808,0xF830,0xF866,0xFFFF]
+
+@pytest.mark.parametrize('opcode,pattern,text',CASES)
+def test_instruction(opcode,pattern,text):
+    assert dc.PATTERNS[dc.KIND[opcode]]==pattern
+    assert dc.mnemonic(opcode)==text
+
+@pytest.mark.parametrize('opcode',DATA)
+def test_data(opcode):
+    assert dc.KIND[opcode]==dc.DATA
+    assert dc.PATTERNS[dc.KIND[opcode]]=='Data'
+    assert dc.mnemonic(opcode)=='Data'
+
+def test_every_pattern_covered():
+    assert set(pattern for opcode,pattern,text in CASES)==set(dc.PATTERNS)-{'Data'}
+
+def test_tables_agree():
+    assert len(dc.PATTERNS)==len(dc.TEMPLATES)
+    assert len(dc.KIND)==65536
+    assert max(dc.KIND)<len(dc.PATTERNS)
+
+def test_mnemonic_table():
+    table=dc.mnemonic_table()
+    for opcode,pattern,text in CASES:
+        assert table[opcode]==text
+    assert dc.disassemble([0x00E0,0x8123,0x5121])==['Clear','V1 xor V2','Data']
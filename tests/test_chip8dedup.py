@@ -0,0 +1,92 @@
+# Deltas and the store of chip8dedup
+
+import os
+import random
+
+import pytest
+
+import chip8dedup
+
+BinaryDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Software','binary')
+
+def read(name):
+    with open(os.path.join(BinaryDir,name),'rb') as f:
+        return f.read()
+
+# Targets made from a base, from nothing in common to the base itself
+def targets(base):
+    rng=random.Random(base)
+    noise=bytes(rng.randrange(256) for _ in range(300))
+    return {
+        'empty':b'',
+        'one byte':b'\x12',
+        'literal':noise,
+        'fill':b'\x00'*500,
+        'fill then literal':b'\xFF'*3+b'\xFF'*4+noise[:3],
+        'same':base,
+        'padded':base+b'\x00'*256,
+        'corrected':base[:100]+b'\x12\x34'+base[102:],
+        'moved':base[200:]+noise[:17]+base[:200],
+    }
+
+@pytest.mark.parametrize('base',[b'',b'\x00\xE0',read(sorted(os.listdir(BinaryDir))[0])],ids=['empty','short','program'])
+def test_round_trip(base):
+    for name,target in targets(base).items():
+        data=chip8dedup.delta(base,target)
+        assert chip8dedup.patch(base,data)==target,name
+
+def test_literal_delta_size():
+    # Without anything in common a delta costs its header and a few bytes of operations
+    base=read(sorted(os.listdir(BinaryDir))[0])
+    target=bytes(random.Random(1).randrange(256) for _ in range(300))
+    assert len(chip8dedup.delta(base,target))<=len(target)+20
+
+def test_copy_delta_size():
+    base=read(sorted(os.listdir(BinaryDir))[0])
+    assert len(chip8dedup.delta(base,base[:100]+b'\x12\x34'+base[102:]))<30
+
+def test_patch_errors():
+    data=chip8dedup.delta(b'\x00\xE0\x12\x00',b'\x00\xE0\x12\x00\x12\x00')
+    with pytest.raises(chip8dedup.DedupError):
+        chip8dedup.patch(b'\x00\xE0\x12\x02',data)
+    with pytest.raises(chip8dedup.DedupError):
+        chip8dedup.patch(b'\x00\xE0\x12\x00',b'XYZ'+data[3:])
+    with pytest.raises(chip8dedup.DedupError):
+        chip8dedup.patch(b'\x00\xE0\x12\x00',data[:-1])
+
+def test_ingest_removes_missing_files(tmp_path):
+    source=tmp_path/'binary'
+    source.mkdir()
+    store_dir=str(tmp_path/'store')
+    (source/'A.ch8').write_bytes(b'\x00\xE0\x12\x00')
+    (source/'B.ch8').write_bytes(b'\x00\xE0\x12\x02')
+    (source/'C.ch8').write_bytes(b'\x00\xE0\x12\x00')
+    store,Count,New,Removed=chip8dedup.ingest(str(source),store_dir)
+    assert (Count,len(New),Removed)==(3,2,[])
+    assert sorted(store.names)==['A','B','C']
+
+    (source/'B.ch8').unlink()
+    (source/'C.ch8').rename(source/'D.ch8')
+    store,Count,New,Removed=chip8dedup.ingest(str(source),store_dir)
+    assert (Count,New,sorted(Removed))==(2,[],['B','C'])
+    assert sorted(store.names)==['A','D']
+    assert sorted(os.listdir(os.path.join(store_dir,'names')))==['A.ch8','D.ch8']
+    assert sorted(os.path.basename(Source) for Source in store.sources)==['A.ch8','D.ch8']
+    # The images stay in the store
+    assert len(store.objects)==2
+    store=chip8dedup.Store(store_dir)
+    assert sorted(store.names)==['A','D']
+
+def test_ingest_keeps_other_directories(tmp_path):
+    store_dir=str(tmp_path/'store')
+    for Dir,Name in (('one','A'),('two','B')):
+        (tmp_path/Dir).mkdir()
+        (tmp_path/Dir/(Name+'.ch8')).write_bytes(Name.encode()*4)
+        chip8dedup.ingest(str(tmp_path/Dir),store_dir)
+    (tmp_path/'one'/'A.ch8').unlink()
+    store,Count,New,Removed=chip8dedup.ingest(str(tmp_path/'two'),store_dir)
+    assert Removed==[]
+    assert sorted(store.names)==['A','B']
+    store,Count,New,Removed=chip8dedup.ingest(str(tmp_path/'one'),store_dir)
+    assert Removed==['A']
+    assert sorted(store.names)==['B']
@@ -0,0 +1,29 @@
+# Listings of chip8flow with code and labels inside instructions
+
+import chip8core
+import chip8flow
+
+def listing(text):
+    return chip8flow.listing(chip8core.Program(bytes.fromhex(text.replace(' ','')),0x600))[0]
+
+def test_jump_into_instruction():
+    # Goto 603 runs the second byte of the Goto at 602 as the start of V0 = 12
+    rows=listing('1603 1060 1216 05')
+    assert rows==['L0600:',('0600','1603','Goto 603'),
+                  ('0602','10','Data ...#....'),
+                  'L0603:',('0603','6012','V0 = 12'),
+                  'L0605:',('0605','1605','Goto 605')]
+
+def test_data_label_inside_instruction():
+    # I = 603 points at the value loaded by V0 = 12, the program changes it
+    rows=listing('A603 6012 D011 1606')
+    assert rows==['L0600:',('0600','A603','I = 603'),
+                  'D0603 = 0602+1',('0602','6012','V0 = 12'),
+                  ('0604','D011','Show 1 at V0, V1'),
+                  'L0606:',('0606','1606','Goto 606')]
+
+def test_record_round_trip():
+    Image=chip8core.Program(bytes.fromhex('A60C 2608 1604 00EE 6012 00EE B610'),0x600)
+    flow=chip8flow.trace(Image)
+    loaded=chip8flow.from_record(chip8flow.to_record(flow))
+    assert (loaded.code,loaded.xrefs,loaded.targets,loaded.data_refs)==(flow.code,flow.xrefs,flow.targets,flow.data_refs)
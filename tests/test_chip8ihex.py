@@ -0,0 +1,72 @@
+# Intel Hex writer and parser of chip8ihex
+
+import os
+
+import pytest
+
+import chip8core
+import chip8ihex
+
+def test_round_trip():
+    Image=chip8core.Program(bytes(range(256))*3+b'\x12',0x600)
+    for ByteRow in (2,4,8,16,32):
+        h=chip8ihex.parse(chip8ihex.hex_text(Image,ByteRow))
+        assert len(h.segments)==1
+        assert (h.segments[0].origin,h.segments[0].data)==(Image.origin,Image.data)
+        assert h.gaps==[] and h.overlaps==[]
+
+# Record with its checksum from the hex digits of the other fields
+def record(text):
+    return ':'+text+'%02X' % (-sum(bytes.fromhex(text)) & 0xFF)
+
+def test_records():
+    Image=chip8core.Program(bytes.fromhex('A21ED015'),0x600)
+    assert chip8ihex.encode(Image)==[':04060000A21ED01551',':00000001FF']
+
+def test_extended_address():
+    # 32 bytes from FFF0 with 12 byte records, none of which crosses 10000
+    Image=chip8core.Program(bytes(range(1,33)),0xFFF0)
+    records=chip8ihex.encode(Image,12)
+    assert records==[record('0CFFF000'+bytes(range(1,13)).hex().upper()),
+                     record('04FFFC000D0E0F10'),
+                     ':020000040001F9',
+                     record('0C000000'+bytes(range(17,29)).hex().upper()),
+                     record('04000C001D1E1F20'),
+                     ':00000001FF']
+    h=chip8ihex.parse('\n'.join(records))
+    assert [(s.origin,bytes(s.data)) for s in h.segments]==[(0xFFF0,bytes(range(1,33)))]
+
+def test_bad_checksum():
+    with pytest.raises(chip8ihex.IntelHexError,match='Line 1: checksum error'):
+        chip8ihex.parse(':04060000A21ED01552\n:00000001FF')
+
+@pytest.mark.parametrize('text,message',[
+    ('04060000A21ED01551','does not start with :'),
+    (':04060000A21ED015','invalid record length'),
+    (':0406000GA21ED01551','invalid hex value'),
+    (':00000006FA','unknown record type 06'),
+])
+def test_bad_records(text,message):
+    with pytest.raises(chip8ihex.IntelHexError,match=message):
+        chip8ihex.parse(text)
+
+def test_gaps_and_overlaps():
+    records=chip8ihex.encode(chip8core.Program(b'\x01\x02\x03\x04',0x600))[:-1]
+    records+=chip8ihex.encode(chip8core.Program(b'\x05\x06',0x608))[:-1]
+    records+=chip8ihex.encode(chip8core.Program(b'\x07\x08',0x602))
+    h=chip8ihex.parse('\n'.join(records))
+    assert [(s.origin,bytes(s.data)) for s in h.segments]==[(0x600,b'\x01\x02\x07\x08'),(0x608,b'\x05\x06')]
+    assert h.gaps==[(0x604,4)]
+    assert h.overlaps==[(0x602,2)]
+    Image=h.image()
+    assert (Image.origin,bytes(Image.data))==(0x600,b'\x01\x02\x07\x08\xFF\xFF\xFF\xFF\x05\x06')
+
+def test_write(tmp_path):
+    Image=chip8core.Program(b'\x00\xE0\x12\x00',0x600)
+    filename=os.path.join(str(tmp_path),'x.hex')
+    text=chip8ihex.write(filename,Image)
+    with open(filename,'r') as f:
+        assert f.read()==text
+    assert os.listdir(str(tmp_path))==['x.hex']
+    h=chip8ihex.read(filename)
+    assert bytes(h.image().data)==bytes(Image.data)
@@ -0,0 +1,40 @@
+# Relocation of programs by chip8reloc
+
+import chip8core
+import chip8reloc
+
+# Program at 0600 ending at 0609: I = a sprite, I = the workspace past the end, I = the
+# interpreter below the program, Show, then a loop back to the start
+PROGRAM = bytes.fromhex('A608 A700 A100 D125 1600'.replace(' ',''))
+
+def notes(report):
+    return {address:note for address,old,new,note in report}
+
+def test_relocate():
+    New,report=chip8reloc.relocate(chip8core.Program(PROGRAM,0x600),0x200)
+    assert New.origin==0x200
+    assert New.data==bytes.fromhex('A208 A700 A100 D125 1200'.replace(' ',''))
+    assert notes(report)=={'0200':'Relocated','0202':'Address past the end kept, check it',
+                           '0204':'External address kept','0208':'Relocated'}
+
+def test_relocate_workspace():
+    New,report=chip8reloc.relocate(chip8core.Program(PROGRAM,0x600),0x200,0x100)
+    assert New.data==bytes.fromhex('A208 A300 A100 D125 1200'.replace(' ',''))
+    assert notes(report)['0202']=='Workspace relocated'
+    # The workspace starts at the end of the program
+    New,report=chip8reloc.relocate(chip8core.Program(PROGRAM,0x600),0x200,0xF6)
+    assert New.data[2:4]==bytes.fromhex('A700')
+    assert notes(report)['0202']=='Address past the end kept, check it'
+
+def test_relocate_data_kept():
+    # The sprite after the Goto looks like an I = but is never reached
+    Image=chip8core.Program(bytes.fromhex('1604 A602 1604'.replace(' ','')),0x600)
+    New,report=chip8reloc.relocate(Image,0x200)
+    assert New.data==bytes.fromhex('1204 A602 1204'.replace(' ',''))
+    assert [address for address,old,new,note in report]==['0200','0204']
+
+def test_relocate_out_of_range():
+    New,report=chip8reloc.relocate(chip8core.Program(PROGRAM,0x600),0xC00)
+    assert New.data==bytes.fromhex('AC08 A700 A100 D125 1C00'.replace(' ',''))
+    New,report=chip8reloc.relocate(chip8core.Program(PROGRAM,0x600),0xF00,0x100)
+    assert notes(report)['0F02']=='Address past the end kept, check it'
@@ -0,0 +1,131 @@
+# Interpreter and translation cache of chip8vm
+
+import os
+
+import pytest
+
+import chip8core
+import chip8vm
+
+BinaryDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Software','binary')
+PROGRAMS = sorted(os.listdir(BinaryDir))
+
+# State of a machine after a frame
+def state(vm):
+    return (vm.pc,vm.I,bytes(vm.V),list(vm.stack),vm.delay,vm.sound,vm.pitch,vm.syscalls,vm.cycles,
+            vm.framebuffer(),bytes(vm.memory))
+
+# Run a machine and return its state after every frame, or the error it stopped with
+def run(Machine,Image,cycles,frames):
+    vm=Machine(origin=Image.origin)
+    vm.load(Image)
+    states=[]
+    try:
+        for frame in range(frames):
+            # Every key in turn, held down for 5 of every 12 frames
+            vm.keys[:]=bytes(16)
+            if frame % 12<5:
+                vm.keys[frame//12 % 16]=1
+            vm.frame(cycles)
+            states.append(state(vm))
+    except chip8vm.Chip8Error as e:
+        states.append(str(e))
+    return states
+
+@pytest.mark.parametrize('cycles',[7,30,50,113])
+@pytest.mark.parametrize('name',PROGRAMS)
+def test_blocks_match_interpreter(name,cycles):
+    Image=chip8core.read_binary(os.path.join(BinaryDir,name),chip8vm.ETI660_ORIGIN)
+    expected=run(chip8vm.Chip8,Image,cycles,400)
+    found=run(chip8vm.Chip8Blocks,Image,cycles,400)
+    for frame,(a,b) in enumerate(zip(expected,found)):
+        assert a==b,'%s differs at frame %d' % (name,frame)
+    assert len(expected)==len(found)
+
+# A loop that stores into its own Add, which has to run with the new value on the
+# next pass rather than the translated one
+def test_store_into_block():
+    Image=chip8core.Program(bytes.fromhex('1606 0000 F055 7201 7001 A607 1604'.replace(' ','')),chip8vm.ETI660_ORIGIN)
+    expected=run(chip8vm.Chip8,Image,50,20)
+    found=run(chip8vm.Chip8Blocks,Image,50,20)
+    assert expected==found
+    assert found[-1][2][2]!=found[-2][2][2]+1
+
+# Machine after running a program of opcodes at the ETI-660 origin with some V
+# registers set
+def execute(opcodes,V=None,cycles=None,**kwargs):
+    vm=chip8vm.Chip8(**kwargs)
+    data=b''.join(op.to_bytes(2,'big') for op in opcodes)
+    vm.load(chip8core.Program(data,chip8vm.ETI660_ORIGIN))
+    for x,value in (V or {}).items():
+        vm.V[x]=value
+    vm.run(len(opcodes) if cycles is None else cycles)
+    return vm
+
+@pytest.mark.parametrize('op,a,b,result,flag',[
+    (0x8124,0x12,0x34,0x46,0),     # V1 = V1 + V2
+    (0x8124,0xF0,0x20,0x10,1),
+    (0x8124,0xFF,0x01,0x00,1),
+    (0x8125,0x34,0x12,0x22,1),     # V1 = V1 - V2, VF is 1 without a borrow
+    (0x8125,0x12,0x12,0x00,1),
+    (0x8125,0x12,0x34,0xDE,0),
+    (0x8127,0x12,0x34,0x22,1),     # V1 = V2 - V1
+    (0x8127,0x34,0x12,0xDE,0),
+    (0x8126,0x00,0x05,0x02,1),     # V1 = V2 shr 1, VF is the bit shifted out
+    (0x8126,0xFF,0x04,0x02,0),
+    (0x812E,0x00,0x81,0x02,1),     # V1 = V2 shl 1
+    (0x812E,0xFF,0x41,0x82,0),
+])
+def test_arithmetic(op,a,b,result,flag):
+    vm=execute([op],{1:a,2:b})
+    assert (vm.V[1],vm.V[15])==(result,flag)
+    assert vm.V[2]==b
+
+def test_flag_register_as_operand():
+    # The flag is written after the result
+    vm=execute([0x8F14],{15:0xF0,1:0x20})
+    assert vm.V[15]==1
+
+def test_bcd():
+    vm=execute([0xA800,0xF333],{3:254})
+    assert vm.memory[0x800:0x803]==bytes([2,5,4])
+    assert vm.I==0x800
+    vm=execute([0xA800,0xF333],{3:7})
+    assert vm.memory[0x800:0x803]==bytes([0,0,7])
+
+def test_store_load():
+    vm=execute([0xA800,0xF355],{0:1,1:2,2:3,3:4,4:5})
+    assert vm.memory[0x800:0x805]==bytes([1,2,3,4,0])
+    assert vm.I==0x804
+    vm=execute([0xA800,0xF355,0xA800,0x6000,0x6100,0xF265],{0:1,1:2,2:3,3:4})
+    assert bytes(vm.V[:4])==bytes([1,2,3,4])
+    assert vm.I==0x803
+
+def test_jump_plus_v0():
+    vm=execute([0xB700],{0:0x24})
+    assert vm.pc==0x724
+    vm=execute([0xBFF0],{0:0x20})
+    assert vm.pc==0x010
+
+def test_wait_for_key():
+    vm=execute([0xF50A,0x6101],cycles=10)
+    assert vm.pc==0x600
+    assert vm.cycles==10
+    vm.keys[0xB]=1
+    vm.run(2)
+    assert (vm.pc,vm.V[5],vm.V[1])==(0x604,0xB,1)
+
+def test_sprite_collision():
+    # Two rows of the sprite 0x80, 0xC0 at 0604 shown at 3, 2 and again one row lower
+    vm=execute([0xA604,0xD122,0x80C0],{1:3,2:2},cycles=2)
+    assert vm.V[15]==0
+    assert vm.display[2:5]==[0x80<<53,0xC0<<53,0]
+    vm.V[2]=3
+    vm.pc=0x602
+    vm.run(1)
+    assert vm.V[15]==1
+    assert vm.display[2:5]==[0x80<<53,0x40<<53,0xC0<<53]
+    vm.pc=0x602
+    vm.run(1)
+    assert vm.V[15]==1
+    assert vm.display[2:5]==[0x80<<53,0xC0<<53,0]
@@ -0,0 +1,97 @@
+# TapeServer on free local ports against the wav files HexToWavFileCLI writes
+
+import asyncio
+import os
+import shutil
+
+import pytest
+
+import chip8core
+import HexToWavFileCLI as kcs
+import TapeServer
+import VirtualWav
+import WavTags
+
+BinaryDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Software','binary')
+PROGRAMS = ['Asteroids [P. Easdown, Dec 1983]','PONG']
+
+# Status, headers and body of an HTTP request
+async def http_get(port,path,headers=()):
+    reader,writer=await asyncio.open_connection('127.0.0.1',port)
+    writer.write(('GET %s HTTP/1.1\r\nHost: 127.0.0.1\r\n%s\r\n' % (path,''.join(h+'\r\n' for h in headers))).encode('latin-1'))
+    status=(await reader.readline()).decode('latin-1').split(' ',2)[1]
+    found={}
+    while True:
+        line=(await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        key,_,value=line.partition(':')
+        found[key.lower()]=value.strip()
+    body=await reader.read()
+    writer.close()
+    return int(status),found,body
+
+async def tcp_get(port,request):
+    reader,writer=await asyncio.open_connection('127.0.0.1',port)
+    writer.write((request+'\n').encode('utf-8'))
+    body=await reader.read()
+    writer.close()
+    return body
+
+def test_serve(tmp_path):
+    for Name in PROGRAMS:
+        shutil.copy(os.path.join(BinaryDir,Name+'.ch8'),str(tmp_path))
+    Settings=TapeServer.load_settings(None,{key:None for key in ('ones_freq','zero_freq','framerate','amplitude','leader',
+                                                                  'trailer','origin','shape','sample_width')})
+    Settings.update({'SourceDir':str(tmp_path),'Cache':4,'Host':'127.0.0.1','Port':0,'HttpPort':0})
+
+    # The wav files as written to disk
+    kcs.set_encoding(Settings['OnesFreq'],Settings['ZeroFreq'],Settings['Framerate'],Settings['Amplitude'],
+                     Settings['Shape'],Settings['SampleWidth'])
+    expected={}
+    for Name in PROGRAMS:
+        Image=chip8core.read_binary(os.path.join(BinaryDir,Name+'.ch8'),0x600)
+        filename=os.path.join(str(tmp_path),Name+'.wav')
+        kcs.write_wav(filename,Image.view(),Settings['Leader'],Settings['Trailer'],
+                      WavTags.tag_chunks(Image.address_range(),Name,True))
+        with open(filename,'rb') as f:
+            expected[Name]=f.read()
+        assert VirtualWav.program_wav(Image,Name,Settings['Leader'],Settings['Trailer']).read()==expected[Name]
+
+    async def run():
+        started=asyncio.get_running_loop().create_future()
+        server=asyncio.ensure_future(TapeServer.serve(Settings,started))
+        try:
+            port,http_port=await asyncio.wait_for(started,10)
+            for Name in PROGRAMS:
+                data=expected[Name]
+                size=len(data)
+                assert await tcp_get(port,Name)==data
+                assert await tcp_get(port,Name+' 1000')==data[1000:]
+                path='/wav/'+Name.replace(' ','%20')+'.wav'
+                status,headers,body=await http_get(http_port,path)
+                assert (status,body)==(200,data)
+                assert int(headers['content-length'])==size
+                # Spans across the chunks of the cache
+                for span,start,stop in [('0-99',0,100),('65530-131080',65530,131081),('%d-' % (size-10),size-10,size),
+                                        ('-500',size-500,size),('100-%d' % (size*2),100,size)]:
+                    status,headers,body=await http_get(http_port,path,['Range: bytes='+span])
+                    assert (status,body)==(206,data[start:stop])
+                    assert headers['content-range']=='bytes %d-%d/%d' % (start,stop-1,size)
+                for value in ('bytes=%d-' % size,'bytes=500-100','bytes=0-1,5-6','lines=0-1'):
+                    status,headers,body=await http_get(http_port,path,['Range: '+value])
+                    assert (status,body)==(416,b'')
+                    assert headers['content-range']=='bytes */%d' % size
+            status,headers,body=await http_get(http_port,'/wav/NOPE.wav')
+            assert status==404
+            assert (await tcp_get(port,'NOPE')).startswith(b'ERROR')
+            index=(await tcp_get(port,'LIST')).decode('utf-8')
+            assert [line[:len(Name)] for line,Name in zip(index.splitlines(),PROGRAMS)]==PROGRAMS
+        finally:
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+# Virtual wav files against the wav files HexToWavFileCLI writes
+
+import io
+import os
+import random
+
+import pytest
+
+import chip8core
+import HexToWavFileCLI as kcs
+import Synth
+import VirtualWav
+import WavTags
+
+BinaryDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Software','binary')
+
+ENCODINGS = [
+    ('legacy',22050,1000,500,225,1),
+    ('square',44100,2399,1201,200,1),
+    ('sine',48000,2400,1200,225,2),
+    ('trapezoid',22050,1000,500,225,2),
+]
+
+# Wav file written by write_wav with an encoding
+def wav_file(path,Image,Name,encoding,leader,trailer):
+    kcs.set_encoding(encoding[2],encoding[3],encoding[1],encoding[4],encoding[0],encoding[5])
+    filename=os.path.join(str(path),'%s.wav' % encoding[0])
+    kcs.write_wav(filename,Image.view(),leader,trailer,WavTags.tag_chunks(Image.address_range(),Name,True))
+    with open(filename,'rb') as f:
+        return f.read()
+
+@pytest.mark.parametrize('encoding',ENCODINGS)
+def test_ranges(tmp_path,encoding):
+    Image=chip8core.read_binary(os.path.join(BinaryDir,'PONG.ch8'),0x600)
+    expected=wav_file(tmp_path,Image,'PONG',encoding,2,1)
+    synth=Synth.Synth(*encoding)
+    wav=VirtualWav.program_wav(Image,'PONG',2,1,synth=synth)
+    assert len(wav)==len(expected)
+    assert wav.read()==expected
+    rng=random.Random(1)
+    for x in range(200):
+        start=rng.randrange(len(expected)+10)
+        n=rng.choice([1,2,3,rng.randrange(1,5000),rng.randrange(1,len(expected))])
+        wav.seek(start)
+        assert wav.read(n)==expected[start:start+n]
+        assert wav.tell()==max(start,min(start+n,len(expected)))
+    wav.seek(-100,io.SEEK_END)
+    assert wav.read()==expected[-100:]
+
+def test_encodings_side_by_side(tmp_path):
+    Image=chip8core.read_binary(os.path.join(BinaryDir,'PONG.ch8'),0x600)
+    wavs=[VirtualWav.program_wav(Image,'PONG',1,0,synth=Synth.Synth(*encoding)) for encoding in ENCODINGS]
+    # The encoding set last has no effect on the virtual wav files
+    for encoding,wav in zip(ENCODINGS,wavs):
+        assert wav.read()==wav_file(tmp_path,Image,'PONG',encoding,1,0)